@@ -1,11 +1,25 @@
 #!/usr/bin/env python3
 import os
+import sys
+
+# Reuse a cached synth before loading aws_cdk, see local_zone_cdk/synth_cache.py
+from local_zone_cdk import synth_cache
+if synth_cache.restore():
+    sys.exit(0)
+
 import aws_cdk as cdk
 
 from local_zone_cdk.network_cdk_stack import NetworkCdkStack
 from local_zone_cdk.directory_cdk_stack import DirectoryCdkStack
 from local_zone_cdk.storage_cdk_stack import StorageCdkStack
 from local_zone_cdk.instance_cdk_stack import InstanceCdkStack
+from local_zone_cdk.observability_cdk_stack import ObservabilityCdkStack
+from local_zone_cdk.image_cdk_stack import ImageCdkStack
+from local_zone_cdk.config import FleetConfig
+from local_zone_cdk.storage_plan import StoragePlan
+from local_zone_cdk.throughput_autoscaler import AutoscalingConfig
+from local_zone_cdk.network_profile import NetworkProfile
+from local_zone_cdk.stack_selection import LazyStacks, selection_from_context
 
 # Setup the environment configuration
 deployment_account_id = cdk.Aws.ACCOUNT_ID
@@ -30,11 +44,48 @@ source_ips = ["192.168.0.1/32", "192.168.0.2/32"]
 #####################################################
 
 app = cdk.App()
-network_stack = NetworkCdkStack(app, "NetworkCdkStack", env=deployment_env)
-directory_stack = DirectoryCdkStack(
-    app, "DirectoryCdkStack", env=deployment_env, network_cdk_stack=network_stack)
-storage_stack = StorageCdkStack(app, "StorageCdkStack", env=deployment_env,
-                                network_cdk_stack=network_stack, directory_cdk_stack=directory_stack)
-instance_stack = InstanceCdkStack(
-    app, "InstanceCdkStack", env=deployment_env, network_cdk_stack=network_stack, directory_cdk_stack=directory_stack, keys=keys, sg_source_ips=source_ips )
-app.synth()
\ No newline at end of file
+
+# Workstation seats and cache tier sizes, see local_zone_cdk/config.py
+fleet = FleetConfig.from_context(app.node)
+# FSx throughput, SSD and volumes sized from the workload, see local_zone_cdk/storage_plan.py
+storage_plan = StoragePlan.from_context(app.node, seats=len(fleet.workstation_names()))
+# Optional FSx throughput autoscaling, see local_zone_cdk/throughput_autoscaler.py
+fsx_autoscaling = AutoscalingConfig.from_context(app.node)
+# Optional placement groups, cache data path and VPC endpoints, see local_zone_cdk/network_profile.py
+network_profile = NetworkProfile.from_context(app.node)
+
+# Stacks are built on demand, so "-c stacks=StorageCdkStack" only builds that stack and its dependencies
+stacks = LazyStacks()
+stacks.add("NetworkCdkStack", lambda: NetworkCdkStack(
+    app, "NetworkCdkStack", env=deployment_env, local_zones=fleet.local_zones,
+    profile=network_profile))
+# Pre-baked workstation and cache images, enabled by setting "image_version" in cdk.json context
+image_version = app.node.try_get_context("image_version")
+if image_version:
+    stacks.add("ImageCdkStack", lambda: ImageCdkStack(
+        app, "ImageCdkStack", env=deployment_env, network_cdk_stack=stacks["NetworkCdkStack"], version=image_version))
+stacks.add("DirectoryCdkStack", lambda: DirectoryCdkStack(
+    app, "DirectoryCdkStack", env=deployment_env, network_cdk_stack=stacks["NetworkCdkStack"]))
+stacks.add("StorageCdkStack", lambda: StorageCdkStack(
+    app, "StorageCdkStack", env=deployment_env, network_cdk_stack=stacks["NetworkCdkStack"],
+    directory_cdk_stack=stacks["DirectoryCdkStack"], plan=storage_plan, autoscaling=fsx_autoscaling))
+
+
+def instance_stack():
+    image_stack = stacks.get("ImageCdkStack")
+    stack = InstanceCdkStack(
+        app, "InstanceCdkStack", env=deployment_env, network_cdk_stack=stacks["NetworkCdkStack"], directory_cdk_stack=stacks["DirectoryCdkStack"], keys=keys, sg_source_ips=source_ips, fleet=fleet,
+        images=image_stack.machine_images() if image_stack else None, network_profile=network_profile)
+    if image_stack:
+        stack.add_dependency(image_stack)
+    return stack
+
+
+stacks.add("InstanceCdkStack", instance_stack)
+# Dashboard and alarms; set "alarm_email" in cdk.json context to be emailed on alarms
+stacks.add("ObservabilityCdkStack", lambda: ObservabilityCdkStack(
+    app, "ObservabilityCdkStack", env=deployment_env, storage_cdk_stack=stacks["StorageCdkStack"],
+    instance_cdk_stack=stacks["InstanceCdkStack"], alarm_email=app.node.try_get_context("alarm_email")))
+
+stacks.build(selection_from_context(app.node))
+synth_cache.store(app.synth().directory)
\ No newline at end of file
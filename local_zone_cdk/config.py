@@ -0,0 +1,264 @@
+import ipaddress
+import json
+import re
+from dataclasses import MISSING, dataclass, field, fields
+from typing import List, Optional
+
+from local_zone_cdk.instance_limits import validate_ebs_volume, validate_instance_store
+
+# Fleet configuration for InstanceCdkStack.
+#
+# Read from CDK context, either a path to a JSON file:
+#   cdk synth -c fleet_config=fleet.json
+# or inline under the "fleet" key in cdk.json. Without either, the fleet is the
+# original pilot layout: one g4dn.2xlarge workstation, a t3.xlarge core cache
+# and an r5.2xlarge edge cache.
+#
+# Example:
+#   {
+#     "workstations": [
+#       {"name": "interpreter", "count": 6, "profile": "interpretation-standard"},
+#       {"name": "interpreter-gpu", "count": 2, "instance_type": "g4dn.8xlarge", "volume_size": 200}
+#     ],
+#     "core_cache": {"instance_type": "m5.2xlarge", "volume_size": 500},
+#     "edge_cache": {"instance_type": "r5d.4xlarge", "volume_size": 2000, "volume_type": "gp3",
+#                    "iops": 12000, "throughput": 500, "instance_store": true}
+#   }
+#
+# Cache tier volumes keep the account default volume type unless volume_type is
+# set; iops and throughput are checked against the volume type and the
+# instance's EBS limits (see instance_limits.py). instance_store formats the
+# NVMe instance store of r5d/m5d/c5d/g4dn/i3/i4i types as a striped NTFS
+# volume on cache_drive at every boot, for use as the cache tier.
+#
+# Teams near other Local Zones get their own subnet, edge cache and
+# workstations by listing the zones instead of the top-level "workstations"
+# and "edge_cache" keys, which describe the single Perth zone:
+#   {
+#     "local_zones": [
+#       {"name": "lax", "availability_zone": "us-west-2-lax-1a", "cidr_block": "10.0.50.0/24"},
+#       {"name": "den", "availability_zone": "us-west-2-den-1a", "cidr_block": "10.0.51.0/24",
+#        "workstations": [{"name": "interpreter-den", "count": 2}],
+#        "edge_cache": {"instance_type": "r5.2xlarge", "volume_size": 1000}}
+#     ],
+#     "dcv_amis": {"us-west-2": "ami-..."}
+#   }
+# Zones must share the region of the VPC. The first zone keeps the construct
+# ids of the original Perth resources. dcv_amis adds NICE DCV AMIs for regions
+# other than ap-southeast-2.
+
+_INSTANCE_TYPE = re.compile(r"^[a-z][a-z0-9-]*\.[a-z0-9]+$")
+_ZONE_NAME = re.compile(r"^[a-z][a-z0-9]*$")
+_LOCAL_ZONE = re.compile(r"^[a-z]{2}(-gov)?-[a-z]+-[0-9]-[a-z]+-[0-9][a-z]$")
+_AMI = re.compile(r"^ami-[0-9a-f]{8,17}$")
+
+# Default CIDR of the workload VPC, which the Local Zone subnets are carved from
+VPC_CIDR = ipaddress.ip_network("10.0.0.0/16")
+
+# Named hardware profiles that workstation groups can refer to
+PROFILES = {
+    "interpretation-standard": {"instance_type": "g4dn.2xlarge", "volume_size": 100},
+    "interpretation-large": {"instance_type": "g4dn.4xlarge", "volume_size": 200},
+}
+
+
+def _check_instance_type(value, where):
+    if not isinstance(value, str) or not _INSTANCE_TYPE.match(value):
+        raise ValueError(f"{where}: '{value}' is not an instance type like 'g4dn.2xlarge'")
+
+
+def _check_positive(value, where):
+    # JSON true/false are ints to Python
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f"{where}: must be a positive integer, got {value!r}")
+
+
+def _check_keys(cls, values, where):
+    if not isinstance(values, dict):
+        raise ValueError(f"{where}: must be an object, got {type(values).__name__}")
+    names = {f.name for f in fields(cls)}
+    unknown = set(values) - names
+    if unknown:
+        raise ValueError(f"{where}: unknown keys {sorted(unknown)}, expected some of {sorted(names)}")
+    missing = {f.name for f in fields(cls) if f.default is MISSING and f.default_factory is MISSING} - set(values)
+    if missing:
+        raise ValueError(f"{where}: missing keys {sorted(missing)}")
+
+
+@dataclass(frozen=True)
+class WorkstationGroup:
+    name: str
+    count: int = 1
+    instance_type: str = "g4dn.2xlarge"
+    volume_size: int = 100
+
+    @classmethod
+    def from_dict(cls, values):
+        if not isinstance(values, dict):
+            raise ValueError(f"workstation group: must be an object, got {type(values).__name__}")
+        values = dict(values)
+        profile = values.pop("profile", None)
+        if profile is not None:
+            if profile not in PROFILES:
+                raise ValueError(f"workstation group '{values.get('name')}': unknown profile '{profile}', "
+                                 f"expected one of {sorted(PROFILES)}")
+            values = {**PROFILES[profile], **values}
+        _check_keys(cls, values, f"workstation group '{values.get('name')}'")
+        group = cls(**values)
+        _check_instance_type(group.instance_type, f"workstation group '{group.name}'")
+        _check_positive(group.count, f"workstation group '{group.name}' count")
+        _check_positive(group.volume_size, f"workstation group '{group.name}' volume_size")
+        return group
+
+    def instance_names(self):
+        if self.count == 1:
+            return [self.name]
+        return [f"{self.name}-{i}" for i in range(1, self.count + 1)]
+
+
+@dataclass(frozen=True)
+class CacheTier:
+    instance_type: str
+    volume_size: int
+    volume_type: Optional[str] = None
+    iops: Optional[int] = None
+    throughput: Optional[int] = None
+    instance_store: bool = False
+    cache_drive: str = "E"
+
+    @classmethod
+    def from_dict(cls, values, where):
+        _check_keys(cls, values, where)
+        tier = cls(**values)
+        _check_instance_type(tier.instance_type, where)
+        _check_positive(tier.volume_size, f"{where} volume_size")
+        for name in ("iops", "throughput"):
+            if getattr(tier, name) is not None:
+                _check_positive(getattr(tier, name), f"{where} {name}")
+        validate_ebs_volume(where, tier.instance_type, tier.volume_size, tier.volume_type,
+                            tier.iops, tier.throughput)
+        if tier.instance_store:
+            validate_instance_store(where, tier.instance_type)
+        if not re.match(r"^[D-Z]$", tier.cache_drive):
+            raise ValueError(f"{where}: cache_drive must be a drive letter D-Z, got '{tier.cache_drive}'")
+        return tier
+
+
+@dataclass(frozen=True)
+class LocalZone:
+    name: str = "perth"
+    availability_zone: str = "ap-southeast-2-per-1a"
+    cidr_block: str = "10.0.50.0/24"
+    workstations: List[WorkstationGroup] = field(default_factory=lambda: [
+        WorkstationGroup("nice-dcv-perth-instance")])
+    edge_cache: CacheTier = CacheTier("r5.2xlarge", 1000)
+
+    @classmethod
+    def from_dict(cls, values):
+        default = cls()
+        unknown = set(values) - {"name", "availability_zone", "cidr_block", "workstations", "edge_cache"}
+        if unknown:
+            raise ValueError(f"local zone '{values.get('name')}': unknown keys {sorted(unknown)}")
+        name = values.get("name", default.name)
+        zone = cls(
+            name=name,
+            availability_zone=values.get("availability_zone", default.availability_zone),
+            cidr_block=values.get("cidr_block", default.cidr_block),
+            workstations=[WorkstationGroup.from_dict(w) for w in values.get("workstations", [])]
+            or [WorkstationGroup(f"nice-dcv-{name}-instance")],
+            edge_cache=CacheTier.from_dict(values["edge_cache"], f"local zone '{values.get('name')}' edge_cache")
+            if "edge_cache" in values else default.edge_cache,
+        )
+        where = f"local zone '{zone.name}'"
+        if not isinstance(zone.name, str) or not _ZONE_NAME.match(zone.name):
+            raise ValueError(f"{where}: name must be lowercase letters and digits, like 'perth'")
+        if not isinstance(zone.availability_zone, str) or not _LOCAL_ZONE.match(zone.availability_zone):
+            raise ValueError(f"{where}: '{zone.availability_zone}' is not a Local Zone like 'ap-southeast-2-per-1a'")
+        try:
+            network = ipaddress.ip_network(zone.cidr_block)
+        except ValueError:
+            raise ValueError(f"{where}: '{zone.cidr_block}' is not a CIDR block like '10.0.50.0/24'")
+        if not network.subnet_of(VPC_CIDR) or not 16 <= network.prefixlen <= 28:
+            raise ValueError(f"{where}: cidr_block must be a /16 to /28 inside the VPC CIDR {VPC_CIDR}")
+        return zone
+
+    @property
+    def region(self):
+        return self.availability_zone.rsplit("-", 2)[0]
+
+
+@dataclass(frozen=True)
+class FleetConfig:
+    local_zones: List[LocalZone] = field(default_factory=lambda: [LocalZone()])
+    core_cache: CacheTier = CacheTier("t3.xlarge", 100)
+    # NICE DCV AMIs by region, on top of the ones in instance_cdk_stack.py
+    dcv_amis: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, values):
+        default = cls()
+        unknown = set(values) - {"workstations", "core_cache", "edge_cache", "local_zones", "dcv_amis"}
+        if unknown:
+            raise ValueError(f"fleet config: unknown keys {sorted(unknown)}")
+        if "local_zones" in values:
+            if "workstations" in values or "edge_cache" in values:
+                raise ValueError("fleet config: set workstations and edge_cache per local zone "
+                                 "when local_zones is given")
+            local_zones = [LocalZone.from_dict(z) for z in values["local_zones"]]
+            if not local_zones:
+                raise ValueError("fleet config: local_zones must list at least one zone")
+        else:
+            # The top-level keys describe the single Perth zone
+            local_zones = [LocalZone.from_dict({key: values[key] for key in ("workstations", "edge_cache")
+                                                if key in values})]
+        fleet = cls(
+            local_zones=local_zones,
+            core_cache=CacheTier.from_dict(values["core_cache"], "core_cache")
+            if "core_cache" in values else default.core_cache,
+            dcv_amis=dict(values.get("dcv_amis", {})),
+        )
+        names = fleet.workstation_names()
+        if len(names) != len(set(names)):
+            raise ValueError("fleet config: workstation instance names must be unique")
+        zone_names = [zone.name for zone in fleet.local_zones]
+        if len(zone_names) != len(set(zone_names)):
+            raise ValueError("fleet config: local zone names must be unique")
+        for i, zone in enumerate(fleet.local_zones):
+            for other in fleet.local_zones[:i]:
+                if ipaddress.ip_network(zone.cidr_block).overlaps(ipaddress.ip_network(other.cidr_block)):
+                    raise ValueError(f"fleet config: cidr_block of local zones '{other.name}' and "
+                                     f"'{zone.name}' overlap")
+        regions = {zone.region for zone in fleet.local_zones}
+        if len(regions) > 1:
+            raise ValueError(f"fleet config: local zones span regions {sorted(regions)}, "
+                             f"they must share the region of the VPC")
+        for region, ami in fleet.dcv_amis.items():
+            if not isinstance(ami, str) or not _AMI.match(ami):
+                raise ValueError(f"fleet config: dcv_amis['{region}'] is not an AMI id like 'ami-0c647d0850806d035'")
+        return fleet
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def from_context(cls, node):
+        path = node.try_get_context("fleet_config")
+        if path:
+            return cls.from_file(path)
+        inline = node.try_get_context("fleet")
+        if inline:
+            # -c on the command line passes the object as JSON text
+            if isinstance(inline, str):
+                inline = json.loads(inline)
+            return cls.from_dict(inline)
+        return cls()
+
+    @property
+    def workstations(self):
+        return [group for zone in self.local_zones for group in zone.workstations]
+
+    def workstation_names(self):
+        return [name for group in self.workstations for name in group.instance_names()]
+
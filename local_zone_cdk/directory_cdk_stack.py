@@ -9,12 +9,6 @@ import aws_cdk.aws_secretsmanager as sm
 import aws_cdk.aws_iam as iam
 from constructs import Construct
 
-# Params
-inst_type = ec2.InstanceType.of(
-    ec2.InstanceClass.G4DN, ec2.InstanceSize.XLARGE2)
-nice_dcv_ami = ec2.MachineImage.generic_windows(
-    {"ap-southeast-2": "ami-0c647d0850806d035"})
-
 class DirectoryCdkStack(Stack):
 
     def __init__(self, scope: Construct, construct_id: str, network_cdk_stack, **kwargs) -> None:
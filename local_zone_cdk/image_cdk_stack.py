@@ -0,0 +1,54 @@
+import os
+
+from aws_cdk import (
+    Stack,
+    Tags
+)
+
+import aws_cdk.aws_ec2 as ec2
+import aws_cdk.aws_s3_assets as s3_assets
+
+from constructs import Construct
+
+from local_zone_cdk.image_pipeline import (RoleImagePipeline, dcv_steps, machine_image, rsat_steps, tools_steps,
+                                          validate_version)
+
+# Instance roles and the images InstanceCdkStack uses for them
+ROLES = ("workstation", "cache")
+
+
+class ImageCdkStack(Stack):
+
+    def __init__(self, scope: Construct, construct_id: str, network_cdk_stack, version: str = "1.0.0", **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        self.version = validate_version(version)
+
+        # # This stack is for pre-baked workstation and cache images
+        sg_name = "image-builder-sg"
+        security_group = ec2.SecurityGroup(self, sg_name,
+                                           vpc=network_cdk_stack.workload_vpc,
+                                           description=sg_name,
+                                           allow_all_outbound=True,
+                                           security_group_name=sg_name
+                                           )
+        Tags.of(security_group).add("Name", sg_name)
+        # Builds run in a private subnet and download installers through the NAT gateway
+        subnet_id = network_cdk_stack.workload_vpc.private_subnets[0].subnet_id
+
+        # The performance tooling, installed on every role
+        tools = s3_assets.Asset(self, "local-zone-tools",
+                                path=os.path.join(os.path.dirname(os.path.dirname(__file__)), "local_zone_tools"),
+                                exclude=["__pycache__", "*.pyc"])
+
+        self.pipelines = {
+            "workstation": RoleImagePipeline(self, "workstation-image", "workstation", version,
+                                             dcv_steps() + rsat_steps() + tools_steps(tools.s3_object_url),
+                                             subnet_id, security_group.security_group_id, readers=[tools]),
+            "cache": RoleImagePipeline(self, "cache-image", "cache", version,
+                                       rsat_steps() + tools_steps(tools.s3_object_url),
+                                       subnet_id, security_group.security_group_id, readers=[tools]),
+        }
+
+    def machine_images(self):
+        return {role: machine_image(role, self.version) for role in ROLES}
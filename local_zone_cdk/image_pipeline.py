@@ -0,0 +1,200 @@
+import json
+import os
+import re
+
+from aws_cdk import Duration, Stack
+import aws_cdk.aws_ec2 as ec2
+import aws_cdk.aws_events as events
+import aws_cdk.aws_events_targets as targets
+import aws_cdk.aws_iam as iam
+from aws_cdk import aws_imagebuilder as imagebuilder
+import aws_cdk.aws_lambda as lambda_
+import aws_cdk.aws_logs as logs
+import aws_cdk.aws_ssm as ssm
+
+from constructs import Construct
+
+# EC2 Image Builder pipeline for one instance role.
+#
+# Bakes a Windows Server 2022 AMI from a list of build steps, builds the first
+# image of a version while the stack deploys, then rebuilds weekly when the
+# base image or components change. The AMI of that first build is pinned in
+# the SSM parameter /energy-blog/images/<role>/<version>, which InstanceCdkStack
+# launches from, so weekly builds never replace running instances. The newest
+# build is kept in /energy-blog/images/<role>. Components are immutable per
+# version, so bump the version whenever the build steps change, or to move
+# the instances to a newer base image.
+
+LAMBDA_DIR = os.path.join(os.path.dirname(__file__), "lambdas", "image_parameter")
+PARENT_IMAGE = "windows-server-2022-english-full-base-x86/x.x.x"
+# Image Builder versions are major.minor.patch
+_VERSION = re.compile(r"^(0|[1-9][0-9]*)\.(0|[1-9][0-9]*)\.(0|[1-9][0-9]*)$")
+
+DCV_SERVER_MSI = "https://d1uj6qtbmh3dt5.cloudfront.net/nice-dcv-server-x64-Release.msi"
+PYTHON_INSTALLER = "https://www.python.org/ftp/python/3.11.9/python-3.11.9-amd64.exe"
+PYTHON_EXE = "C:\\Program Files\\Python311\\python.exe"
+TOOLS_DIR = "C:\\Program Files\\local_zone_tools"
+
+
+def validate_version(version):
+    if not isinstance(version, str) or not _VERSION.match(version):
+        raise ValueError(f"image_version: '{version}' is not a semantic version like '1.0.0'")
+    return version
+
+
+def parameter_name(role, version=None):
+    # The newest build of a role, or the image pinned for one version
+    return f"/energy-blog/images/{role}/{version}" if version else f"/energy-blog/images/{role}"
+
+
+def machine_image(role, version):
+    # The pinned parameter never changes, so instances are only replaced when image_version is bumped
+    return ec2.MachineImage.from_ssm_parameter(parameter_name(role, version), os=ec2.OperatingSystemType.WINDOWS)
+
+
+def rsat_steps():
+    return [{"name": "InstallRSAT", "action": "ExecutePowerShell",
+             "inputs": {"commands": ["Install-WindowsFeature RSAT-ADDS"]}}]
+
+
+def dcv_steps():
+    return [
+        {"name": "DownloadDcvServer", "action": "WebDownload",
+         "inputs": [{"source": DCV_SERVER_MSI, "destination": "C:\\Windows\\Temp\\nice-dcv-server.msi"}]},
+        {"name": "InstallDcvServer", "action": "ExecutePowerShell",
+         "inputs": {"commands": [
+             "Start-Process msiexec.exe -Wait -ArgumentList '/i C:\\Windows\\Temp\\nice-dcv-server.msi "
+             "ADDLOCAL=ALL /quiet /norestart /l*v C:\\Windows\\Temp\\nice-dcv-install.log'"]}},
+    ]
+
+
+def tools_steps(tools_url):
+    return [
+        {"name": "DownloadPython", "action": "WebDownload",
+         "inputs": [{"source": PYTHON_INSTALLER, "destination": "C:\\Windows\\Temp\\python-installer.exe"}]},
+        {"name": "InstallPython", "action": "ExecuteBinary",
+         "inputs": {"path": "C:\\Windows\\Temp\\python-installer.exe",
+                    "arguments": ["/quiet", "InstallAllUsers=1", "PrependPath=1", "Include_test=0"]}},
+        {"name": "DownloadTools", "action": "S3Download",
+         "inputs": [{"source": tools_url, "destination": "C:\\Windows\\Temp\\local_zone_tools.zip"}]},
+        {"name": "InstallTools", "action": "ExecutePowerShell",
+         "inputs": {"commands": [
+             f"Expand-Archive C:\\Windows\\Temp\\local_zone_tools.zip -DestinationPath '{TOOLS_DIR}\\local_zone_tools' -Force",
+             f"& '{PYTHON_EXE}' -m pip install --no-warn-script-location numpy boto3",
+             f"[Environment]::SetEnvironmentVariable('PYTHONPATH', '{TOOLS_DIR}', 'Machine')"]}},
+    ]
+
+
+class RoleImagePipeline(Construct):
+
+    def __init__(self, scope: Construct, construct_id: str, role_name: str, version: str, steps,
+                 subnet_id: str, security_group_id: str, readers=(), instance_type: str = "m5.large") -> None:
+        super().__init__(scope, construct_id)
+
+        validate_version(version)
+        stack = Stack.of(self)
+        name = f"energy-blog-{role_name}"
+
+        # Build instances need SSM for Image Builder plus read access to the staged tooling
+        build_role = iam.Role(self, "build-role", assumed_by=iam.ServicePrincipal("ec2.amazonaws.com"))
+        build_role.add_managed_policy(iam.ManagedPolicy.from_aws_managed_policy_name(
+            "AmazonSSMManagedInstanceCore"))
+        build_role.add_managed_policy(iam.ManagedPolicy.from_aws_managed_policy_name(
+            "EC2InstanceProfileForImageBuilder"))
+        for reader in readers:
+            reader.grant_read(build_role)
+        instance_profile = iam.CfnInstanceProfile(self, "build-instance-profile", roles=[build_role.role_name])
+
+        component = imagebuilder.CfnComponent(self, "component",
+            name=name,
+            platform="Windows",
+            version=version,
+            description=f"Software for {role_name} instances",
+            data=json.dumps({
+                "name": name,
+                "schemaVersion": 1.0,
+                "phases": [{"name": "build", "steps": steps}],
+            }, indent=2),
+        )
+
+        recipe = imagebuilder.CfnImageRecipe(self, "recipe",
+            name=name,
+            version=version,
+            parent_image=f"arn:{stack.partition}:imagebuilder:{stack.region}:aws:image/{PARENT_IMAGE}",
+            components=[imagebuilder.CfnImageRecipe.ComponentConfigurationProperty(
+                component_arn=component.attr_arn)],
+        )
+
+        infrastructure = imagebuilder.CfnInfrastructureConfiguration(self, "infrastructure",
+            name=name,
+            instance_profile_name=instance_profile.ref,
+            instance_types=[instance_type],
+            subnet_id=subnet_id,
+            security_group_ids=[security_group_id],
+            terminate_instance_on_failure=True,
+        )
+
+        distribution = imagebuilder.CfnDistributionConfiguration(self, "distribution",
+            name=name,
+            distributions=[imagebuilder.CfnDistributionConfiguration.DistributionProperty(
+                region=stack.region,
+                ami_distribution_configuration={
+                    "Name": f"{name}-{{{{imagebuilder:buildDate}}}}",
+                    "AmiTags": {"role": role_name, "recipe-version": version},
+                },
+            )],
+        )
+
+        self.pipeline = imagebuilder.CfnImagePipeline(self, "pipeline",
+            name=name,
+            image_recipe_arn=recipe.attr_arn,
+            infrastructure_configuration_arn=infrastructure.attr_arn,
+            distribution_configuration_arn=distribution.attr_arn,
+            schedule=imagebuilder.CfnImagePipeline.ScheduleProperty(
+                schedule_expression="cron(0 14 ? * sun *)",
+                pipeline_execution_start_condition="EXPRESSION_MATCH_AND_DEPENDENCY_UPDATES_AVAILABLE",
+            ),
+        )
+
+        # First build of this recipe version, made during the deploy
+        self.image = imagebuilder.CfnImage(self, "image",
+            image_recipe_arn=recipe.attr_arn,
+            infrastructure_configuration_arn=infrastructure.attr_arn,
+            distribution_configuration_arn=distribution.attr_arn,
+        )
+
+        self.parameter = ssm.StringParameter(self, "image-parameter",
+            parameter_name=parameter_name(role_name),
+            string_value=self.image.attr_image_id,
+            data_type=ssm.ParameterDataType.AWS_EC2_IMAGE,
+        )
+        # The image the instances launch from until the version is bumped
+        self.pinned_parameter = ssm.StringParameter(self, "pinned-image-parameter",
+            parameter_name=parameter_name(role_name, version),
+            string_value=self.image.attr_image_id,
+            data_type=ssm.ParameterDataType.AWS_EC2_IMAGE,
+        )
+
+        # Later pipeline builds move the parameter on to their AMI
+        update_function = lambda_.Function(self, "update-parameter",
+            runtime=lambda_.Runtime.PYTHON_3_10,
+            handler="index.handler",
+            code=lambda_.Code.from_asset(LAMBDA_DIR),
+            timeout=Duration.seconds(30),
+            log_retention=logs.RetentionDays.ONE_MONTH,
+            environment={"PARAMETER_NAME": parameter_name(role_name)},
+        )
+        self.parameter.grant_write(update_function)
+        update_function.add_to_role_policy(iam.PolicyStatement(
+            actions=["imagebuilder:GetImage"],
+            resources=[f"arn:{stack.partition}:imagebuilder:{stack.region}:{stack.account}:image/{name}/*"],
+        ))
+        events.Rule(self, "image-available",
+            event_pattern=events.EventPattern(
+                source=["aws.imagebuilder"],
+                detail_type=["EC2 Image Builder Image State Change"],
+                resources=events.Match.prefix(
+                    f"arn:{stack.partition}:imagebuilder:{stack.region}:{stack.account}:image/{name}/"),
+            ),
+            targets=[targets.LambdaFunction(update_function)],
+        )
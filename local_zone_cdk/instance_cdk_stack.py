@@ -1,7 +1,8 @@
 from aws_cdk import (
     Stack,
     Tags,
-    CfnTag
+    CfnTag,
+    CfnOutput
 )
 from aws_cdk import aws_directoryservice as ad
 import aws_cdk.aws_ec2 as ec2
@@ -9,19 +10,111 @@ import aws_cdk.aws_iam as iam
 import aws_cdk.aws_ssm as ssm
 from constructs import Construct
 
+from local_zone_cdk.config import FleetConfig, VPC_CIDR
+from local_zone_cdk.observability_cdk_stack import NAMESPACE
+
 # Params
-nice_dcv_ami = ec2.MachineImage.generic_windows(
-    {"ap-southeast-2": "ami-0c647d0850806d035"})
+# NICE DCV AMIs by region; add others with "dcv_amis" in the fleet config
+dcv_amis = {"ap-southeast-2": "ami-0c647d0850806d035"}
+
+# Stripes the NVMe instance store disks into one NTFS volume. Instance store is
+# blank after every stop/start, so the user data persists and runs each boot.
+instance_store_script = """
+$pool = Get-StoragePool -FriendlyName CacheInstanceStore -ErrorAction SilentlyContinue
+if (-not $pool) {{
+    $disks = Get-PhysicalDisk -CanPool $true | Where-Object {{ $_.FriendlyName -like '*EC2 NVMe*' }}
+    if ($disks) {{
+        $subsystem = (Get-StorageSubSystem -FriendlyName 'Windows Storage*').FriendlyName
+        New-StoragePool -FriendlyName CacheInstanceStore -StorageSubSystemFriendlyName $subsystem -PhysicalDisks $disks
+        New-VirtualDisk -StoragePoolFriendlyName CacheInstanceStore -FriendlyName CacheInstanceStore -ResiliencySettingName Simple -NumberOfColumns $disks.Count -UseMaximumSize
+        Get-VirtualDisk -FriendlyName CacheInstanceStore | Get-Disk | Initialize-Disk -PartitionStyle GPT -PassThru |
+            New-Partition -DriveLetter {drive} -UseMaximumSize |
+            Format-Volume -FileSystem NTFS -AllocationUnitSize 65536 -NewFileSystemLabel CacheInstanceStore -Confirm:$false
+    }}
+}}
+"""
+
+
+def cache_block_device(device_name, tier, mapping_enabled=None):
+    volume_type = ec2.EbsDeviceVolumeType[tier.volume_type.upper()] if tier.volume_type else None
+    return ec2.BlockDevice(
+        device_name=device_name,
+        mapping_enabled=mapping_enabled,
+        volume=ec2.BlockDeviceVolume.ebs(tier.volume_size,
+            delete_on_termination=True,
+            encrypted=True,
+            volume_type=volume_type,
+            iops=tier.iops
+        ),
+    )
+
+
+def tune_cache_instance(instance, tier):
+    # BlockDeviceVolume has no throughput option, so set gp3 throughput on the CloudFormation resource
+    if tier.throughput:
+        instance.node.default_child.add_property_override(
+            "BlockDeviceMappings.0.Ebs.Throughput", tier.throughput)
+    if tier.instance_store:
+        instance.user_data.add_commands(instance_store_script.format(drive=tier.cache_drive))
+
+
+def allow_path_mtu_discovery(security_group):
+    # ICMP destination unreachable, fragmentation needed
+    security_group.add_ingress_rule(
+        ec2.Peer.ipv4(str(VPC_CIDR)),
+        ec2.Port.icmp_type_and_code(3, 4),
+        "Allow path MTU discovery within the VPC"
+    )
 
 
 class InstanceCdkStack(Stack):
 
-    def __init__(self, scope: Construct, construct_id: str, network_cdk_stack, directory_cdk_stack, keys, env, sg_source_ips, **kwargs) -> None:
+    def __init__(self, scope: Construct, construct_id: str, network_cdk_stack, directory_cdk_stack, keys, env, sg_source_ips, fleet: FleetConfig = None, images=None, network_profile=None, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        fleet = fleet or FleetConfig()
+        if network_profile:
+            network_profile.validate(fleet)
+        # Pre-baked images per role from ImageCdkStack, otherwise the stock AMIs
+        if images:
+            workstation_image = images["workstation"]
+        else:
+            amis = {**dcv_amis, **fleet.dcv_amis}
+            missing = sorted({zone.region for zone in fleet.local_zones} - set(amis))
+            if missing:
+                raise ValueError(f"fleet config: no NICE DCV AMI for {missing}, add it to dcv_amis")
+            workstation_image = ec2.MachineImage.generic_windows(amis)
+        cache_image = images["cache"] if images else ec2.MachineImage.latest_windows(
+            ec2.WindowsVersion.WINDOWS_SERVER_2022_ENGLISH_FULL_BASE)
+
         # This stack is builds instances for the energy blog solution.
 
         # Create SSM Document to join domain and install tools
+        main_steps = [
+            {
+                "action": "aws:domainJoin",
+                "name": "domainJoin",
+                "inputs": {
+                    "directoryId": "{{ directoryId }}",
+                    "directoryName": "{{ directoryName }}",
+                    "dnsIpAddresses": "{{ dnsIpAddresses }}"
+                }
+            },
+            {
+                "action": "aws:runPowerShellScript",
+                "name": "InstallRSATTools",
+                "inputs": {
+                    "timeoutSeconds": "180",
+                    "runCommand": [
+                        "Install-WindowsFeature RSAT-ADDS"
+                    ],
+                    "finallyStep": True
+                }
+            }
+        ]
+        if images:
+            # The baked images already have the Active Directory tools
+            main_steps = main_steps[:1]
         cfn_document = ssm.CfnDocument(self, "join-domain-install-software-doc",
                                        content={
                                            "schemaVersion": "2.2",
@@ -40,31 +133,12 @@ class InstanceCdkStack(Stack):
                                                    "type": "StringList"
                                                }
                                            },
-                                           "mainSteps": [
-                                               {
-                                                   "action": "aws:domainJoin",
-                                                   "name": "domainJoin",
-                                                   "inputs": {
-                                                       "directoryId": "{{ directoryId }}",
-                                                       "directoryName": "{{ directoryName }}",
-                                                       "dnsIpAddresses": "{{ dnsIpAddresses }}"
-                                                   }
-                                               },
-                                               {
-                                                   "action": "aws:runPowerShellScript",
-                                                   "name": "InstallRSATTools",
-                                                   "inputs": {
-                                                       "timeoutSeconds": "180",
-                                                       "runCommand": [
-                                                           "Install-WindowsFeature RSAT-ADDS"
-                                                       ],
-                                                       "finallyStep": True
-                                                   }
-                                               }
-                                           ]
+                                           "mainSteps": main_steps
                                        },
                                        name="join-domain-install-software",
                                        document_type="Command",
+                                       # The document keeps its name, so update it in place rather than replace it
+                                       update_method="NewVersion" if images else None,
                                        tags=[CfnTag(
                                            key="Name",
                                            value="join-domain-install-software"
@@ -94,11 +168,15 @@ class InstanceCdkStack(Stack):
                 "Allow traffic from a specific IP address"
             )
         
-        self.security_group.add_ingress_rule(
-                ec2.Peer.ipv4("10.0.50.0/24"),
-                ec2.Port.tcp(445),
-                "Allow traffic from a Perth Subnet"
-            )
+        for zone in fleet.local_zones:
+            self.security_group.add_ingress_rule(
+                    ec2.Peer.ipv4(zone.cidr_block),
+                    ec2.Port.tcp(445),
+                    "Allow traffic from a Perth Subnet" if zone is fleet.local_zones[0]
+                    else f"Allow traffic from the {zone.name} Local Zone subnet"
+                )
+        if network_profile and network_profile.path_mtu_discovery:
+            allow_path_mtu_discovery(self.security_group)
 
         # Create IAM role
         role = iam.Role(self, 'perth-ec2-role',
@@ -117,37 +195,72 @@ class InstanceCdkStack(Stack):
                 resources=["arn:aws:s3:::dcv-license." + env.region + "/*"],
             )
         )
+        # Cache and benchmark figures from local_zone_tools.metrics
+        role.add_to_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["cloudwatch:PutMetricData"],
+                resources=["*"],
+                conditions={"StringEquals": {"cloudwatch:namespace": NAMESPACE}},
+            )
+        )
 
-        # Grab the Perth subnet as an ISubnet object
-        perth_subnet = ec2.Subnet.from_subnet_attributes(
-            self, "sn-lookup", subnet_id=network_cdk_stack.sn.attr_subnet_id, availability_zone=network_cdk_stack.sn.attr_availability_zone)
+        # Grab the Local Zone subnets as ISubnet objects
+        zone_subnets = {}
+        for i, zone in enumerate(fleet.local_zones):
+            sn = network_cdk_stack.local_zone_subnets[zone.name]
+            zone_subnets[zone.name] = ec2.Subnet.from_subnet_attributes(
+                self, "sn-lookup" if i == 0 else f"{zone.name}-sn-lookup",
+                subnet_id=sn.attr_subnet_id, availability_zone=sn.attr_availability_zone)
 
-        # Create the user instance
-        friendly_name = "nice-dcv-perth-instance"
-        perth_instance = ec2.Instance(self, "perth-instance", instance_type=ec2.InstanceType.of(
-            ec2.InstanceClass.G4DN, ec2.InstanceSize.XLARGE2),
-            machine_image=nice_dcv_ami,
-            vpc=network_cdk_stack.workload_vpc,
-            vpc_subnets=ec2.SubnetSelection(
-            subnets=[perth_subnet]),
-            block_devices=[
-                ec2.BlockDevice(
-                    device_name="/dev/sda2",
-                    volume=ec2.BlockDeviceVolume.ebs(100, 
-                        delete_on_termination=True,
-                        encrypted=True
-                    ),
-                )
-            ],
-            instance_name=friendly_name,
-            role=role,
-            key_name=keys,
-            detailed_monitoring=True,
-            security_group=self.security_group)
-        Tags.of(perth_instance).add("purpose", "energy-blog")
-        # Enable termination protection - https://docs.aws.amazon.com/cdk/v2/guide/cfn_layer.html#cfn_layer_resource
-        cfn_perth_instance = perth_instance.node.default_child
-        cfn_perth_instance.disable_api_termination=True
+        # One placement group per Local Zone for its workstations and edge cache, from the network profile
+        placement_groups = {}
+        for zone in fleet.local_zones:
+            if network_profile and network_profile.placed(zone):
+                placement_groups[zone.name] = ec2.CfnPlacementGroup(self, f"{zone.name}-placement-group",
+                    strategy=network_profile.placement_strategy,
+                    partition_count=network_profile.partition_count
+                    if network_profile.placement_strategy == "partition" else None,
+                    tags=[CfnTag(
+                        key="Name",
+                        value=f"{zone.name}-placement-group"
+                    )])
+
+        # Create the user instances, one per seat in the fleet config, in the subnet of their Local Zone
+        self.workstations = []
+        seats = [(i, zone, seat, group, name) for i, zone in enumerate(fleet.local_zones)
+                 for seat, (group, name) in enumerate(((group, name) for group in zone.workstations
+                                                      for name in group.instance_names()), start=1)]
+        for i, zone, seat, group, friendly_name in seats:
+            # Seats in the first zone keep the original construct ids so existing deployments are not replaced
+            prefix = "perth" if i == 0 else zone.name
+            seat_id = f"{prefix}-instance" if seat == 1 else f"{prefix}-instance-{seat}"
+            perth_instance = ec2.Instance(self, seat_id, instance_type=ec2.InstanceType(group.instance_type),
+                machine_image=workstation_image,
+                vpc=network_cdk_stack.workload_vpc,
+                vpc_subnets=ec2.SubnetSelection(
+                subnets=[zone_subnets[zone.name]]),
+                block_devices=[
+                    ec2.BlockDevice(
+                        device_name="/dev/sda2",
+                        volume=ec2.BlockDeviceVolume.ebs(group.volume_size,
+                            delete_on_termination=True,
+                            encrypted=True
+                        ),
+                    )
+                ],
+                instance_name=friendly_name,
+                role=role,
+                key_name=keys,
+                detailed_monitoring=True,
+                security_group=self.security_group)
+            Tags.of(perth_instance).add("purpose", "energy-blog")
+            # Enable termination protection - https://docs.aws.amazon.com/cdk/v2/guide/cfn_layer.html#cfn_layer_resource
+            cfn_perth_instance = perth_instance.node.default_child
+            cfn_perth_instance.disable_api_termination=True
+            if zone.name in placement_groups:
+                cfn_perth_instance.placement_group_name = placement_groups[zone.name].ref
+            self.workstations.append(perth_instance)
 
         # Create the cache - core instance - sydney
         core_friendly_name = "cache-instance-core"
@@ -166,59 +279,119 @@ class InstanceCdkStack(Stack):
             ec2.Port.all_traffic(),
             "Allow traffic from nice-dcv-perth-instance-sg"
         )
+        if network_profile and network_profile.path_mtu_discovery:
+            allow_path_mtu_discovery(self.cache_core_security_group)
+
+        # Edge caches share the workstation security group unless the network profile gives them their own
+        edge_security_group = self.security_group
+        if network_profile and network_profile.cache_security_group:
+            edge_sg_name = "cache-instance-edge-sg"
+            edge_security_group = ec2.SecurityGroup(self, edge_sg_name,
+                                                    vpc=network_cdk_stack.workload_vpc,
+                                                    description="cache-instance-edge security group",
+                                                    allow_all_outbound=True,
+                                                    security_group_name=edge_sg_name
+                                                    )
+            Tags.of(edge_security_group).add("Name", edge_sg_name)
+            for ip in sg_source_ips:
+                edge_security_group.add_ingress_rule(
+                    ec2.Peer.ipv4(ip),
+                    ec2.Port.tcp(3389),
+                    "Allow traffic from a specific IP address"
+                )
+            for port in network_profile.cache_ports:
+                edge_security_group.add_ingress_rule(
+                    ec2.Peer.security_group_id(self.security_group.security_group_id),
+                    ec2.Port.tcp(port),
+                    "Allow cache traffic from nice-dcv-perth-instance-sg"
+                )
+            if network_profile.path_mtu_discovery:
+                allow_path_mtu_discovery(edge_security_group)
+            # Edge caches fill from the core cache
+            self.cache_core_security_group.add_ingress_rule(
+                ec2.Peer.security_group_id(edge_security_group.security_group_id),
+                ec2.Port.all_traffic(),
+                "Allow traffic from cache-instance-edge-sg"
+            )
+        self.edge_security_group = edge_security_group
+
+        # Security group of the cache data interfaces, which only take cache traffic from the workstations
+        self.cache_data_security_group = None
+        if network_profile and network_profile.cache_data_eni:
+            data_sg_name = "cache-data-path-sg"
+            self.cache_data_security_group = ec2.SecurityGroup(self, data_sg_name,
+                                                               vpc=network_cdk_stack.workload_vpc,
+                                                               description="cache data path security group",
+                                                               allow_all_outbound=True,
+                                                               security_group_name=data_sg_name
+                                                               )
+            Tags.of(self.cache_data_security_group).add("Name", data_sg_name)
+            for port in network_profile.cache_ports:
+                self.cache_data_security_group.add_ingress_rule(
+                    ec2.Peer.security_group_id(self.security_group.security_group_id),
+                    ec2.Port.tcp(port),
+                    "Allow cache traffic from nice-dcv-perth-instance-sg"
+                )
+            if network_profile.path_mtu_discovery:
+                allow_path_mtu_discovery(self.cache_data_security_group)
 
-        cache_instance_core = ec2.Instance(self, "cache-instance-core", instance_type=ec2.InstanceType.of(
-            ec2.InstanceClass.T3, ec2.InstanceSize.XLARGE),
-            machine_image=ec2.MachineImage.latest_windows(
-                ec2.WindowsVersion.WINDOWS_SERVER_2022_ENGLISH_FULL_BASE),
+        cache_instance_core = ec2.Instance(self, "cache-instance-core", instance_type=ec2.InstanceType(
+            fleet.core_cache.instance_type),
+            machine_image=cache_image,
             vpc=network_cdk_stack.workload_vpc,
             block_devices=[
-                ec2.BlockDevice(
-                    device_name="/dev/sda1",
-                    mapping_enabled=True,
-                    volume=ec2.BlockDeviceVolume.ebs(100, 
-                        delete_on_termination=True,
-                        encrypted=True
-                    ),
-                )
+                cache_block_device("/dev/sda1", fleet.core_cache, mapping_enabled=True)
             ],
+            user_data=ec2.UserData.for_windows(persist=True) if fleet.core_cache.instance_store else None,
             instance_name=core_friendly_name,
             role=role,
             key_name=keys,
             detailed_monitoring=True,
             security_group=self.cache_core_security_group)
         Tags.of(cache_instance_core).add("purpose", "energy-blog")
+        tune_cache_instance(cache_instance_core, fleet.core_cache)
         # Enable termination protection - https://docs.aws.amazon.com/cdk/v2/guide/cfn_layer.html#cfn_layer_resource
         cfn_cache_instance_core = cache_instance_core.node.default_child
         cfn_cache_instance_core.disable_api_termination=True
         
 
-        # Create the cache - edge instance - perth
-        edge_friendly_name = "cache-instance-edge"
-        cache_instance_edge = ec2.Instance(self, "cache-instance-edge", instance_type=ec2.InstanceType.of(
-            ec2.InstanceClass.R5, ec2.InstanceSize.XLARGE2),
-            machine_image=ec2.MachineImage.latest_windows(
-                ec2.WindowsVersion.WINDOWS_SERVER_2022_ENGLISH_FULL_BASE),
-            vpc=network_cdk_stack.workload_vpc,
-            vpc_subnets=ec2.SubnetSelection(
-            subnets=[perth_subnet]),
-            block_devices=[
-                ec2.BlockDevice(
-                    device_name="/dev/sda2",
-                    volume=ec2.BlockDeviceVolume.ebs(1000,
-                        delete_on_termination=True,
-                        encrypted=True)
-                )
-        ],
-            instance_name=edge_friendly_name,
-            role=role,
-            key_name=keys,
-            detailed_monitoring=True,
-            security_group=self.security_group)
-        Tags.of(cache_instance_edge).add("purpose", "energy-blog")
-        # Enable termination protection - https://docs.aws.amazon.com/cdk/v2/guide/cfn_layer.html#cfn_layer_resource
-        cfn_cache_instance_edge = cache_instance_edge.node.default_child
-        cfn_cache_instance_edge.disable_api_termination=True
+        # Cache instances and the device name of their cache volume, for monitoring
+        self.cache_instances = [
+            (core_friendly_name, cache_instance_core, "/dev/sda1"),
+        ]
+
+        # Create the cache - edge instances - one per Local Zone, the first in perth
+        self.edge_caches = []
+        for i, zone in enumerate(fleet.local_zones):
+            edge_friendly_name = "cache-instance-edge" if i == 0 else f"cache-instance-edge-{zone.name}"
+            cache_instance_edge = ec2.Instance(self, edge_friendly_name, instance_type=ec2.InstanceType(
+                zone.edge_cache.instance_type),
+                machine_image=cache_image,
+                vpc=network_cdk_stack.workload_vpc,
+                vpc_subnets=ec2.SubnetSelection(
+                subnets=[zone_subnets[zone.name]]),
+                block_devices=[
+                    cache_block_device("/dev/sda2", zone.edge_cache)
+                ],
+                user_data=ec2.UserData.for_windows(persist=True) if zone.edge_cache.instance_store else None,
+                instance_name=edge_friendly_name,
+                role=role,
+                key_name=keys,
+                detailed_monitoring=True,
+                security_group=edge_security_group)
+            Tags.of(cache_instance_edge).add("purpose", "energy-blog")
+            tune_cache_instance(cache_instance_edge, zone.edge_cache)
+            # Enable termination protection - https://docs.aws.amazon.com/cdk/v2/guide/cfn_layer.html#cfn_layer_resource
+            cfn_cache_instance_edge = cache_instance_edge.node.default_child
+            cfn_cache_instance_edge.disable_api_termination=True
+            if zone.name in placement_groups:
+                cfn_cache_instance_edge.placement_group_name = placement_groups[zone.name].ref
+            if self.cache_data_security_group:
+                self.add_cache_data_interface(edge_friendly_name, cache_instance_edge,
+                                              network_cdk_stack.local_zone_subnets[zone.name],
+                                              network_profile.ena_express)
+            self.cache_instances.append((edge_friendly_name, cache_instance_edge, "/dev/sda2"))
+            self.edge_caches.append((edge_friendly_name, cache_instance_edge))
 
         # Attach SSM Doc to instances
         instance_domain_join = ssm.CfnAssociation(self, "domain-join",
@@ -234,4 +407,30 @@ class InstanceCdkStack(Stack):
                                                   )],
                                                   wait_for_success_timeout_seconds=300
                                                   )
-        instance_domain_join.add_dependency(cfn_document)
\ No newline at end of file
+        instance_domain_join.add_dependency(cfn_document)
+
+    def add_cache_data_interface(self, friendly_name, instance, subnet, ena_express):
+        # Second interface in the Local Zone subnet; point the workstations' cache clients at its address
+        interface = ec2.CfnNetworkInterface(self, friendly_name + "-data-eni",
+                                            subnet_id=subnet.attr_subnet_id,
+                                            group_set=[self.cache_data_security_group.security_group_id],
+                                            description=friendly_name + " cache data path",
+                                            tags=[CfnTag(
+                                                key="Name",
+                                                value=friendly_name + "-data-eni"
+                                            )]
+                                            )
+        attachment = ec2.CfnNetworkInterfaceAttachment(self, friendly_name + "-data-eni-attachment",
+                                                       instance_id=instance.instance_id,
+                                                       network_interface_id=interface.ref,
+                                                       device_index="1",
+                                                       delete_on_termination=True
+                                                       )
+        if ena_express:
+            # Not modelled by this aws-cdk-lib version
+            attachment.add_property_override("EnaSrdSpecification", {
+                "EnaSrdEnabled": True,
+                "EnaSrdUdpSpecification": {"EnaSrdUdpEnabled": False},
+            })
+        CfnOutput(self, friendly_name + "-data-ip", value=interface.attr_primary_private_ip_address,
+                  description=friendly_name + " cache data path address")
@@ -0,0 +1,131 @@
+# Published EBS and instance store limits used to validate cache volumes at synth time.
+# Sources: EBS volume types and EBS-optimized instance pages in the Amazon EC2 user guide.
+# Instance types missing from these tables are not checked against instance limits.
+
+# volume type: (min GiB, max GiB, min IOPS, max IOPS, max IOPS per GiB, min MiB/s, max MiB/s)
+# IOPS and throughput are None where the volume type does not accept them.
+EBS_VOLUME_LIMITS = {
+    "gp2": (1, 16384, None, None, None, None, None),
+    "gp3": (1, 16384, 3000, 16000, 500, 125, 1000),
+    "io1": (4, 16384, 100, 64000, 50, None, None),
+    "io2": (4, 16384, 100, 64000, 500, None, None),
+    "st1": (125, 16384, None, None, None, None, None),
+    "sc1": (125, 16384, None, None, None, None, None),
+    "standard": (1, 1024, None, None, None, None, None),
+}
+
+# gp3 allows at most 0.25 MiB/s of throughput per provisioned IOPS
+GP3_MAX_THROUGHPUT_PER_IOPS = 0.25
+
+# Volume throughput is in MiB/s and instance bandwidth in MB/s
+MB_PER_MIB = 1.048576
+
+# instance type: (max EBS throughput MB/s, max EBS IOPS)
+INSTANCE_EBS_LIMITS = {
+    "t3.xlarge": (347.5, 15700),
+    "t3.2xlarge": (347.5, 15700),
+    "m5.xlarge": (593.75, 18750),
+    "m5.2xlarge": (593.75, 18750),
+    "m5.4xlarge": (593.75, 18750),
+    "m5.8xlarge": (850, 30000),
+    "r5.xlarge": (593.75, 18750),
+    "r5.2xlarge": (593.75, 18750),
+    "r5.4xlarge": (593.75, 18750),
+    "r5.8xlarge": (850, 30000),
+    "r5d.xlarge": (593.75, 18750),
+    "r5d.2xlarge": (593.75, 18750),
+    "r5d.4xlarge": (593.75, 18750),
+    "r5d.8xlarge": (850, 30000),
+    "g4dn.xlarge": (437.5, 20000),
+    "g4dn.2xlarge": (437.5, 20000),
+    "g4dn.4xlarge": (437.5, 20000),
+    "g4dn.8xlarge": (875, 40000),
+    "i3.xlarge": (106.25, 6000),
+    "i3.2xlarge": (212.5, 12000),
+    "i3.4xlarge": (437.5, 16000),
+    "i4i.xlarge": (1250, 40000),
+    "i4i.2xlarge": (1250, 40000),
+    "i4i.4xlarge": (1250, 40000),
+}
+
+# instance type: (NVMe instance store devices, GB per device)
+INSTANCE_STORE = {
+    "r5d.xlarge": (1, 150),
+    "r5d.2xlarge": (1, 300),
+    "r5d.4xlarge": (2, 300),
+    "r5d.8xlarge": (2, 600),
+    "m5d.xlarge": (1, 150),
+    "m5d.2xlarge": (1, 300),
+    "m5d.4xlarge": (2, 300),
+    "c5d.xlarge": (1, 100),
+    "c5d.2xlarge": (1, 200),
+    "c5d.4xlarge": (1, 400),
+    "g4dn.xlarge": (1, 125),
+    "g4dn.2xlarge": (1, 225),
+    "g4dn.4xlarge": (1, 225),
+    "g4dn.8xlarge": (1, 900),
+    "i3.xlarge": (1, 950),
+    "i3.2xlarge": (1, 1900),
+    "i3.4xlarge": (2, 1900),
+    "i4i.xlarge": (1, 937),
+    "i4i.2xlarge": (1, 1875),
+    "i4i.4xlarge": (1, 3750),
+}
+
+
+def validate_ebs_volume(where, instance_type, size, volume_type=None, iops=None, throughput=None):
+    """Raise ValueError if the volume settings are outside the volume type or instance limits."""
+    volume_type = volume_type or "gp2"
+    if volume_type not in EBS_VOLUME_LIMITS:
+        raise ValueError(f"{where}: unknown volume_type '{volume_type}', expected one of {sorted(EBS_VOLUME_LIMITS)}")
+    min_size, max_size, min_iops, max_iops, iops_per_gib, min_tput, max_tput = EBS_VOLUME_LIMITS[volume_type]
+
+    if not min_size <= size <= max_size:
+        raise ValueError(f"{where}: {volume_type} volumes must be {min_size}-{max_size} GiB, got {size}")
+    if iops is not None:
+        if min_iops is None:
+            raise ValueError(f"{where}: {volume_type} volumes do not accept provisioned iops")
+        if not min_iops <= iops <= min(max_iops, size * iops_per_gib):
+            raise ValueError(f"{where}: {volume_type} iops must be {min_iops}-{min(max_iops, size * iops_per_gib)} "
+                             f"for a {size} GiB volume, got {iops}")
+    elif volume_type in ("io1", "io2"):
+        raise ValueError(f"{where}: {volume_type} volumes need provisioned iops")
+    if throughput is not None:
+        if min_tput is None:
+            raise ValueError(f"{where}: {volume_type} volumes do not accept provisioned throughput")
+        if not min_tput <= throughput <= max_tput:
+            raise ValueError(f"{where}: {volume_type} throughput must be {min_tput}-{max_tput} MiB/s, got {throughput}")
+        if throughput > (iops or min_iops) * GP3_MAX_THROUGHPUT_PER_IOPS:
+            raise ValueError(f"{where}: gp3 throughput {throughput} MiB/s needs at least "
+                             f"{int(throughput / GP3_MAX_THROUGHPUT_PER_IOPS)} iops")
+
+    if instance_type in INSTANCE_EBS_LIMITS:
+        max_instance_tput, max_instance_iops = INSTANCE_EBS_LIMITS[instance_type]
+        if iops is not None and iops > max_instance_iops:
+            raise ValueError(f"{where}: {iops} iops exceeds the {max_instance_iops} EBS iops of {instance_type}")
+        if throughput is not None and throughput * MB_PER_MIB > max_instance_tput:
+            raise ValueError(f"{where}: {throughput} MiB/s ({throughput * MB_PER_MIB:.1f} MB/s) exceeds the "
+                             f"{max_instance_tput} MB/s EBS bandwidth of {instance_type}")
+
+
+def validate_instance_store(where, instance_type):
+    """Return (devices, GB per device) for an instance type with NVMe instance store, else raise."""
+    if instance_type not in INSTANCE_STORE:
+        raise ValueError(f"{where}: {instance_type} has no known NVMe instance store, use one of "
+                         f"{sorted(INSTANCE_STORE)}")
+    return INSTANCE_STORE[instance_type]
+
+# Instance types that support ENA Express, from the ENA Express page of the Amazon EC2 user guide.
+# Unlike the tables above, types missing here are rejected.
+ENA_EXPRESS = {
+    "c6gn.16xlarge", "c6i.32xlarge", "c6id.32xlarge", "c6in.32xlarge", "c7g.16xlarge", "c7gn.16xlarge",
+    "m6i.32xlarge", "m6id.32xlarge", "m6idn.32xlarge", "m6in.32xlarge", "m7g.16xlarge",
+    "r6i.32xlarge", "r6id.32xlarge", "r6idn.32xlarge", "r6in.32xlarge", "r7g.16xlarge",
+    "x2idn.32xlarge", "x2iedn.32xlarge",
+}
+
+
+def validate_ena_express(where, instance_type):
+    """Raise ValueError if the instance type does not support ENA Express."""
+    if instance_type not in ENA_EXPRESS:
+        raise ValueError(f"{where}: {instance_type} does not support ENA Express, use one of {sorted(ENA_EXPRESS)}")
@@ -0,0 +1,173 @@
+"""Scale the throughput capacity of an FSx for NetApp ONTAP file system.
+
+Runs on a schedule. Reads the file system's throughput and SSD IOPS
+utilization from CloudWatch over the evaluation window and moves
+throughput_capacity between MIN_CAPACITY and MAX_CAPACITY:
+
+    * up, to the smallest capacity that brings utilization back to
+      TARGET_UTILIZATION, when the average over the window is above
+      SCALE_UP_THRESHOLD;
+    * down one step when every datapoint in the window is below
+      SCALE_DOWN_THRESHOLD and the projected utilization at the lower
+      capacity stays under the midpoint of the two thresholds.
+
+No change is made while an update is in progress or within COOLDOWN_MINUTES
+of the last throughput update. Scaler takes the FSx and CloudWatch clients
+so it can be driven with stubbed clients.
+"""
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+MB = 1024 * 1024
+PERIOD_S = 60
+
+
+@dataclass(frozen=True)
+class Settings:
+    file_system_id: str
+    capacities: tuple
+    min_capacity: int
+    max_capacity: int
+    scale_up_threshold: float = 0.8
+    scale_down_threshold: float = 0.3
+    target_utilization: float = 0.6
+    evaluation_minutes: int = 15
+    cooldown_minutes: int = 360
+    dry_run: bool = False
+
+    @classmethod
+    def from_env(cls, env=os.environ):
+        return cls(
+            file_system_id=env["FILE_SYSTEM_ID"],
+            capacities=tuple(int(c) for c in env["CAPACITIES"].split(",")),
+            min_capacity=int(env["MIN_CAPACITY"]),
+            max_capacity=int(env["MAX_CAPACITY"]),
+            scale_up_threshold=float(env.get("SCALE_UP_THRESHOLD", 0.8)),
+            scale_down_threshold=float(env.get("SCALE_DOWN_THRESHOLD", 0.3)),
+            target_utilization=float(env.get("TARGET_UTILIZATION", 0.6)),
+            evaluation_minutes=int(env.get("EVALUATION_MINUTES", 15)),
+            cooldown_minutes=int(env.get("COOLDOWN_MINUTES", 360)),
+            dry_run=env.get("DRY_RUN", "false").lower() == "true",
+        )
+
+    @property
+    def allowed(self):
+        return [c for c in self.capacities if self.min_capacity <= c <= self.max_capacity]
+
+
+def decide(settings, current, samples):
+    """Return (new capacity or None, reason) for utilization samples (fractions, oldest first)."""
+    allowed = settings.allowed
+    if current < settings.min_capacity:
+        return allowed[0], f"capacity {current} below the minimum"
+    if current > settings.max_capacity:
+        return allowed[-1], f"capacity {current} above the maximum"
+
+    if not samples:
+        return None, "no utilization data"
+    average = sum(samples) / len(samples)
+    peak = max(samples)
+
+    if average > settings.scale_up_threshold:
+        needed = current * average / settings.target_utilization
+        larger = [c for c in allowed if c > current]
+        if not larger:
+            return None, f"utilization {average:.0%} but already at the maximum {current}"
+        target = next((c for c in larger if c >= needed), larger[-1])
+        return target, f"average utilization {average:.0%} above {settings.scale_up_threshold:.0%}"
+
+    if peak < settings.scale_down_threshold:
+        smaller = [c for c in allowed if c < current]
+        if not smaller:
+            return None, f"utilization {peak:.0%} but already at the minimum {current}"
+        target = smaller[-1]
+        # Hysteresis: do not step down into a capacity that would scale straight back up
+        projected = peak * current / target
+        ceiling = (settings.scale_up_threshold + settings.scale_down_threshold) / 2
+        if projected >= ceiling:
+            return None, f"projected utilization {projected:.0%} at {target} would be above {ceiling:.0%}"
+        return target, f"peak utilization {peak:.0%} below {settings.scale_down_threshold:.0%}"
+
+    return None, f"utilization {average:.0%} average, {peak:.0%} peak within thresholds"
+
+
+class Scaler:
+
+    def __init__(self, settings, fsx, cloudwatch, now=None):
+        self.settings = settings
+        self.fsx = fsx
+        self.cloudwatch = cloudwatch
+        self.now = now or (lambda: datetime.now(timezone.utc))
+
+    def describe(self):
+        response = self.fsx.describe_file_systems(FileSystemIds=[self.settings.file_system_id])
+        return response["FileSystems"][0]
+
+    def cooling_down(self, file_system):
+        # Any pending update blocks another; completed throughput updates start the cooldown
+        cutoff = self.now() - timedelta(minutes=self.settings.cooldown_minutes)
+        for action in file_system.get("AdministrativeActions", []):
+            if action.get("AdministrativeActionType") != "FILE_SYSTEM_UPDATE":
+                continue
+            if action.get("Status") in ("PENDING", "IN_PROGRESS", "UPDATED_OPTIMIZING"):
+                return f"update {action.get('Status').lower()}"
+            throughput = action.get("TargetFileSystemValues", {}).get("OntapConfiguration", {}).get("ThroughputCapacity")
+            if throughput is not None and action.get("RequestTime") and action["RequestTime"] > cutoff:
+                return f"last throughput update at {action['RequestTime'].isoformat()}"
+        return None
+
+    def utilization(self, capacity):
+        """Per-minute max of throughput and SSD IOPS utilization over the evaluation window."""
+        end = self.now()
+        start = end - timedelta(minutes=self.settings.evaluation_minutes)
+        dimensions = [{"Name": "FileSystemId", "Value": self.settings.file_system_id}]
+
+        def metric(query_id, name, stat):
+            return {"Id": query_id, "ReturnData": False, "MetricStat": {
+                "Metric": {"Namespace": "AWS/FSx", "MetricName": name, "Dimensions": dimensions},
+                "Period": PERIOD_S, "Stat": stat}}
+
+        queries = [
+            metric("read", "DataReadBytes", "Sum"),
+            metric("write", "DataWriteBytes", "Sum"),
+            metric("iops", "DiskIopsUtilization", "Average"),
+            {"Id": "throughput", "ReturnData": True,
+             "Expression": f"(FILL(read, 0) + FILL(write, 0)) / {PERIOD_S * MB * capacity}"},
+            {"Id": "ssd", "ReturnData": True, "Expression": "FILL(iops, 0) / 100"},
+        ]
+        response = self.cloudwatch.get_metric_data(MetricDataQueries=queries, StartTime=start, EndTime=end,
+                                                   ScanBy="TimestampAscending")
+        series = {}
+        for result in response["MetricDataResults"]:
+            for timestamp, value in zip(result["Timestamps"], result["Values"]):
+                series[timestamp] = max(series.get(timestamp, 0.0), value)
+        return [series[t] for t in sorted(series)]
+
+    def run(self):
+        file_system = self.describe()
+        current = file_system["OntapConfiguration"]["ThroughputCapacity"]
+        result = {"file_system_id": self.settings.file_system_id, "current": current, "target": None}
+
+        blocked = self.cooling_down(file_system)
+        if blocked:
+            result["reason"] = f"cooling down: {blocked}"
+            return result
+
+        samples = self.utilization(current)
+        target, reason = decide(self.settings, current, samples)
+        result.update(target=target, reason=reason, samples=len(samples))
+        if target is not None and target != current and not self.settings.dry_run:
+            self.fsx.update_file_system(FileSystemId=self.settings.file_system_id,
+                                        OntapConfiguration={"ThroughputCapacity": target})
+        return result
+
+
+def handler(event, context):
+    import boto3
+
+    scaler = Scaler(Settings.from_env(), boto3.client("fsx"), boto3.client("cloudwatch"))
+    result = scaler.run()
+    print(json.dumps(result))
+    return result
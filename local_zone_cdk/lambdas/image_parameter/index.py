@@ -0,0 +1,30 @@
+"""Point a role's SSM image parameter at a newly built Image Builder image.
+
+Triggered by EC2 Image Builder "Image State Change" events. When an image
+from the role's pipeline becomes AVAILABLE, its AMI in this region is
+written to PARAMETER_NAME. Instances keep launching from the image pinned
+for their image_version; this parameter records the newest build.
+"""
+import os
+
+
+def latest_ami(imagebuilder, image_arn, region):
+    image = imagebuilder.get_image(imageBuildVersionArn=image_arn)["image"]
+    for ami in image.get("outputResources", {}).get("amis", []):
+        if ami.get("region") == region:
+            return ami["image"]
+    return None
+
+
+def handler(event, context):
+    import boto3
+
+    if event.get("detail", {}).get("state", {}).get("status") != "AVAILABLE":
+        return None
+    region = os.environ["AWS_REGION"]
+    ami = latest_ami(boto3.client("imagebuilder"), event["resources"][0], region)
+    if ami:
+        boto3.client("ssm").put_parameter(Name=os.environ["PARAMETER_NAME"], Value=ami, Type="String",
+                                          DataType="aws:ec2:image", Overwrite=True)
+    print(f"{event['resources'][0]}: {ami}")
+    return ami
@@ -1,3 +1,5 @@
+import ipaddress
+
 from aws_cdk import (
     Stack,
     CfnTag
@@ -7,11 +9,15 @@ import aws_cdk.aws_ec2 as ec2
 from aws_cdk import aws_logs as logs
 from constructs import Construct
 
+from local_zone_cdk.config import LocalZone
+
 class NetworkCdkStack(Stack):
 
-    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+    def __init__(self, scope: Construct, construct_id: str, local_zones=None, profile=None, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        local_zones = local_zones or [LocalZone()]
+
         # # This stack is for shared and prerequisite resources
 
         # ManagedAD secret to provision directory services
@@ -46,39 +52,51 @@ class NetworkCdkStack(Stack):
             traffic_type=ec2.FlowLogTrafficType.ALL,
         )
 
-        # Create Perth subnet in Workoad vpc
-        self.sn = ec2.CfnSubnet(self, "perth-lz-subnet", vpc_id=self.workload_vpc.vpc_id,
-                                availability_zone="ap-southeast-2-per-1a", cidr_block="10.0.50.0/24", map_public_ip_on_launch=True,                                                    
-                                tags=[CfnTag(
-                                    key="Name",
-                                    value="perth-lz-subnet"
-                                )])
-
-        # Create Perth route table in Workoad vpc
-        self.perth_route_table = ec2.CfnRouteTable(self, "perth-lz-route-table",
-                                                   vpc_id=self.workload_vpc.vpc_id,
-                                                   tags=[CfnTag(
-                                                       key="Name",
-                                                       value="perth-lz-route-table"
-                                                   )]
-                                                   )
-        self.perth_route_table.add_dependency(self.sn)
-
-        # Add route to internet for Perth Subnet
-        cfn_route = ec2.CfnRoute(self, "perth-internet-route",
-                                 route_table_id=self.perth_route_table.attr_route_table_id,
-                                 destination_cidr_block="0.0.0.0/0",
-                                 gateway_id=self.workload_vpc.internet_gateway_id,
-                                 )
-
-        # Associate the route table with the subnet
-        cfn_subnet_route_table_association = ec2.CfnSubnetRouteTableAssociation(self, "perth-route-table-association",
-                                                                                route_table_id=self.perth_route_table.attr_route_table_id,
-                                                                                subnet_id=self.sn.attr_subnet_id
-                                                                                )
-        cfn_subnet_route_table_association.add_dependency(
-            self.perth_route_table)
-        
+        # Create a subnet and route table in the workload VPC for each Local Zone
+        self.local_zone_subnets = {}
+        self.local_zone_route_tables = {}
+        for zone in local_zones:
+            for subnet in self.workload_vpc.public_subnets + self.workload_vpc.private_subnets:
+                if ipaddress.ip_network(zone.cidr_block).overlaps(ipaddress.ip_network(subnet.ipv4_cidr_block)):
+                    raise ValueError(f"local zone '{zone.name}': cidr_block {zone.cidr_block} overlaps "
+                                     f"VPC subnet {subnet.ipv4_cidr_block}")
+
+            sn = ec2.CfnSubnet(self, f"{zone.name}-lz-subnet", vpc_id=self.workload_vpc.vpc_id,
+                               availability_zone=zone.availability_zone, cidr_block=zone.cidr_block, map_public_ip_on_launch=True,
+                               tags=[CfnTag(
+                                   key="Name",
+                                   value=f"{zone.name}-lz-subnet"
+                               )])
+
+            route_table = ec2.CfnRouteTable(self, f"{zone.name}-lz-route-table",
+                                            vpc_id=self.workload_vpc.vpc_id,
+                                            tags=[CfnTag(
+                                                key="Name",
+                                                value=f"{zone.name}-lz-route-table"
+                                            )]
+                                            )
+            route_table.add_dependency(sn)
+
+            # Add route to internet for the Local Zone subnet
+            cfn_route = ec2.CfnRoute(self, f"{zone.name}-internet-route",
+                                     route_table_id=route_table.attr_route_table_id,
+                                     destination_cidr_block="0.0.0.0/0",
+                                     gateway_id=self.workload_vpc.internet_gateway_id,
+                                     )
+
+            # Associate the route table with the subnet
+            cfn_subnet_route_table_association = ec2.CfnSubnetRouteTableAssociation(self, f"{zone.name}-route-table-association",
+                                                                                    route_table_id=route_table.attr_route_table_id,
+                                                                                    subnet_id=sn.attr_subnet_id
+                                                                                    )
+            cfn_subnet_route_table_association.add_dependency(route_table)
+
+            self.local_zone_subnets[zone.name] = sn
+            self.local_zone_route_tables[zone.name] = route_table
+
+        # The first zone is Perth in the original layout
+        self.sn = self.local_zone_subnets[local_zones[0].name]
+        self.perth_route_table = self.local_zone_route_tables[local_zones[0].name]
 
         # Iterate the private subnets
         selection = self.workload_vpc.select_subnets(
@@ -86,8 +104,30 @@ class NetworkCdkStack(Stack):
         )
 
         # Store the private route table id's for later
-        self.private_route_tables = []
-        self.private_route_tables.append(self.perth_route_table.attr_route_table_id)
+        self.private_route_tables = [route_table.attr_route_table_id
+                                     for route_table in self.local_zone_route_tables.values()]
         
         for subnet in selection.subnets:
-            self.private_route_tables.append(subnet.route_table.route_table_id)
\ No newline at end of file
+            self.private_route_tables.append(subnet.route_table.route_table_id)
+
+        # VPC endpoints from the network profile keep SSM and S3 traffic (such as the dcv-license
+        # bucket) off the internet route of the Local Zone subnets
+        if profile and profile.s3_endpoint:
+            # A gateway endpoint is a route table target, so the Local Zone route tables can use it too
+            self.s3_endpoint = ec2.CfnVPCEndpoint(self, "s3-endpoint",
+                                                  vpc_id=self.workload_vpc.vpc_id,
+                                                  service_name=ec2.GatewayVpcEndpointAwsService.S3.name,
+                                                  vpc_endpoint_type="Gateway",
+                                                  route_table_ids=self.private_route_tables
+                                                  )
+        if profile and profile.ssm_endpoints:
+            # Interface endpoints live in the region's private subnets; Local Zones cannot host them
+            for name, service in (("ssm", ec2.InterfaceVpcEndpointAwsService.SSM),
+                                  ("ssmmessages", ec2.InterfaceVpcEndpointAwsService.SSM_MESSAGES),
+                                  ("ec2messages", ec2.InterfaceVpcEndpointAwsService.EC2_MESSAGES)):
+                self.workload_vpc.add_interface_endpoint(f"{name}-endpoint",
+                                                         service=service,
+                                                         subnets=ec2.SubnetSelection(
+                                                             subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS),
+                                                         private_dns_enabled=True
+                                                         )
@@ -0,0 +1,102 @@
+import json
+from dataclasses import dataclass, field, fields
+from typing import List, Optional
+
+from local_zone_cdk.instance_limits import validate_ena_express
+
+# Network-performance profile for the Local Zone data path.
+#
+# Enabled from CDK context with a "network_profile" object in cdk.json, or
+# -c network_profile='{"placement_strategy": "cluster", "cache_security_group": true}'.
+# Without it the network and instances are deployed as before.
+#
+#   placement_strategy    cluster, partition or spread placement group per Local
+#                         Zone for its workstations and edge cache
+#   placement_zones       names of the Local Zones to place, default all of them;
+#                         leave out zones that do not support the strategy
+#   cache_security_group  edge caches get their own security group instead of
+#                         sharing the workstations' one
+#   cache_data_eni        a second network interface per edge cache, in its own
+#                         security group, for cache traffic from the workstations
+#   ena_express           ENA Express (SRD) on the cache data interfaces
+#   path_mtu_discovery    allow ICMP "fragmentation needed" from the VPC, so jumbo
+#                         frames inside a zone can fall back on smaller-MTU paths
+#   s3_endpoint           S3 gateway endpoint on the private and Local Zone route tables
+#   ssm_endpoints         ssm, ssmmessages and ec2messages interface endpoints
+#
+# Placement groups and ENA Express are not offered in every Local Zone or for
+# every instance type; CloudFormation rejects the instances where they are not.
+
+PLACEMENT_STRATEGIES = ("cluster", "partition", "spread")
+# Running instances per spread placement group in one zone, and partitions per partition group
+MAX_SPREAD_INSTANCES = 7
+MAX_PARTITIONS = 7
+
+
+@dataclass(frozen=True)
+class NetworkProfile:
+    placement_strategy: Optional[str] = None
+    placement_zones: Optional[List[str]] = None
+    partition_count: int = 2
+    cache_security_group: bool = False
+    cache_data_eni: bool = False
+    ena_express: bool = False
+    path_mtu_discovery: bool = True
+    s3_endpoint: bool = False
+    ssm_endpoints: bool = False
+    cache_ports: List[int] = field(default_factory=lambda: [445, 8080])
+
+    @classmethod
+    def from_dict(cls, values):
+        if not isinstance(values, dict):
+            raise ValueError(f"network_profile: must be an object, got {values!r}")
+        unknown = set(values) - {f.name for f in fields(cls)}
+        if unknown:
+            raise ValueError(f"network_profile: unknown keys {sorted(unknown)}")
+        profile = cls(**values)
+        if profile.placement_strategy not in (None,) + PLACEMENT_STRATEGIES:
+            raise ValueError(f"network_profile placement_strategy: must be one of {list(PLACEMENT_STRATEGIES)}, "
+                             f"got {profile.placement_strategy!r}")
+        if profile.placement_zones is not None and not profile.placement_strategy:
+            raise ValueError("network_profile: placement_zones needs a placement_strategy")
+        if not isinstance(profile.partition_count, int) or not 1 <= profile.partition_count <= MAX_PARTITIONS:
+            raise ValueError(f"network_profile partition_count: must be 1-{MAX_PARTITIONS}, "
+                             f"got {profile.partition_count!r}")
+        if "partition_count" in values and profile.placement_strategy != "partition":
+            raise ValueError("network_profile: partition_count only applies to the partition strategy")
+        if profile.ena_express and not profile.cache_data_eni:
+            raise ValueError("network_profile: ena_express is set on the cache data interfaces, "
+                             "so it needs cache_data_eni")
+        if not profile.cache_ports or not all(isinstance(port, int) and 0 < port < 65536
+                                              for port in profile.cache_ports):
+            raise ValueError(f"network_profile cache_ports: must be a list of TCP ports, got {profile.cache_ports!r}")
+        return profile
+
+    @classmethod
+    def from_context(cls, node):
+        values = node.try_get_context("network_profile")
+        if isinstance(values, str):
+            # -c on the command line passes the object as JSON text
+            values = json.loads(values)
+        return cls.from_dict(values) if values else None
+
+    def validate(self, fleet):
+        """Raise ValueError if the profile does not fit the fleet config."""
+        zone_names = [zone.name for zone in fleet.local_zones]
+        unknown = sorted(set(self.placement_zones or []) - set(zone_names))
+        if unknown:
+            raise ValueError(f"network_profile placement_zones: unknown local zones {unknown}, "
+                             f"expected some of {zone_names}")
+        for zone in fleet.local_zones:
+            if self.placed(zone) and self.placement_strategy == "spread":
+                # The workstations plus the edge cache
+                count = sum(group.count for group in zone.workstations) + 1
+                if count > MAX_SPREAD_INSTANCES:
+                    raise ValueError(f"network_profile: a spread placement group holds at most "
+                                     f"{MAX_SPREAD_INSTANCES} instances, local zone '{zone.name}' has {count}")
+            if self.ena_express:
+                validate_ena_express(f"network_profile ena_express, local zone '{zone.name}' edge_cache",
+                                     zone.edge_cache.instance_type)
+
+    def placed(self, zone):
+        return bool(self.placement_strategy) and (self.placement_zones is None or zone.name in self.placement_zones)
@@ -0,0 +1,198 @@
+from aws_cdk import (
+    Stack,
+    Duration
+)
+
+import aws_cdk.aws_cloudwatch as cw
+import aws_cdk.aws_cloudwatch_actions as cw_actions
+import aws_cdk.aws_sns as sns
+import aws_cdk.aws_sns_subscriptions as subscriptions
+from aws_cdk import custom_resources as cr
+
+from constructs import Construct
+
+# Params
+# Custom metrics published by local_zone_tools.metrics
+NAMESPACE = "SeismicLocalZone"
+PERIOD = Duration.minutes(1)
+FSX_READ_LATENCY_MS = 10
+FSX_THROUGHPUT_ALARM_FRACTION = 0.9
+EBS_QUEUE_LENGTH = 8
+CACHE_HIT_RATE_PERCENT = 80
+
+
+class ObservabilityCdkStack(Stack):
+
+    def __init__(self, scope: Construct, construct_id: str, storage_cdk_stack, instance_cdk_stack, alarm_email=None, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        # # This stack is for dashboards and alarms on the Perth data path
+        self.alarm_topic = sns.Topic(self, "perth-data-path-alarms",
+                                     display_name="Perth data path alarms")
+        if alarm_email:
+            self.alarm_topic.add_subscription(subscriptions.EmailSubscription(alarm_email))
+        self.alarms = []
+
+        # FSx for NetApp ONTAP
+        fsx_dimensions = {"FileSystemId": storage_cdk_stack.file_system.ref}
+
+        def fsx_metric(name, statistic="Sum"):
+            return cw.Metric(namespace="AWS/FSx", metric_name=name, dimensions_map=fsx_dimensions,
+                             statistic=statistic, period=PERIOD)
+
+        fsx_read_mb_s = cw.MathExpression(expression="FILL(r, 0) / PERIOD(r) / 1048576",
+                                          using_metrics={"r": fsx_metric("DataReadBytes")},
+                                          label="Read MB/s", period=PERIOD)
+        fsx_write_mb_s = cw.MathExpression(expression="FILL(w, 0) / PERIOD(w) / 1048576",
+                                           using_metrics={"w": fsx_metric("DataWriteBytes")},
+                                           label="Write MB/s", period=PERIOD)
+        fsx_total_mb_s = cw.MathExpression(expression="(FILL(r, 0) + FILL(w, 0)) / PERIOD(r) / 1048576",
+                                           using_metrics={"r": fsx_metric("DataReadBytes"),
+                                                          "w": fsx_metric("DataWriteBytes")},
+                                           label="Total MB/s", period=PERIOD)
+        # FSx for ONTAP only publishes the operation time metrics per volume (FileSystemId and VolumeId), so
+        # latency is graphed and alarmed on each volume
+        def volume_metric(volume, name):
+            return cw.Metric(namespace="AWS/FSx", metric_name=name,
+                             dimensions_map={**fsx_dimensions, "VolumeId": volume.attr_volume_id},
+                             statistic="Sum", period=PERIOD)
+
+        fsx_read_latency, fsx_write_latency = [], []
+        for i, volume in enumerate(storage_cdk_stack.volumes):
+            # Metric ids must be unique across the expressions of one graph
+            fsx_read_latency.append(cw.MathExpression(
+                expression=f"IF(rops{i} > 0, 1000 * rtime{i} / rops{i}, 0)",
+                using_metrics={f"rtime{i}": volume_metric(volume, "DataReadOperationTime"),
+                               f"rops{i}": volume_metric(volume, "DataReadOperations")},
+                label=f"{volume.name} read latency (ms)", period=PERIOD))
+            fsx_write_latency.append(cw.MathExpression(
+                expression=f"IF(wops{i} > 0, 1000 * wtime{i} / wops{i}, 0)",
+                using_metrics={f"wtime{i}": volume_metric(volume, "DataWriteOperationTime"),
+                               f"wops{i}": volume_metric(volume, "DataWriteOperations")},
+                label=f"{volume.name} write latency (ms)", period=PERIOD))
+
+        fsx_iops_utilization = fsx_metric("DiskIopsUtilization", "Average")
+
+        throughput_threshold = FSX_THROUGHPUT_ALARM_FRACTION * storage_cdk_stack.max_throughput_capacity
+        for i, (volume, read_latency) in enumerate(zip(storage_cdk_stack.volumes, fsx_read_latency)):
+            self.add_alarm("fsx-read-latency" if i == 0 else f"fsx-read-latency-{volume.name}", read_latency,
+                           FSX_READ_LATENCY_MS,
+                           f"FSx average read latency of volume {volume.name} above {FSX_READ_LATENCY_MS} ms")
+        self.add_alarm("fsx-throughput", fsx_total_mb_s, throughput_threshold,
+                       f"FSx throughput above {throughput_threshold:.0f} MB/s, "
+                       f"{FSX_THROUGHPUT_ALARM_FRACTION:.0%} of its highest throughput capacity",
+                       evaluation_periods=15, datapoints_to_alarm=10)
+
+        # EBS queue depth on the cache volumes; volume ids are looked up from the instance attachments
+        queue_metrics = []
+        for name, instance, device in instance_cdk_stack.cache_instances:
+            volume_lookup = cr.AwsCustomResource(self, f"{name}-volume",
+                on_update=cr.AwsSdkCall(
+                    service="EC2",
+                    action="describeVolumes",
+                    parameters={"Filters": [
+                        {"Name": "attachment.instance-id", "Values": [instance.instance_id]},
+                        {"Name": "attachment.device", "Values": [device]},
+                    ]},
+                    physical_resource_id=cr.PhysicalResourceId.from_response("Volumes.0.VolumeId"),
+                    output_paths=["Volumes.0.VolumeId"],
+                ),
+                policy=cr.AwsCustomResourcePolicy.from_sdk_calls(
+                    resources=cr.AwsCustomResourcePolicy.ANY_RESOURCE),
+            )
+            queue_length = cw.Metric(namespace="AWS/EBS", metric_name="VolumeQueueLength",
+                                     dimensions_map={"VolumeId": volume_lookup.get_response_field("Volumes.0.VolumeId")},
+                                     statistic="Average", period=PERIOD, label=name)
+            queue_metrics.append(queue_length)
+            self.add_alarm(f"{name}-queue-length", queue_length, EBS_QUEUE_LENGTH,
+                           f"{name} cache volume queue length above {EBS_QUEUE_LENGTH}")
+
+        # Network in/out on the edge caches and workstations in the Local Zones
+        perth_instances = instance_cdk_stack.edge_caches + [
+            (workstation.node.id, workstation) for workstation in instance_cdk_stack.workstations]
+
+        def instance_metric(name, label, instance, i):
+            return cw.MathExpression(expression=f"FILL(m{i}, 0) / PERIOD(m{i}) / 1048576",
+                                     using_metrics={f"m{i}": cw.Metric(namespace="AWS/EC2", metric_name=name,
+                                                                   dimensions_map={"InstanceId": instance.instance_id},
+                                                                   statistic="Sum", period=PERIOD)},
+                                     label=label, period=PERIOD)
+
+        network_in = [instance_metric("NetworkIn", name, instance, i)
+                      for i, (name, instance) in enumerate(perth_instances)]
+        network_out = [instance_metric("NetworkOut", name, instance, i)
+                       for i, (name, instance) in enumerate(perth_instances)]
+
+        # Custom metrics, one hit rate alarm per edge cache
+        cache_hit_rates = []
+        cache_from_sources = []
+        multi_zone = len(instance_cdk_stack.edge_caches) > 1
+        for i, (name, instance) in enumerate(instance_cdk_stack.edge_caches):
+            edge_cache = {"Cache": name}
+            cache_hit_rate = cw.Metric(namespace=NAMESPACE, metric_name="CacheHitRate", dimensions_map=edge_cache,
+                                       statistic="Average", period=Duration.minutes(5),
+                                       label=name if multi_zone else None)
+            cache_from_source = cw.Metric(namespace=NAMESPACE, metric_name="CacheBytesFromSource",
+                                          dimensions_map=edge_cache, statistic="Sum", period=Duration.minutes(5),
+                                          label=f"{name} from source" if multi_zone else None)
+            self.add_alarm("edge-cache-hit-rate" if i == 0 else f"{name}-hit-rate", cache_hit_rate,
+                           CACHE_HIT_RATE_PERCENT, f"{'Edge cache' if i == 0 else name} hit rate below "
+                                                   f"{CACHE_HIT_RATE_PERCENT}%",
+                           comparison_operator=cw.ComparisonOperator.LESS_THAN_THRESHOLD, evaluation_periods=3,
+                           datapoints_to_alarm=3)
+            cache_hit_rates.append(cache_hit_rate)
+            cache_from_sources.append(cache_from_source)
+
+        def search(metric_name, statistic, label):
+            return cw.MathExpression(
+                expression=f"SEARCH('Namespace=\"{NAMESPACE}\" MetricName=\"{metric_name}\"', '{statistic}', 300)",
+                using_metrics={}, label=label, period=Duration.minutes(5))
+
+        self.dashboard = cw.Dashboard(self, "perth-data-path-dashboard",
+                                      dashboard_name="perth-data-path")
+        self.dashboard.add_widgets(
+            cw.TextWidget(markdown="# Perth data path\nFSx ONTAP in Sydney, cache volumes, Local Zone "
+                                   "instances and client metrics from `local_zone_tools.metrics`",
+                          width=24, height=2))
+        self.dashboard.add_widgets(
+            cw.GraphWidget(title="FSx throughput (MB/s)", left=[fsx_read_mb_s, fsx_write_mb_s, fsx_total_mb_s],
+                           left_annotations=[cw.HorizontalAnnotation(value=throughput_threshold,
+                                                                     label="alarm")],
+                           width=8),
+            cw.GraphWidget(title="FSx latency (ms)", left=fsx_read_latency + fsx_write_latency,
+                           left_annotations=[cw.HorizontalAnnotation(value=FSX_READ_LATENCY_MS, label="alarm")],
+                           width=8),
+            cw.GraphWidget(title="FSx SSD IOPS utilization (%)", left=[fsx_iops_utilization], width=8),
+        )
+        self.dashboard.add_widgets(
+            cw.GraphWidget(title="Cache volume queue length", left=queue_metrics,
+                           left_annotations=[cw.HorizontalAnnotation(value=EBS_QUEUE_LENGTH, label="alarm")],
+                           width=8),
+            cw.GraphWidget(title="Local Zone network in (MB/s)", left=network_in, width=8),
+            cw.GraphWidget(title="Local Zone network out (MB/s)", left=network_out, width=8),
+        )
+        self.dashboard.add_widgets(
+            cw.GraphWidget(title="Edge cache hit rate (%)", left=cache_hit_rates, right=cache_from_sources,
+                           width=8),
+            cw.GraphWidget(title="Client read latency p99 (ms)",
+                           left=[search("ReadLatencyP99", "Maximum", "p99")], width=8),
+            cw.GraphWidget(title="Client read throughput (MB/s)",
+                           left=[search("ReadThroughput", "Average", "MB/s")], width=8),
+        )
+        self.dashboard.add_widgets(
+            cw.AlarmStatusWidget(title="Alarms", alarms=self.alarms, width=24))
+
+    def add_alarm(self, construct_id, metric, threshold, description,
+                  comparison_operator=cw.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                  evaluation_periods=5, datapoints_to_alarm=3):
+        alarm = cw.Alarm(self, construct_id,
+                         metric=metric,
+                         threshold=threshold,
+                         alarm_description=description,
+                         comparison_operator=comparison_operator,
+                         evaluation_periods=evaluation_periods,
+                         datapoints_to_alarm=datapoints_to_alarm,
+                         treat_missing_data=cw.TreatMissingData.NOT_BREACHING)
+        alarm.add_alarm_action(cw_actions.SnsAction(self.alarm_topic))
+        self.alarms.append(alarm)
+        return alarm
@@ -0,0 +1,62 @@
+import json
+
+from aws_cdk import Annotations
+
+# Stacks registered with a factory and only constructed when selected, or when
+# a selected stack's factory asks for them as a dependency.
+#
+# Select stacks with the "stacks" context key, comma separated:
+#   cdk synth StorageCdkStack -c stacks=StorageCdkStack
+#   cdk diff -c stacks=InstanceCdkStack,ObservabilityCdkStack
+# builds those stacks and the stacks they reference, and nothing else. Without
+# it every registered stack is built.
+#
+# Templates from a selection lack the Outputs that stacks outside it would
+# import, so use it to iterate with synth and diff, and deploy from a full
+# build (the synth cache keeps that quick).
+
+
+class LazyStacks:
+
+    def __init__(self):
+        self.factories = {}
+        self.stacks = {}
+
+    def add(self, name, factory):
+        self.factories[name] = factory
+
+    def __contains__(self, name):
+        return name in self.factories
+
+    def __getitem__(self, name):
+        if name not in self.stacks:
+            self.stacks[name] = self.factories[name]()
+        return self.stacks[name]
+
+    def get(self, name):
+        return self[name] if name in self.factories else None
+
+    def build(self, selection=None):
+        names = selection or list(self.factories)
+        unknown = [name for name in names if name not in self.factories]
+        if unknown:
+            raise ValueError(f"stacks context: unknown stacks {unknown}, expected some of {list(self.factories)}")
+        # Construct in registration order so a full build matches the original app
+        for name in self.factories:
+            if name in names:
+                self[name]
+        if selection:
+            for stack in self.stacks.values():
+                Annotations.of(stack).add_warning(
+                    f"Built for the stacks selection {names}: Outputs imported by other stacks may be "
+                    f"missing, deploy without the stacks context")
+        return [self.stacks[name] for name in names]
+
+
+def selection_from_context(node):
+    value = node.try_get_context("stacks")
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value) if value.startswith("[") else value.split(",")
+    return [name.strip() for name in value if name.strip()]
@@ -9,11 +9,20 @@ from aws_cdk import aws_fsx as fsx
 
 from constructs import Construct
 
+from local_zone_cdk.storage_plan import StoragePlan
+from local_zone_cdk.throughput_autoscaler import AutoscalingConfig, FsxThroughputAutoscaler
+
 class StorageCdkStack(Stack):
 
-    def __init__(self, scope: Construct, construct_id: str, network_cdk_stack, directory_cdk_stack, **kwargs) -> None:
+    def __init__(self, scope: Construct, construct_id: str, network_cdk_stack, directory_cdk_stack, plan: StoragePlan = None, autoscaling: AutoscalingConfig = None, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        # Throughput, SSD and volume layout come from the capacity plan, see storage_plan.py
+        plan = plan or StoragePlan()
+        if autoscaling and not autoscaling.min_capacity <= plan.throughput_capacity <= autoscaling.max_capacity:
+            raise ValueError(f"fsx_autoscaling: planned throughput capacity {plan.throughput_capacity} is outside "
+                             f"{autoscaling.min_capacity}-{autoscaling.max_capacity}")
+
         # # This stack is for storage resources
         private_subnet_ids = [
             subnet.subnet_id for subnet in network_cdk_stack.workload_vpc.private_subnets]
@@ -46,11 +55,11 @@ class StorageCdkStack(Stack):
                                                 preferred_subnet_id=private_subnet_ids[0],
                                                 route_table_ids=network_cdk_stack.private_route_tables,
                                                 endpoint_ip_address_range="10.0.255.0/24",
-                                                throughput_capacity=512,
+                                                throughput_capacity=plan.throughput_capacity,
                                             ),
                                             security_group_ids=[
                                                 self.fsx_security_group.security_group_id],
-                                            storage_capacity=1024,
+                                            storage_capacity=plan.storage_capacity,
                                             storage_type="SSD",
                                             tags=[CfnTag(
                                                 key="Name",
@@ -80,26 +89,40 @@ class StorageCdkStack(Stack):
                                                                    )]
                                                                    )
         cfn_storage_virtual_machine.add_dependency(cfn_file_system)
+        self.file_system = cfn_file_system
+        # Highest throughput capacity the file system can run at, in MBps
+        self.max_throughput_capacity = autoscaling.max_capacity if autoscaling else plan.throughput_capacity
+
+        # Scale throughput capacity with load. CloudFormation only sets ThroughputCapacity when the planned
+        # value in the template changes, so other deploys keep the autoscaler's capacity
+        if autoscaling:
+            self.throughput_autoscaler = FsxThroughputAutoscaler(self, "fsx-throughput-autoscaler",
+                                                                 file_system_id=cfn_file_system.ref,
+                                                                 config=autoscaling)
 
-        cfn_volume = fsx.CfnVolume(self, "energy-blog-ontap-volume",
-                                   name="energy_blog_ontap_volume",
-                                   ontap_configuration=fsx.CfnVolume.OntapConfigurationProperty(
-                                       size_in_megabytes="100000",
-                                       storage_virtual_machine_id=cfn_storage_virtual_machine.attr_storage_virtual_machine_id,
-                                       junction_path="/vol1",
-                                       ontap_volume_type="RW",
-                                       security_style="NTFS",
-                                       snapshot_policy="default",
-                                       storage_efficiency_enabled="true",
-                                       tiering_policy=fsx.CfnVolume.TieringPolicyProperty(
-                                           cooling_period=14,
-                                           name="AUTO"
+        # One volume per project; the first keeps the original construct id and volume name (see storage_plan.py)
+        self.volumes = []
+        for i, volume in enumerate(plan.volumes):
+            cfn_volume = fsx.CfnVolume(self, "energy-blog-ontap-volume" if i == 0 else f"energy-blog-ontap-volume-{volume.name}",
+                                       name=volume.name,
+                                       ontap_configuration=fsx.CfnVolume.OntapConfigurationProperty(
+                                           size_in_megabytes=str(volume.size_in_megabytes),
+                                           storage_virtual_machine_id=cfn_storage_virtual_machine.attr_storage_virtual_machine_id,
+                                           junction_path=volume.junction_path,
+                                           ontap_volume_type="RW",
+                                           security_style="NTFS",
+                                           snapshot_policy="default",
+                                           storage_efficiency_enabled="true",
+                                           tiering_policy=fsx.CfnVolume.TieringPolicyProperty(
+                                               cooling_period=volume.cooling_period,
+                                               name=volume.tiering_policy
+                                           )
+                                       ),
+                                       tags=[CfnTag(
+                                           key="Name",
+                                           value="energy-blog-primary-volume" if i == 0 else f"energy-blog-{volume.name}-volume"
+                                       )],
+                                       volume_type="ONTAP"
                                        )
-                                   ),
-                                   tags=[CfnTag(
-                                       key="Name",
-                                       value="energy-blog-primary-volume"
-                                   )],
-                                   volume_type="ONTAP"
-                                   )
-        cfn_volume.add_dependency(cfn_storage_virtual_machine)
+            cfn_volume.add_dependency(cfn_storage_virtual_machine)
+            self.volumes.append(cfn_volume)
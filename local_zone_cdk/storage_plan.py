@@ -0,0 +1,270 @@
+import json
+import math
+import re
+import sys
+from dataclasses import asdict, dataclass, field, replace
+from typing import List, Optional
+
+# FSx for NetApp ONTAP capacity planning for StorageCdkStack.
+#
+# Read from CDK context, either a path to a JSON workload spec:
+#   cdk synth -c workload_config=workload.json
+# or inline under the "workload" key in cdk.json. Without either, the stack
+# keeps the original layout: 512 MBps throughput capacity, 1024 GiB of SSD and
+# one 100000 MB volume at /vol1 with AUTO tiering after 14 days.
+#
+# Example:
+#   {
+#     "read_mb_s_per_seat": 80,
+#     "hot_fraction": 0.2,
+#     "projects": [
+#       {"name": "vol1", "surveys_gb": [1200, 800]},
+#       {"name": "north_shelf", "surveys_gb": [3000], "hot_fraction": 0.1, "cooling_period": 31},
+#       {"name": "wells", "surveys_gb": [50], "tiering_policy": "NONE"}
+#     ]
+#   }
+#
+# The first project's volume keeps the name and construct id of the original
+# energy_blog_ontap_volume, so a spec deployed over the default layout updates
+# that volume in place instead of replacing it and deleting its data. Name the
+# first project after the data already on it; giving it the junction path /vol1
+# keeps the share paths. The other projects get new volumes.
+#
+# seats defaults to the number of workstations in the fleet config. Synth fails
+# when the peak read rate needs more than the largest throughput capacity or
+# the hot set needs more SSD than a file system can have. To see the plan for
+# a spec without synthesizing:
+#   python -m local_zone_cdk.storage_plan workload.json
+#
+# Tiering settings per volume, for example recommended by
+# local_zone_tools.tiering, replace the planned ones. Pass the advisor output:
+#   cdk synth -c tiering_config=tiering.json
+# or set them inline under the "tiering" key in cdk.json:
+#   "tiering": {"energy_blog_ontap_volume": {"tiering_policy": "AUTO", "cooling_period": 62}}
+# Volumes can be named by their project name too.
+
+# Throughput capacities (MBps) offered for MULTI_AZ_1 file systems
+THROUGHPUT_CAPACITIES = (128, 256, 512, 1024, 2048, 4096)
+MIN_SSD_GIB = 1024
+MAX_SSD_GIB = 196608
+MAX_VOLUME_MB = 314572800
+# Keep SSD utilization under 80% so tiering has room to work
+SSD_FILL_TARGET = 0.8
+# SSD kept for the metadata of data tiered to the capacity pool
+TIERED_METADATA_FRACTION = 0.05
+TIERING_POLICIES = ("AUTO", "SNAPSHOT_ONLY", "ALL", "NONE")
+COOLING_PERIOD_RANGE = (2, 183)
+# FSx defaults when a tiering setting gives no cooling period
+DEFAULT_COOLING_PERIODS = {"AUTO": 31, "SNAPSHOT_ONLY": 2}
+
+_VOLUME_NAME = re.compile(r"^[A-Za-z0-9_]{1,203}$")
+# Name of the volume of the original layout, kept by the first project
+ORIGINAL_VOLUME_NAME = "energy_blog_ontap_volume"
+
+
+def _check_fraction(value, where):
+    if not isinstance(value, (int, float)) or not 0 <= value <= 1:
+        raise ValueError(f"{where}: must be a fraction between 0 and 1, got {value!r}")
+
+
+def _check_non_negative(value, where):
+    if not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"{where}: must be a non-negative number, got {value!r}")
+
+
+@dataclass(frozen=True)
+class Project:
+    name: str
+    surveys_gb: List[float] = field(default_factory=list)
+    hot_fraction: Optional[float] = None
+    tiering_policy: str = "AUTO"
+    cooling_period: int = 14
+    junction_path: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, values):
+        project = cls(**values)
+        where = f"project '{project.name}'"
+        if not isinstance(project.name, str) or not _VOLUME_NAME.match(project.name):
+            raise ValueError(f"{where}: name may only contain letters, digits and underscores")
+        if not project.surveys_gb:
+            raise ValueError(f"{where}: surveys_gb must list at least one survey size")
+        for size in project.surveys_gb:
+            _check_non_negative(size, f"{where} surveys_gb")
+        if project.hot_fraction is not None:
+            _check_fraction(project.hot_fraction, f"{where} hot_fraction")
+        if project.tiering_policy not in TIERING_POLICIES:
+            raise ValueError(f"{where}: unknown tiering_policy '{project.tiering_policy}', "
+                             f"expected one of {list(TIERING_POLICIES)}")
+        low, high = COOLING_PERIOD_RANGE
+        if not isinstance(project.cooling_period, int) or not low <= project.cooling_period <= high:
+            raise ValueError(f"{where}: cooling_period must be {low}-{high} days, got {project.cooling_period!r}")
+        return project
+
+    @property
+    def size_gb(self):
+        return sum(self.surveys_gb)
+
+
+@dataclass(frozen=True)
+class WorkloadSpec:
+    projects: List[Project]
+    seats: int = 1
+    read_mb_s_per_seat: float = 60.0
+    concurrent_read_mb_s: Optional[float] = None
+    hot_fraction: float = 0.2
+    headroom: float = 0.3
+
+    @classmethod
+    def from_dict(cls, values, seats=1):
+        values = dict(values)
+        unknown = set(values) - {f for f in cls.__dataclass_fields__}
+        if unknown:
+            raise ValueError(f"workload spec: unknown keys {sorted(unknown)}")
+        projects = [Project.from_dict(p) for p in values.pop("projects", [])]
+        if not projects:
+            raise ValueError("workload spec: projects must list at least one project")
+        names = [p.name for p in projects]
+        if len(names) != len(set(names)):
+            raise ValueError("workload spec: project names must be unique")
+        values.setdefault("seats", seats)
+        spec = cls(projects=projects, **values)
+        if not isinstance(spec.seats, int) or spec.seats < 1:
+            raise ValueError(f"workload spec seats: must be a positive integer, got {spec.seats!r}")
+        _check_non_negative(spec.read_mb_s_per_seat, "workload spec read_mb_s_per_seat")
+        if spec.concurrent_read_mb_s is not None:
+            _check_non_negative(spec.concurrent_read_mb_s, "workload spec concurrent_read_mb_s")
+        _check_fraction(spec.hot_fraction, "workload spec hot_fraction")
+        _check_non_negative(spec.headroom, "workload spec headroom")
+        return spec
+
+    @property
+    def peak_read_mb_s(self):
+        if self.concurrent_read_mb_s is not None:
+            return self.concurrent_read_mb_s
+        return self.seats * self.read_mb_s_per_seat
+
+
+@dataclass(frozen=True)
+class VolumePlan:
+    name: str
+    junction_path: str
+    size_in_megabytes: int
+    tiering_policy: str
+    cooling_period: Optional[int]
+    # Workload spec project stored on the volume
+    project: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class StoragePlan:
+    throughput_capacity: int = 512
+    storage_capacity: int = 1024
+    volumes: List[VolumePlan] = field(default_factory=lambda: [
+        VolumePlan(ORIGINAL_VOLUME_NAME, "/vol1", 100000, "AUTO", 14)])
+
+    @classmethod
+    def from_context(cls, node, seats=1):
+        path = node.try_get_context("workload_config")
+        inline = node.try_get_context("workload")
+        # -c on the command line passes the object as JSON text
+        if isinstance(inline, str):
+            inline = json.loads(inline)
+        if path:
+            with open(path) as f:
+                plan = plan_storage(WorkloadSpec.from_dict(json.load(f), seats))
+        elif inline:
+            plan = plan_storage(WorkloadSpec.from_dict(inline, seats))
+        else:
+            plan = cls()
+
+        tiering_path = node.try_get_context("tiering_config")
+        if tiering_path:
+            with open(tiering_path) as f:
+                return plan.with_tiering(json.load(f)["volumes"])
+        tiering = node.try_get_context("tiering")
+        if isinstance(tiering, str):
+            tiering = json.loads(tiering)
+        return plan.with_tiering(tiering) if tiering else plan
+
+    def with_tiering(self, settings):
+        """Replace the tiering policy and cooling period of the volumes named by volume or project name."""
+        if not isinstance(settings, dict):
+            raise ValueError(f"tiering settings: must be an object of volume names, got {type(settings).__name__}")
+        names = [v.name for v in self.volumes] + [v.project for v in self.volumes if v.project not in (None, v.name)]
+        unknown = sorted(set(settings) - set(names))
+        if unknown:
+            raise ValueError(f"tiering settings: unknown volumes {unknown}, expected some of {names}")
+        volumes = []
+        for volume in self.volumes:
+            key = volume.name if volume.name in settings else volume.project
+            if key not in settings:
+                volumes.append(volume)
+                continue
+            values = settings[key]
+            if not isinstance(values, dict):
+                raise ValueError(f"tiering settings '{volume.name}': must be an object, got {type(values).__name__}")
+            policy = values.get("tiering_policy", volume.tiering_policy)
+            if policy not in TIERING_POLICIES:
+                raise ValueError(f"tiering settings '{volume.name}': unknown tiering_policy '{policy}', "
+                                 f"expected one of {list(TIERING_POLICIES)}")
+            cooling = None
+            if policy in DEFAULT_COOLING_PERIODS:
+                cooling = values.get("cooling_period") or DEFAULT_COOLING_PERIODS[policy]
+                low, high = COOLING_PERIOD_RANGE
+                if not isinstance(cooling, int) or not low <= cooling <= high:
+                    raise ValueError(f"tiering settings '{volume.name}': cooling_period must be {low}-{high} days, "
+                                     f"got {cooling!r}")
+            volumes.append(replace(volume, tiering_policy=policy, cooling_period=cooling))
+        return replace(self, volumes=volumes)
+
+
+def _ssd_gb(project, spec):
+    # Data that stays on SSD: everything for NONE, the hot set for AUTO/SNAPSHOT_ONLY, nothing for ALL,
+    # plus the SSD metadata of whatever is tiered
+    if project.tiering_policy == "NONE":
+        return project.size_gb
+    hot = 0.0 if project.tiering_policy == "ALL" else project.hot_fraction
+    hot = spec.hot_fraction if hot is None else hot
+    return project.size_gb * (hot + (1 - hot) * TIERED_METADATA_FRACTION)
+
+
+def plan_storage(spec):
+    """Size the file system and volumes for a workload, raising ValueError if it cannot be met."""
+    required_mb_s = spec.peak_read_mb_s * (1 + spec.headroom)
+    fitting = [c for c in THROUGHPUT_CAPACITIES if c >= required_mb_s]
+    if not fitting:
+        raise ValueError(f"workload spec: {spec.peak_read_mb_s:.0f} MB/s peak reads with {spec.headroom:.0%} "
+                         f"headroom needs {required_mb_s:.0f} MBps, more than the largest FSx ONTAP throughput "
+                         f"capacity of {THROUGHPUT_CAPACITIES[-1]} MBps; split the projects across file systems")
+
+    hot_gb = sum(_ssd_gb(p, spec) for p in spec.projects) * (1 + spec.headroom)
+    storage_capacity = max(MIN_SSD_GIB, math.ceil(hot_gb / SSD_FILL_TARGET))
+    if storage_capacity > MAX_SSD_GIB:
+        raise ValueError(f"workload spec: the SSD hot set needs {storage_capacity} GiB, more than the "
+                         f"{MAX_SSD_GIB} GiB maximum; lower hot_fraction or tier more projects")
+
+    volumes = []
+    for i, project in enumerate(spec.projects):
+        if i and project.name == ORIGINAL_VOLUME_NAME:
+            raise ValueError(f"project '{project.name}': only the first project can use the name of the "
+                             f"original volume")
+        size_mb = math.ceil(project.size_gb * 1024 * (1 + spec.headroom))
+        if size_mb > MAX_VOLUME_MB:
+            raise ValueError(f"project '{project.name}': needs a {size_mb} MB volume, more than the "
+                             f"{MAX_VOLUME_MB} MB maximum; split its surveys across projects")
+        cooling = project.cooling_period if project.tiering_policy in ("AUTO", "SNAPSHOT_ONLY") else None
+        volumes.append(VolumePlan(ORIGINAL_VOLUME_NAME if i == 0 else project.name,
+                                  project.junction_path or f"/{project.name}", max(size_mb, 20),
+                                  project.tiering_policy, cooling, project.name))
+    junctions = [v.junction_path for v in volumes]
+    if len(junctions) != len(set(junctions)):
+        raise ValueError("workload spec: project junction paths must be unique")
+
+    return StoragePlan(throughput_capacity=fitting[0], storage_capacity=storage_capacity, volumes=volumes)
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1]) as f:
+        spec = WorkloadSpec.from_dict(json.load(f), int(sys.argv[2]) if len(sys.argv) > 2 else 1)
+    print(json.dumps(asdict(plan_storage(spec)), indent=2))
@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from local_zone_cdk.synth_cache import ROOT
+
+# Synth wall time and peak memory of the CDK app, in total and per stack.
+#
+# Each measurement runs app.py in a fresh process the way the CDK CLI does,
+# with the context from cdk.json plus any --context given here:
+#
+#     all          every stack
+#     <stack>      only that stack and its dependencies (the "stacks" context)
+#     all-cached   every stack again, answered by the synth cache
+#
+# Peak memory is the largest resident set of the app process and the jsii
+# runtime it starts. Save a report with --output and compare a later run with
+# --baseline; the exit status is 1 when a time or memory figure grew by more
+# than --tolerance.
+#
+#     python -m local_zone_cdk.synth_benchmark --output synth-bench.json
+#     python -m local_zone_cdk.synth_benchmark --context '{"fleet_config": "fleet.json"}' --baseline synth-bench.json
+
+
+def cdk_json_context():
+    with open(os.path.join(ROOT, "cdk.json")) as f:
+        return json.load(f).get("context", {})
+
+
+def _count_constructs(node):
+    return 1 + sum(_count_constructs(child) for child in node.get("children", {}).values())
+
+
+def run_synth(context, outdir):
+    """Run app.py once. Returns wall seconds, peak RSS in MB (None where unavailable), stacks and construct count."""
+    env = {**os.environ, "CDK_OUTDIR": outdir, "CDK_CONTEXT_JSON": json.dumps(context),
+           "JSII_SILENCE_WARNING_DEPRECATED_NODE_VERSION": "1"}
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "app.py"], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if hasattr(os, "wait4"):
+        # Also covers the jsii node process, which the app waits for on exit
+        stderr = process.stderr.read()
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        peak_mb = usage.ru_maxrss / 1024
+    else:
+        stderr = process.communicate()[1]
+        peak_mb = None
+    wall = time.perf_counter() - start
+    if process.returncode:
+        raise RuntimeError(f"synth failed:\n{stderr.decode(errors='replace')}")
+
+    with open(os.path.join(outdir, "manifest.json")) as f:
+        manifest = json.load(f)
+    stacks = sorted(name for name, artifact in manifest.get("artifacts", {}).items()
+                    if artifact.get("type") == "aws:cloudformation:stack")
+    constructs = None
+    tree_path = os.path.join(outdir, "tree.json")
+    if os.path.exists(tree_path):
+        with open(tree_path) as f:
+            constructs = _count_constructs(json.load(f)["tree"])
+    return wall, peak_mb, stacks, constructs
+
+
+def measure(name, context, repeat):
+    walls, peaks = [], []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as outdir:
+            wall, peak_mb, stacks, constructs = run_synth(context, outdir)
+        walls.append(wall)
+        peaks.append(peak_mb)
+    return {
+        "name": name,
+        "wall_s": min(walls),
+        "peak_mb": max(peaks) if None not in peaks else None,
+        "stacks_built": len(stacks),
+        "constructs": constructs,
+    }, stacks
+
+
+def benchmark(context=None, stacks=None, repeat=1):
+    context = {**cdk_json_context(), **(context or {})}
+    context.pop("synth_cache", None)
+    context.pop("stacks", None)
+    results = []
+    full, all_stacks = measure("all", context, repeat)
+    results.append(full)
+    for stack in stacks or all_stacks:
+        results.append(measure(stack, {**context, "stacks": stack}, repeat)[0])
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cached_context = {**context, "synth_cache": cache_dir}
+        with tempfile.TemporaryDirectory() as outdir:
+            run_synth(cached_context, outdir)
+        results.append(measure("all-cached", cached_context, repeat)[0])
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    previous = {r["name"]: r for r in baseline}
+    found = []
+    for result in results:
+        before = previous.get(result["name"])
+        if not before:
+            continue
+        for key in ("wall_s", "peak_mb"):
+            if result[key] is not None and before.get(key) and result[key] > before[key] * (1 + tolerance):
+                found.append(f"{result['name']} {key} {before[key]:.1f} -> {result[key]:.1f}")
+    return found
+
+
+def format_table(results):
+    lines = [f"{'synth':<24}{'wall s':>9}{'peak MB':>10}{'stacks':>8}{'constructs':>12}"]
+    for r in results:
+        peak = f"{r['peak_mb']:.0f}" if r["peak_mb"] is not None else "-"
+        constructs = r["constructs"] if r["constructs"] is not None else "-"
+        lines.append(f"{r['name']:<24}{r['wall_s']:>9.2f}{peak:>10}{r['stacks_built']:>8}{constructs:>12}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure CDK synth time and memory per stack")
+    parser.add_argument("--context", default="{}", help="extra context as JSON, as with cdk -c")
+    parser.add_argument("--stack", action="append", help="stack to measure on its own, default every stack")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per measurement, the fastest is kept")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="earlier --output file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed growth over the baseline as a fraction")
+
+    args = parser.parse_args(argv)
+    results = benchmark(json.loads(args.context), args.stack, args.repeat)
+    print(format_table(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"regression: {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+from importlib import metadata
+
+# Cache of synthesized cloud assemblies, keyed by a hash of everything that
+# goes into a synth: the CDK context (cdk.json, cdk.context.json and -c values
+# as passed by the CLI), the config files it names, the app and construct
+# sources, the local_zone_tools asset and the aws-cdk-lib version.
+#
+# Enable it with "synth_cache": true (or a cache directory) in the context:
+#   cdk synth -c synth_cache=true
+# On a hit app.py copies the cached assembly into the output directory and
+# exits before importing aws_cdk, which is most of the synth time.
+#
+# Only stdlib imports here, so a cache hit never loads jsii.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DIR = os.path.join(ROOT, ".cdk-synth-cache")
+SOURCES = ["app.py", "cdk.json", "requirements.txt", "local_zone_cdk", "local_zone_tools"]
+# Context keys whose value is a path to a config file read during synth
+CONFIG_FILE_KEYS = ("fleet_config", "workload_config", "tiering_config")
+PACKAGES = ("aws-cdk-lib", "constructs", "jsii")
+KEEP = 20
+
+
+def cli_context():
+    # The CDK CLI passes context as JSON in an environment variable, or in a file when it is large
+    context = json.loads(os.environ.get("CDK_CONTEXT_JSON") or "{}")
+    overflow = os.environ.get("CONTEXT_OVERFLOW_LOCATION_ENV")
+    if overflow:
+        with open(overflow) as f:
+            context.update(json.load(f))
+    return context
+
+
+def cache_dir(context):
+    setting = context.get("synth_cache")
+    if setting in (None, False, "false", ""):
+        return None
+    if setting in (True, "true"):
+        return DEFAULT_DIR
+    return os.path.abspath(setting)
+
+
+def _hash_tree(digest, path):
+    if os.path.isfile(path):
+        digest.update(os.path.relpath(path, ROOT).encode())
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+        return
+    for directory, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for name in sorted(files):
+            if not name.endswith((".pyc", ".pyo")):
+                _hash_tree(digest, os.path.join(directory, name))
+
+
+def cache_key(context):
+    digest = hashlib.sha256()
+    digest.update(json.dumps(context, sort_keys=True).encode())
+    for key in CONFIG_FILE_KEYS:
+        if context.get(key):
+            _hash_tree(digest, os.path.abspath(context[key]))
+    for source in SOURCES:
+        path = os.path.join(ROOT, source)
+        if os.path.exists(path):
+            _hash_tree(digest, path)
+    for package in PACKAGES:
+        try:
+            digest.update(f"{package}=={metadata.version(package)}".encode())
+        except metadata.PackageNotFoundError:
+            pass
+    digest.update(platform.python_version().encode())
+    return digest.hexdigest()[:32]
+
+
+def restore():
+    """Copy a cached assembly into CDK_OUTDIR. Returns True on a hit."""
+    context = cli_context()
+    directory, outdir = cache_dir(context), os.environ.get("CDK_OUTDIR")
+    if not directory or not outdir:
+        return False
+    cached = os.path.join(directory, cache_key(context))
+    if not os.path.isfile(os.path.join(cached, "manifest.json")):
+        return False
+    shutil.copytree(cached, outdir, dirs_exist_ok=True)
+    os.utime(cached)
+    print(f"synth cache hit {os.path.basename(cached)}", file=sys.stderr)
+    return True
+
+
+def store(assembly_directory):
+    """Save a synthesized assembly under its key, keeping the KEEP most recent entries."""
+    context = cli_context()
+    directory = cache_dir(context)
+    if not directory:
+        return None
+    cached = os.path.join(directory, cache_key(context))
+    staging = f"{cached}.{os.getpid()}.tmp"
+    shutil.copytree(assembly_directory, staging,
+                    ignore=shutil.ignore_patterns(os.path.basename(directory)))
+    shutil.rmtree(cached, ignore_errors=True)
+    os.replace(staging, cached)
+    entries = sorted((e for e in os.scandir(directory) if e.is_dir() and not e.name.endswith(".tmp")),
+                     key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in entries[KEEP:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+    return cached
@@ -0,0 +1,116 @@
+import json
+import os
+from dataclasses import MISSING, dataclass, fields
+
+from aws_cdk import Duration, Stack
+import aws_cdk.aws_events as events
+import aws_cdk.aws_events_targets as targets
+import aws_cdk.aws_iam as iam
+import aws_cdk.aws_lambda as lambda_
+import aws_cdk.aws_logs as logs
+
+from constructs import Construct
+
+from local_zone_cdk.storage_plan import THROUGHPUT_CAPACITIES
+
+# Scheduled throughput scaling for the FSx ONTAP file system.
+#
+# Enabled from CDK context with a "fsx_autoscaling" object in cdk.json, or
+# -c fsx_autoscaling='{"min_capacity": 256, "max_capacity": 2048}'. Other keys
+# are the fields of AutoscalingConfig. The scaling logic is in
+# lambdas/fsx_throughput_autoscaler/index.py.
+
+LAMBDA_DIR = os.path.join(os.path.dirname(__file__), "lambdas", "fsx_throughput_autoscaler")
+
+
+@dataclass(frozen=True)
+class AutoscalingConfig:
+    min_capacity: int
+    max_capacity: int
+    scale_up_threshold: float = 0.8
+    scale_down_threshold: float = 0.3
+    target_utilization: float = 0.6
+    evaluation_minutes: int = 15
+    cooldown_minutes: int = 360
+    schedule_minutes: int = 5
+    dry_run: bool = False
+
+    @classmethod
+    def from_dict(cls, values):
+        if not isinstance(values, dict):
+            raise ValueError(f"fsx_autoscaling: must be an object, got {values!r}")
+        names = {f.name for f in fields(cls)}
+        unknown = set(values) - names
+        if unknown:
+            raise ValueError(f"fsx_autoscaling: unknown keys {sorted(unknown)}, expected some of {sorted(names)}")
+        missing = [f.name for f in fields(cls) if f.default is MISSING and f.name not in values]
+        if missing:
+            raise ValueError(f"fsx_autoscaling: missing keys {missing}")
+        config = cls(**values)
+        for name in ("min_capacity", "max_capacity"):
+            if getattr(config, name) not in THROUGHPUT_CAPACITIES:
+                raise ValueError(f"fsx_autoscaling {name}: must be one of {list(THROUGHPUT_CAPACITIES)}, "
+                                 f"got {getattr(config, name)!r}")
+        if config.min_capacity >= config.max_capacity:
+            raise ValueError("fsx_autoscaling: min_capacity must be below max_capacity")
+        if not 0 < config.scale_down_threshold < config.target_utilization < config.scale_up_threshold <= 1:
+            raise ValueError("fsx_autoscaling: need 0 < scale_down_threshold < target_utilization "
+                             "< scale_up_threshold <= 1")
+        for name in ("evaluation_minutes", "cooldown_minutes", "schedule_minutes"):
+            if not isinstance(getattr(config, name), int) or getattr(config, name) < 1:
+                raise ValueError(f"fsx_autoscaling {name}: must be a positive integer")
+        return config
+
+    @classmethod
+    def from_context(cls, node):
+        values = node.try_get_context("fsx_autoscaling")
+        if isinstance(values, str):
+            # -c on the command line passes the object as JSON text
+            values = json.loads(values)
+        return cls.from_dict(values) if values else None
+
+
+class FsxThroughputAutoscaler(Construct):
+
+    def __init__(self, scope: Construct, construct_id: str, file_system_id: str, config: AutoscalingConfig) -> None:
+        super().__init__(scope, construct_id)
+
+        self.function = lambda_.Function(self, "function",
+            runtime=lambda_.Runtime.PYTHON_3_10,
+            handler="index.handler",
+            code=lambda_.Code.from_asset(LAMBDA_DIR),
+            timeout=Duration.seconds(60),
+            log_retention=logs.RetentionDays.ONE_MONTH,
+            environment={
+                "FILE_SYSTEM_ID": file_system_id,
+                "CAPACITIES": ",".join(str(c) for c in THROUGHPUT_CAPACITIES),
+                "MIN_CAPACITY": str(config.min_capacity),
+                "MAX_CAPACITY": str(config.max_capacity),
+                "SCALE_UP_THRESHOLD": str(config.scale_up_threshold),
+                "SCALE_DOWN_THRESHOLD": str(config.scale_down_threshold),
+                "TARGET_UTILIZATION": str(config.target_utilization),
+                "EVALUATION_MINUTES": str(config.evaluation_minutes),
+                "COOLDOWN_MINUTES": str(config.cooldown_minutes),
+                "DRY_RUN": str(config.dry_run).lower(),
+            },
+        )
+
+        file_system_arn = Stack.of(self).format_arn(service="fsx", resource="file-system",
+                                                    resource_name=file_system_id)
+        self.function.add_to_role_policy(iam.PolicyStatement(
+            actions=["fsx:DescribeFileSystems"],
+            resources=["*"],
+        ))
+        self.function.add_to_role_policy(iam.PolicyStatement(
+            actions=["fsx:UpdateFileSystem"],
+            resources=[file_system_arn],
+        ))
+        self.function.add_to_role_policy(iam.PolicyStatement(
+            actions=["cloudwatch:GetMetricData"],
+            resources=["*"],
+        ))
+
+        self.rule = events.Rule(self, "schedule",
+            schedule=events.Schedule.rate(Duration.minutes(config.schedule_minutes)),
+            targets=[targets.LambdaFunction(self.function)],
+        )
@@ -0,0 +1,396 @@
+"""Batch seismic attribute precompute for bricked volumes.
+
+Run on cache-instance-core next to the FSx volume. It reads a bricked volume
+(see local_zone_tools.bricks) and writes one bricked volume per attribute with
+the same header and brick layout, so the edge can fetch small precomputed
+attribute bricks instead of the raw input.
+
+    rms         RMS amplitude over a window of samples
+    envelope    instantaneous amplitude, the magnitude of the analytic trace
+                (Hilbert transform by FFT along samples)
+    similarity  semblance of the traces within a stepout of each trace over a
+                window of samples, 1 for identical neighbours
+
+Bricks are computed in brick order by a pool of processes. Each brick is read
+together with a halo of the samples and traces its kernel needs, which comes
+from the neighbouring bricks; every worker keeps a small cache of decoded
+bricks so neighbours are read once per pass rather than once per brick.
+Outputs are streamed to <output>.tmp and renamed into place when complete.
+
+Next to each output, <output>.lzattr records the digests of the input bricks
+it was computed from. A later run only recomputes bricks whose input, or the
+input within their halo, changed, and copies the rest from the old output:
+
+    python -m local_zone_tools.attributes compute \\\\blogdatasvm.energyblog.example.com\\c$\\vol1\\survey.bricks --attribute rms envelope similarity
+    python -m local_zone_tools.attributes compute survey.bricks --attribute envelope --codec lossy --rel-error 1e-3 --workers 8
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from local_zone_tools import bricks, codec
+from local_zone_tools.stats import MB, throughput_mb_s
+
+MANIFEST_SUFFIX = ".lzattr"
+READ_BLOCK = 16 * MB
+
+
+@dataclass(frozen=True)
+class AttributeParams:
+    # Samples in the RMS window
+    rms_window: int = 11
+    # Samples each side of a brick given to the Hilbert transform. The envelope
+    # is within about 2% of the peak amplitude of a whole-trace transform at 64
+    envelope_halo: int = 64
+    # Traces each side and samples in the similarity window
+    similarity_stepout: int = 1
+    similarity_window: int = 5
+
+    def halo(self, name):
+        """Extra (inlines, crosslines, samples) each side of a brick that the attribute reads."""
+        if name == "rms":
+            return 0, 0, self.rms_window // 2
+        if name == "envelope":
+            return 0, 0, self.envelope_halo
+        if name == "similarity":
+            return self.similarity_stepout, self.similarity_stepout, self.similarity_window // 2
+        raise ValueError(f"unknown attribute '{name}', expected one of {sorted(KERNELS)}")
+
+
+def _window_sum(a, axis, radius):
+    # Centred sum over 2 * radius + 1 values; positions closer than radius to either end are left at zero
+    out = np.zeros(a.shape, dtype=np.float64)
+    n, width = a.shape[axis], 2 * radius + 1
+    if n < width:
+        return out
+
+    def at(s):
+        return tuple(s if k == axis else slice(None) for k in range(a.ndim))
+
+    if width <= 7:
+        # Short windows: adding shifted views is cheaper than a cumulative sum
+        inner = out[at(slice(radius, n - radius))]
+        for k in range(width):
+            inner += a[at(slice(k, n - width + 1 + k))]
+        return out
+    c = np.cumsum(a, axis=axis, dtype=np.float64)
+    out[at(slice(radius, radius + 1))] = c[at(slice(width - 1, width))]
+    out[at(slice(radius + 1, n - radius))] = c[at(slice(width, n))] - c[at(slice(0, n - width))]
+    return out
+
+
+def rms(block, params):
+    radius = params.rms_window // 2
+    return np.sqrt(_window_sum(np.square(block, dtype=np.float64), 2, radius) / (2 * radius + 1))
+
+
+def envelope(block, params):
+    n = block.shape[2]
+    # Analytic signal: keep DC (and Nyquist), double positive frequencies, drop negative ones
+    h = np.zeros(n)
+    h[0] = 1
+    if n % 2 == 0:
+        h[n // 2] = 1
+        h[1:n // 2] = 2
+    else:
+        h[1:(n + 1) // 2] = 2
+    # The negative frequencies are zero, so the inverse transform zero-pads the one-sided spectrum
+    return np.abs(np.fft.ifft(np.fft.rfft(block, axis=2) * h[:n // 2 + 1], n=n, axis=2))
+
+
+def similarity(block, params):
+    r, radius = params.similarity_stepout, params.similarity_window // 2
+    block = block.astype(np.float64)
+    # Sum of the neighbouring traces and of their energy at each sample
+    stack = _window_sum(_window_sum(block, 0, r), 1, r)
+    energy = _window_sum(_window_sum(block * block, 0, r), 1, r)
+    numerator = _window_sum(stack * stack, 2, radius)
+    denominator = (2 * r + 1) ** 2 * _window_sum(energy, 2, radius)
+    out = np.zeros_like(numerator)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+KERNELS = {"rms": rms, "envelope": envelope, "similarity": similarity}
+
+
+class HaloReader:
+    """Read a brick plus a halo from a bricked volume, caching decoded neighbour bricks."""
+
+    def __init__(self, path, cache_bricks):
+        self.volume = bricks.BrickedVolume(path)
+        self.cache = OrderedDict()
+        self.cache_bricks = cache_bricks
+
+    def brick(self, coords):
+        if coords in self.cache:
+            self.cache.move_to_end(coords)
+            return self.cache[coords]
+        data = self.volume.read_brick(*coords)
+        self.cache[coords] = data
+        if len(self.cache) > self.cache_bricks:
+            self.cache.popitem(last=False)
+        return data
+
+    def read(self, coords, halo):
+        """The brick at grid coords with halo values each side, edge values repeated outside the volume."""
+        header = self.volume.header
+        lo = [c * b - h for c, b, h in zip(coords, header.brick_shape, halo)]
+        hi = [(c + 1) * b + h for c, b, h in zip(coords, header.brick_shape, halo)]
+        clipped = [range(max(l, 0), min(u, n)) for l, u, n in zip(lo, hi, header.shape)]
+        out = np.empty([len(r) for r in clipped], dtype=np.float32)
+        grid_ranges = [range(r.start // b, (r.stop - 1) // b + 1) for r, b in zip(clipped, header.brick_shape)]
+        for grid in itertools.product(*grid_ranges):
+            src, dst = [], []
+            for r, c, b in zip(clipped, grid, header.brick_shape):
+                first, last = max(r.start, c * b), min(r.stop, (c + 1) * b)
+                src.append(slice(first - c * b, last - c * b))
+                dst.append(slice(first - r.start, last - r.start))
+            out[tuple(dst)] = self.brick(grid)[tuple(src)]
+        pad = [(r.start - l, u - r.stop) for r, l, u in zip(clipped, lo, hi)]
+        return np.pad(out, pad, mode="edge") if any(p != (0, 0) for p in pad) else out
+
+
+# Per worker process state, set by _init_worker
+_worker = {}
+
+
+def _init_worker(path, names, params, codec_mode, abs_error, rel_error):
+    with bricks.BrickedVolume(path) as volume:
+        header = volume.header
+    halo = tuple(max(h) for h in zip(*(params.halo(name) for name in names)))
+    # Enough bricks for the neighbours of one brick column and the column before it
+    neighbours = [3 if h else 1 for h in halo[:2]]
+    cache_bricks = 2 * neighbours[0] * neighbours[1] * (header.grid[2] + 1)
+    _worker.update(reader=HaloReader(path, cache_bricks), names=names, params=params, halo=halo,
+                   codec=(codec_mode, abs_error, rel_error))
+
+
+def compute_bricks(coords_list):
+    """Encoded payloads of every requested attribute for a run of bricks, in a worker process."""
+    reader, halo, params = _worker["reader"], _worker["halo"], _worker["params"]
+    brick_shape = reader.volume.header.brick_shape
+    # Each kernel only gets its own halo, then keeps the brick itself
+    views = {name: tuple(slice(m - h, m + b + h) for m, h, b in zip(halo, params.halo(name), brick_shape))
+             for name in _worker["names"]}
+    cores = {name: tuple(slice(h, h + b) for h, b in zip(params.halo(name), brick_shape))
+             for name in _worker["names"]}
+    codec_mode, abs_error, rel_error = _worker["codec"]
+    results = []
+    for coords in coords_list:
+        block = reader.read(coords, halo)
+        payloads = []
+        for name in _worker["names"]:
+            values = KERNELS[name](block[views[name]], params)[cores[name]].astype(bricks.BRICK_DTYPE)
+            if codec_mode == codec.RAW:
+                payloads.append(values.tobytes())
+            else:
+                payloads.append(codec.encode_chunk(values, codec_mode, abs_error, rel_error))
+        results.append(payloads)
+    return results
+
+
+def _ordered_results(pool, runs, in_flight):
+    # Payloads in brick order, with at most in_flight runs computed ahead of the writer
+    pending = deque()
+    runs = iter(runs)
+    for run in itertools.islice(runs, in_flight):
+        pending.append(pool.submit(compute_bricks, run))
+    while pending:
+        results = pending.popleft().result()
+        for run in itertools.islice(runs, 1):
+            pending.append(pool.submit(compute_bricks, run))
+        yield from results
+
+
+def brick_digests(path):
+    """SHA-256 of each brick payload of a bricked volume, read in large sequential blocks."""
+    with bricks.BrickedVolume(path) as volume:
+        index = volume.index
+        digests = [None] * len(index)
+        buffer, buffer_start = memoryview(b""), 0
+        for i in np.argsort(index["offset"], kind="stable"):
+            offset, length = int(index[i]["offset"]), int(index[i]["length"])
+            if offset < buffer_start or offset + length > buffer_start + len(buffer):
+                volume.f.seek(offset)
+                buffer, buffer_start = memoryview(volume.f.read(max(READ_BLOCK, length))), offset
+            digests[i] = hashlib.sha256(buffer[offset - buffer_start:offset - buffer_start + length]).hexdigest()
+    return digests
+
+
+def output_path(src, name, out_dir=None):
+    stem, ext = os.path.splitext(os.path.basename(src))
+    return os.path.join(out_dir or os.path.dirname(src), f"{stem}.{name}{ext or '.bricks'}")
+
+
+def _load_manifest(path):
+    try:
+        with open(path + MANIFEST_SUFFIX) as f:
+            manifest = json.load(f)
+        os.stat(path)
+    except (FileNotFoundError, ValueError):
+        return None
+    return manifest
+
+
+def _dilate(mask, radius):
+    # Mark every brick within radius bricks (per axis) of a marked one
+    out = mask.copy()
+    for axis, r in enumerate(radius):
+        for _ in range(r):
+            grown = out.copy()
+            lead = [slice(None)] * out.ndim
+            trail = [slice(None)] * out.ndim
+            lead[axis], trail[axis] = slice(1, None), slice(None, -1)
+            grown[tuple(lead)] |= out[tuple(trail)]
+            grown[tuple(trail)] |= out[tuple(lead)]
+            out = grown
+    return out
+
+
+def compute(src, names, out_dir=None, params=AttributeParams(), workers=None, codec_mode=codec.RAW,
+            abs_error=None, rel_error=None, full=False):
+    """Compute the named attributes of a bricked volume, recomputing only bricks whose inputs changed."""
+    names = list(dict.fromkeys(names))
+    for name in names:
+        params.halo(name)
+    start = time.perf_counter()
+    with bricks.BrickedVolume(src) as volume:
+        header = volume.header
+        input_index = volume.index.copy()
+    out_header = bricks.BrickHeader(shape=header.shape, brick_shape=header.brick_shape,
+                                    first_inline=header.first_inline, first_crossline=header.first_crossline,
+                                    sample_interval_us=header.sample_interval_us, codec=codec_mode)
+    st = os.stat(src)
+    settings = {"params": asdict(params), "codec": codec_mode, "abs_error": abs_error, "rel_error": rel_error,
+                "shape": list(header.shape), "brick_shape": list(header.brick_shape)}
+    outputs = {name: output_path(src, name, out_dir) for name in names}
+    manifests = {name: None if full else _load_manifest(path) for name, path in outputs.items()}
+
+    # Nothing to do when every output was computed from this exact input file
+    if all(m and m.get("attribute") == name and {k: m.get(k) for k in settings} == settings and
+           (m.get("input_size"), m.get("input_mtime_ns")) == (st.st_size, st.st_mtime_ns)
+           for name, m in manifests.items()):
+        return {"source": src, "attributes": outputs, "bricks": header.n_bricks, "bricks_computed": 0,
+                "bricks_reused": header.n_bricks, "input_bytes": 0, "output_bytes": 0,
+                "seconds": time.perf_counter() - start, "input_mb_s": 0.0}
+    digests = brick_digests(src)
+
+    # Per attribute, the bricks whose halo touches an input brick that changed since the last run
+    old = {}
+    dirty = np.zeros(header.grid, dtype=bool)
+    for name, path in outputs.items():
+        manifest = manifests[name]
+        if manifest is None or manifest.get("attribute") != name or \
+                {k: manifest.get(k) for k in settings} != settings:
+            dirty[:] = True
+            continue
+        changed = np.array([a != b for a, b in zip(manifest["digests"], digests)]).reshape(header.grid)
+        radius = [-(-h // b) for h, b in zip(params.halo(name), header.brick_shape)]
+        dirty |= _dilate(changed, radius)
+        old[name] = path
+    todo = [coords for coords in itertools.product(*map(range, header.grid)) if dirty[coords]]
+
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    old_volumes = {name: bricks.BrickedVolume(path) for name, path in old.items()}
+    files = {name: open(path + ".tmp", "wb") for name, path in outputs.items()}
+    indexes = {name: np.zeros(header.n_bricks, dtype=bricks.INDEX_DTYPE) for name in names}
+    offsets = dict.fromkeys(names, out_header.data_offset)
+    bytes_out = 0
+    try:
+        for f in files.values():
+            f.write(out_header.pack())
+            f.write(indexes[names[0]].tobytes())
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(src, names, params, codec_mode, abs_error, rel_error)) as pool:
+            # Runs of consecutive bricks, at most a brick row, so a worker reuses its cached neighbours
+            run_length = max(1, min(header.grid[1] * header.grid[2], -(-len(todo) // workers)))
+            runs = (todo[i:i + run_length] for i in range(0, len(todo), run_length))
+            results = _ordered_results(pool, runs, 2 * workers)
+            for coords in itertools.product(*map(range, header.grid)):
+                brick_id = header.brick_id(*coords)
+                if dirty[coords]:
+                    payloads = next(results)
+                else:
+                    payloads = []
+                    for name in names:
+                        old_volume = old_volumes[name]
+                        offset, length = old_volume.index[brick_id]
+                        old_volume.f.seek(int(offset))
+                        payloads.append(old_volume.f.read(int(length)))
+                for name, payload in zip(names, payloads):
+                    files[name].write(payload)
+                    indexes[name][brick_id] = (offsets[name], len(payload))
+                    offsets[name] += len(payload)
+                    bytes_out += len(payload)
+        for name, f in files.items():
+            f.seek(bricks.HEADER_SIZE)
+            f.write(indexes[name].tobytes())
+    finally:
+        for f in files.values():
+            f.close()
+        for old_volume in old_volumes.values():
+            old_volume.close()
+
+    for name, path in outputs.items():
+        os.replace(path + ".tmp", path)
+        with open(path + MANIFEST_SUFFIX + ".tmp", "w") as f:
+            json.dump({"attribute": name, "input": os.path.abspath(src), "input_size": st.st_size,
+                       "input_mtime_ns": st.st_mtime_ns, **settings, "digests": digests}, f)
+        os.replace(path + MANIFEST_SUFFIX + ".tmp", path + MANIFEST_SUFFIX)
+    elapsed = time.perf_counter() - start
+    input_bytes = int(input_index["length"].sum())
+    return {
+        "source": src,
+        "attributes": outputs,
+        "bricks": header.n_bricks,
+        "bricks_computed": len(todo),
+        "bricks_reused": header.n_bricks - len(todo),
+        "input_bytes": input_bytes,
+        "output_bytes": bytes_out,
+        "seconds": elapsed,
+        "input_mb_s": throughput_mb_s(input_bytes * len(todo) / max(header.n_bricks, 1), elapsed),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute seismic attributes of a bricked volume")
+    sub = parser.add_subparsers(dest="command", required=True)
+    comp = sub.add_parser("compute", help="write one bricked volume per attribute next to the input")
+    comp.add_argument("src", help="bricked volume written by local_zone_tools.bricks")
+    comp.add_argument("--attribute", choices=sorted(KERNELS), nargs="+", default=sorted(KERNELS))
+    comp.add_argument("--out-dir", help="directory for the outputs, default next to the input")
+    comp.add_argument("--workers", type=int, help="worker processes, default one per CPU")
+    comp.add_argument("--codec", choices=codec.MODES, default="raw")
+    comp.add_argument("--abs-error", type=float, help="absolute error bound for the lossy codec")
+    comp.add_argument("--rel-error", type=float,
+                      help="error bound for the lossy codec as a fraction of each brick's value range")
+    comp.add_argument("--rms-window", type=int, default=AttributeParams.rms_window, help="samples")
+    comp.add_argument("--envelope-halo", type=int, default=AttributeParams.envelope_halo,
+                      help="samples each side of a brick for the envelope, larger is closer to a whole-trace transform")
+    comp.add_argument("--similarity-stepout", type=int, default=AttributeParams.similarity_stepout,
+                      help="traces each side")
+    comp.add_argument("--similarity-window", type=int, default=AttributeParams.similarity_window, help="samples")
+    comp.add_argument("--full", action="store_true", help="recompute every brick")
+
+    args = parser.parse_args(argv)
+    params = AttributeParams(rms_window=args.rms_window, envelope_halo=args.envelope_halo,
+                             similarity_stepout=args.similarity_stepout,
+                             similarity_window=args.similarity_window)
+    report = compute(args.src, args.attribute, args.out_dir, params, args.workers, codec.MODES[args.codec],
+                     args.abs_error, args.rel_error, args.full)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Seismic read-pattern benchmark.
+
+Generates synthetic SEG-Y volumes and times inline, crossline, time-slice and
+random-trace reads against a volume on any mount point (local disk, the
+cache-instance-edge share or the FSx ONTAP /vol1 share).
+
+    python -m local_zone_tools.benchmark generate D:\\bench\\survey.sgy --inlines 400 --crosslines 400 --samples 1500
+    python -m local_zone_tools.benchmark run \\\\cache-instance-edge\\bench\\survey.sgy --label edge --output edge.json
+
+Each pattern and method reads its own random extents, derived from --seed,
+rather than replaying the extents the previous method left in the page
+cache. --drop-cache also evicts the file from the page cache before each run where
+the OS allows it (posix_fadvise, not on Windows); the report records both.
+"""
+import argparse
+import json
+import mmap
+import os
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from local_zone_tools import segy
+from local_zone_tools.stats import MB, latency_summary, throughput_mb_s
+
+PATTERNS = ("inline", "crossline", "timeslice", "random-trace")
+METHODS = ("buffered", "mmap", "threaded")
+
+
+def pattern_extents(geometry, pattern, rng):
+    """Return the (offset, length) extents that one read of the given pattern touches."""
+    trace_bytes = geometry.n_samples * segy.SAMPLE_SIZE
+    if pattern == "inline":
+        il = int(rng.integers(geometry.n_inlines))
+        # Whole inline is contiguous on disk, trace headers included
+        return [(geometry.trace_offset(il, 0), geometry.n_crosslines * geometry.trace_size)]
+    if pattern == "crossline":
+        xl = int(rng.integers(geometry.n_crosslines))
+        return [(geometry.data_offset(il, xl), trace_bytes) for il in range(geometry.n_inlines)]
+    if pattern == "timeslice":
+        sample = int(rng.integers(geometry.n_samples))
+        base = geometry.data_offset(0, 0, sample)
+        return [(base + t * geometry.trace_size, segy.SAMPLE_SIZE) for t in range(geometry.n_traces)]
+    if pattern == "random-trace":
+        il = int(rng.integers(geometry.n_inlines))
+        xl = int(rng.integers(geometry.n_crosslines))
+        return [(geometry.data_offset(il, xl), trace_bytes)]
+    raise ValueError(f"unknown pattern {pattern!r}, expected one of {PATTERNS}")
+
+
+class BufferedReader:
+
+    def __init__(self, path, workers):
+        self.f = open(path, "rb")
+
+    def read(self, extents):
+        total = 0
+        for offset, length in extents:
+            self.f.seek(offset)
+            total += len(self.f.read(length))
+        return total
+
+    def close(self):
+        self.f.close()
+
+
+class MmapReader:
+
+    def __init__(self, path, workers):
+        self.f = open(path, "rb")
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, extents):
+        total = 0
+        for offset, length in extents:
+            # Copy out so the pages are actually faulted in
+            total += len(self.mm[offset:offset + length])
+        return total
+
+    def close(self):
+        self.mm.close()
+        self.f.close()
+
+
+class ThreadedReader:
+    # Each worker keeps its own handle so seeks do not race; works on SMB shares on Windows too
+
+    def __init__(self, path, workers):
+        self.path = path
+        self.workers = workers
+        self.local = threading.local()
+        self.handles = []
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def _handle(self):
+        f = getattr(self.local, "f", None)
+        if f is None:
+            f = self.local.f = open(self.path, "rb")
+            with self.lock:
+                self.handles.append(f)
+        return f
+
+    def _read_batch(self, extents):
+        f = self._handle()
+        total = 0
+        for offset, length in extents:
+            f.seek(offset)
+            total += len(f.read(length))
+        return total
+
+    def read(self, extents):
+        if len(extents) == 1 and extents[0][1] > MB:
+            # Split one large extent into per-worker ranges
+            offset, length = extents[0]
+            step = -(-length // self.workers)
+            extents = [(o, min(step, offset + length - o)) for o in range(offset, offset + length, step)]
+        batches = [extents[i::self.workers] for i in range(self.workers)]
+        return sum(self.pool.map(self._read_batch, [b for b in batches if b]))
+
+    def close(self):
+        self.pool.shutdown()
+        for f in self.handles:
+            f.close()
+
+
+READERS = {"buffered": BufferedReader, "mmap": MmapReader, "threaded": ThreadedReader}
+
+
+def drop_page_cache(path):
+    """Evict the file's pages from the OS page cache; False where posix_fadvise is not available."""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return True
+
+
+def run_pattern(path, geometry, pattern, method, iterations, workers=8, seed=0, drop_cache=False):
+    # Seeded per pattern and method, like segy.synthetic_inline, so each method reads different extents
+    seeds = [seed, PATTERNS.index(pattern), METHODS.index(method)]
+    rng = np.random.default_rng(seeds)
+    page_cache = "kept"
+    if drop_cache:
+        page_cache = "dropped" if drop_page_cache(path) else "drop unsupported"
+    reader = READERS[method](path, workers)
+    latencies = []
+    total_bytes = 0
+    try:
+        for _ in range(iterations):
+            extents = pattern_extents(geometry, pattern, rng)
+            start = time.perf_counter()
+            total_bytes += reader.read(extents)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        reader.close()
+    elapsed = sum(latencies)
+    return {
+        "pattern": pattern,
+        "method": method,
+        "workers": workers if method == "threaded" else 1,
+        "iterations": iterations,
+        "seed": seeds,
+        "page_cache": page_cache,
+        "bytes": total_bytes,
+        "elapsed_s": elapsed,
+        "throughput_mb_s": throughput_mb_s(total_bytes, elapsed),
+        "latency": latency_summary(latencies),
+    }
+
+
+def run_benchmark(path, patterns=PATTERNS, methods=METHODS, iterations=10, workers=8, seed=0, label=None,
+                  drop_cache=False):
+    geometry = segy.read_geometry(path)
+    results = [run_pattern(path, geometry, pattern, method, iterations, workers, seed, drop_cache)
+               for pattern in patterns for method in methods]
+    return {
+        "label": label or str(path),
+        "path": str(path),
+        "host": platform.node(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "geometry": asdict(geometry),
+        "file_size": geometry.file_size,
+        "seed": seed,
+        "drop_cache": drop_cache,
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seismic read-pattern benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="write a synthetic SEG-Y volume")
+    gen.add_argument("path")
+    gen.add_argument("--inlines", type=int, default=200)
+    gen.add_argument("--crosslines", type=int, default=200)
+    gen.add_argument("--samples", type=int, default=1000)
+    gen.add_argument("--seed", type=int, default=0)
+
+    run = sub.add_parser("run", help="time read patterns against a SEG-Y volume")
+    run.add_argument("path")
+    run.add_argument("--label", help="name for this storage path, e.g. local, edge, fsx")
+    run.add_argument("--patterns", nargs="+", choices=PATTERNS, default=list(PATTERNS))
+    run.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS))
+    run.add_argument("--iterations", type=int, default=10)
+    run.add_argument("--workers", type=int, default=8)
+    run.add_argument("--seed", type=int, default=0, help="base seed of the per-pattern, per-method extents")
+    run.add_argument("--drop-cache", action="store_true",
+                     help="evict the file from the page cache before each pattern and method (not on Windows)")
+    run.add_argument("--output", help="write JSON results here instead of stdout")
+
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        geometry = segy.SegyGeometry(args.inlines, args.crosslines, args.samples)
+        size = segy.write_synthetic(args.path, geometry, seed=args.seed)
+        print(f"wrote {args.path} ({size / MB:.1f} MB, {geometry.n_traces} traces)")
+        return
+
+    report = run_benchmark(args.path, args.patterns, args.methods, args.iterations,
+                           args.workers, args.seed, args.label, args.drop_cache)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
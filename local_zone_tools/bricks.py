@@ -0,0 +1,215 @@
+"""Bricked seismic storage format.
+
+SEG-Y keeps each trace contiguous, so crossline and time-slice reads touch the
+whole file. This module rewrites a SEG-Y volume into fixed-size 3D bricks with a
+compact index so a slice only reads the bricks it intersects. Convert once onto
+the FSx ONTAP volume (e.g. \\\\blogdatasvm.energyblog.example.com\\c$\\vol1) and both
+the core and edge instances read the same bricked dataset.
+
+File layout:
+    header      fixed size struct (see HEADER_FORMAT)
+    brick table n_bricks records of (offset uint64, length uint32), brick order
+    bricks      brick payloads, inline-brick major, then crossline, then sample.
+                Raw little-endian float32, or chunks encoded with
+                local_zone_tools.codec when the header codec is not raw.
+
+    python -m local_zone_tools.bricks convert survey.sgy survey.bricks --brick 64 64 64
+    python -m local_zone_tools.bricks convert survey.sgy survey.bricks --codec lossy --rel-error 1e-3
+    python -m local_zone_tools.bricks info survey.bricks
+"""
+import argparse
+import itertools
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+
+from local_zone_tools import codec, segy
+
+MAGIC = b"LZBRICK1"
+HEADER_FORMAT = "<8sI3I3I2iiIQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+BRICK_DTYPE = np.dtype("<f4")
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u4")])
+DEFAULT_BRICK_SHAPE = (64, 64, 64)
+
+
+@dataclass(frozen=True)
+class BrickHeader:
+    shape: tuple
+    brick_shape: tuple
+    first_inline: int = 1
+    first_crossline: int = 1
+    sample_interval_us: int = 4000
+    codec: int = 0
+
+    @property
+    def grid(self):
+        # Number of bricks along each axis
+        return tuple(-(-n // b) for n, b in zip(self.shape, self.brick_shape))
+
+    @property
+    def n_bricks(self):
+        gi, gx, gs = self.grid
+        return gi * gx * gs
+
+    @property
+    def brick_nbytes(self):
+        bi, bx, bs = self.brick_shape
+        return bi * bx * bs * BRICK_DTYPE.itemsize
+
+    @property
+    def data_offset(self):
+        return HEADER_SIZE + self.n_bricks * INDEX_DTYPE.itemsize
+
+    def brick_id(self, gi, gx, gs):
+        _, nx, ns = self.grid
+        return (gi * nx + gx) * ns + gs
+
+    def pack(self):
+        return struct.pack(HEADER_FORMAT, MAGIC, 1, *self.shape, *self.brick_shape,
+                           self.first_inline, self.first_crossline, self.sample_interval_us,
+                           self.codec, self.n_bricks)
+
+    @classmethod
+    def unpack(cls, raw):
+        fields = struct.unpack(HEADER_FORMAT, raw)
+        if fields[0] != MAGIC:
+            raise ValueError("not a bricked seismic file")
+        return cls(shape=tuple(fields[2:5]), brick_shape=tuple(fields[5:8]), first_inline=fields[8],
+                   first_crossline=fields[9], sample_interval_us=fields[10], codec=fields[11])
+
+
+def convert_segy(src, dst, brick_shape=DEFAULT_BRICK_SHAPE, codec_mode=codec.RAW,
+                 abs_error=None, rel_error=None):
+    """Stream a SEG-Y volume into bricks, holding one row of bricks in memory at a time."""
+    geometry = segy.read_geometry(src)
+    header = BrickHeader(shape=(geometry.n_inlines, geometry.n_crosslines, geometry.n_samples),
+                         brick_shape=tuple(brick_shape), first_inline=geometry.first_inline,
+                         first_crossline=geometry.first_crossline,
+                         sample_interval_us=geometry.sample_interval_us, codec=codec_mode)
+    bi, bx, bs = header.brick_shape
+    _, gx, gs = header.grid
+    index = np.zeros(header.n_bricks, dtype=INDEX_DTYPE)
+    slab = np.zeros((bi, gx * bx, gs * bs), dtype=BRICK_DTYPE)
+
+    with open(dst, "wb") as out:
+        out.write(header.pack())
+        out.write(index.tobytes())
+        offset = header.data_offset
+        inlines = segy.iter_inlines(src, geometry)
+        for gi in range(header.grid[0]):
+            slab[:] = 0
+            for row, (_, samples) in zip(range(bi), inlines):
+                slab[row, :geometry.n_crosslines, :geometry.n_samples] = samples
+            for gxi, gsi in itertools.product(range(gx), range(gs)):
+                brick = slab[:, gxi * bx:(gxi + 1) * bx, gsi * bs:(gsi + 1) * bs]
+                if header.codec == codec.RAW:
+                    payload = np.ascontiguousarray(brick).tobytes()
+                else:
+                    payload = codec.encode_chunk(brick, header.codec, abs_error, rel_error)
+                out.write(payload)
+                index[header.brick_id(gi, gxi, gsi)] = (offset, len(payload))
+                offset += len(payload)
+        # Backfill the brick table now that offsets are known
+        out.seek(HEADER_SIZE)
+        out.write(index.tobytes())
+    return header
+
+
+class BrickedVolume:
+    """Random access reader that only fetches the bricks a request intersects."""
+
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "rb")
+        self.header = BrickHeader.unpack(self.f.read(HEADER_SIZE))
+        self.index = np.fromfile(self.f, dtype=INDEX_DTYPE, count=self.header.n_bricks)
+        self.bytes_read = 0
+        self.bricks_read = 0
+
+    @property
+    def shape(self):
+        return self.header.shape
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read_brick(self, gi, gx, gs):
+        offset, length = self.index[self.header.brick_id(gi, gx, gs)]
+        self.f.seek(int(offset))
+        raw = self.f.read(int(length))
+        self.bytes_read += len(raw)
+        self.bricks_read += 1
+        if self.header.codec != codec.RAW:
+            return codec.decode_chunk(raw)[0]
+        return np.frombuffer(raw, dtype=BRICK_DTYPE).reshape(self.header.brick_shape)
+
+    def bricks_for(self, inlines, crosslines, samples):
+        """Grid coordinates of the bricks intersecting the given index ranges."""
+        ranges = [range(r.start // b, (r.stop - 1) // b + 1)
+                  for r, b in zip((inlines, crosslines, samples), self.header.brick_shape)]
+        return list(itertools.product(*ranges))
+
+    def read_subvolume(self, inlines, crosslines, samples):
+        """Read a box given as three zero based index ranges (step 1)."""
+        ranges = [range(max(r.start, 0), min(r.stop, n)) for r, n in
+                  zip((inlines, crosslines, samples), self.shape)]
+        out = np.empty([len(r) for r in ranges], dtype=np.float32)
+        for coords in self.bricks_for(*ranges):
+            brick = self.read_brick(*coords)
+            src, dst = [], []
+            for r, c, b in zip(ranges, coords, self.header.brick_shape):
+                lo, hi = max(r.start, c * b), min(r.stop, (c + 1) * b)
+                src.append(slice(lo - c * b, hi - c * b))
+                dst.append(slice(lo - r.start, hi - r.start))
+            out[tuple(dst)] = brick[tuple(src)]
+        return out
+
+    def read_inline(self, inline_index):
+        n_il, n_xl, n_s = self.shape
+        return self.read_subvolume(range(inline_index, inline_index + 1), range(n_xl), range(n_s))[0]
+
+    def read_crossline(self, crossline_index):
+        n_il, n_xl, n_s = self.shape
+        return self.read_subvolume(range(n_il), range(crossline_index, crossline_index + 1), range(n_s))[:, 0]
+
+    def read_timeslice(self, sample_index):
+        n_il, n_xl, n_s = self.shape
+        return self.read_subvolume(range(n_il), range(n_xl), range(sample_index, sample_index + 1))[:, :, 0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert and inspect bricked seismic volumes")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="rewrite a SEG-Y volume as bricks")
+    conv.add_argument("src")
+    conv.add_argument("dst")
+    conv.add_argument("--brick", type=int, nargs=3, default=list(DEFAULT_BRICK_SHAPE),
+                      metavar=("INLINES", "CROSSLINES", "SAMPLES"))
+    conv.add_argument("--codec", choices=codec.MODES, default="raw")
+    conv.add_argument("--abs-error", type=float, help="absolute error bound for the lossy codec")
+    conv.add_argument("--rel-error", type=float,
+                      help="error bound for the lossy codec as a fraction of each brick's value range")
+    info = sub.add_parser("info", help="print the header of a bricked volume")
+    info.add_argument("path")
+
+    args = parser.parse_args(argv)
+    if args.command == "convert":
+        header = convert_segy(args.src, args.dst, args.brick, codec.MODES[args.codec],
+                              args.abs_error, args.rel_error)
+    else:
+        with BrickedVolume(args.path) as volume:
+            header = volume.header
+    print(f"shape={header.shape} brick={header.brick_shape} grid={header.grid} bricks={header.n_bricks} "
+          f"codec={header.codec}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,595 @@
+"""Two-tier read-through chunk cache for the edge cache instance.
+
+Fronts a source directory (the Sydney FSx ONTAP share) with a RAM tier and an
+on-disk tier (the cache-instance-edge EBS volume). Files are split into
+fixed-size chunks; chunk payloads are stored content-addressed by SHA-256 so
+identical chunks across files or survey versions are only held once. Each tier
+has its own byte budget and LRU or LFU eviction, concurrent misses for the same
+chunk are coalesced into one source read, and hit rates and bytes saved are
+reported through stats().
+
+    python -m local_zone_tools.cache serve --source \\\\blogdatasvm.energyblog.example.com\\c$\\vol1 \\
+        --cache-dir D:\\edge-cache --ram-gb 48 --disk-gb 900 --port 8080
+
+The service answers HTTP GET requests for paths relative to the source with
+Range support, and GET /_stats with the counters as JSON. HEAD requests answer
+whether the chunks of the (ranged) file are cached in an X-Cache: hit or miss
+header, without reading them.
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from local_zone_tools.stats import MB
+
+GB = 1024 * MB
+DEFAULT_CHUNK_SIZE = 4 * MB
+INDEX_FILE = "index.json"
+_BYTE_RANGE = re.compile(r"^(\d*)-(\d*)$")
+
+
+class LRUPolicy:
+
+    def __init__(self):
+        self.order = OrderedDict()
+
+    def add(self, key):
+        self.order[key] = None
+
+    def touch(self, key):
+        self.order.move_to_end(key)
+
+    def remove(self, key):
+        self.order.pop(key, None)
+
+    def victim(self):
+        return next(iter(self.order))
+
+
+class LFUPolicy:
+    # Least frequently used, ties broken by least recent use. Stale heap entries are skipped lazily,
+    # and the heap is rebuilt from the live entries once stale ones outnumber them 2:1.
+
+    def __init__(self):
+        self.counts = {}
+        self.ticks = {}
+        self.heap = []
+        self.tick = 0
+
+    def _push(self, key):
+        self.tick += 1
+        self.ticks[key] = self.tick
+        if len(self.heap) > 3 * len(self.counts) + 64:
+            self.heap = [(count, self.ticks[k], k) for k, count in self.counts.items()]
+            heapq.heapify(self.heap)
+        else:
+            heapq.heappush(self.heap, (self.counts[key], self.tick, key))
+
+    def add(self, key):
+        self.counts[key] = 1
+        self._push(key)
+
+    def touch(self, key):
+        self.counts[key] += 1
+        self._push(key)
+
+    def remove(self, key):
+        self.counts.pop(key, None)
+        self.ticks.pop(key, None)
+
+    def victim(self):
+        while True:
+            count, _, key = self.heap[0]
+            if self.counts.get(key) == count:
+                return key
+            heapq.heappop(self.heap)
+
+
+POLICIES = {"lru": LRUPolicy, "lfu": LFUPolicy}
+
+
+class MemoryTier:
+
+    def __init__(self, budget_bytes, policy="lru"):
+        self.budget = budget_bytes
+        self.used = 0
+        self.evictions = 0
+        self.policy = POLICIES[policy]()
+        self.items = {}
+
+    def get(self, digest):
+        data = self.items.get(digest)
+        if data is not None:
+            self.policy.touch(digest)
+        return data
+
+    def put(self, digest, data):
+        if digest in self.items or len(data) > self.budget:
+            return
+        while self.used + len(data) > self.budget:
+            self.evict(self.policy.victim())
+        self.items[digest] = data
+        self.used += len(data)
+        self.policy.add(digest)
+
+    def evict(self, digest):
+        self.used -= len(self.items.pop(digest))
+        self.policy.remove(digest)
+        self.evictions += 1
+
+    def __contains__(self, digest):
+        return digest in self.items
+
+
+class DiskTier(MemoryTier):
+    # Same accounting as the RAM tier but the payload lives in objects/<aa>/<digest>. The owner's lock
+    # guards reserve() and commit(); the file operations in between run without it, so one slow disk
+    # does not hold up readers.
+
+    def __init__(self, root, budget_bytes=None, policy="lfu"):
+        # Without a budget the objects already on disk are all kept, for tools that share the directory
+        super().__init__(float("inf") if budget_bytes is None else budget_bytes, policy)
+        self.root = root
+        # Objects being written, by size, and evicted objects whose files are being deleted
+        self.reserved = {}
+        self.removing = set()
+        # Objects that could not be removed yet because a reader had them open (Windows)
+        self.pending_removal = set()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        for prefix in os.listdir(os.path.join(root, "objects")):
+            for digest in os.listdir(os.path.join(root, "objects", prefix)):
+                if digest.endswith(".tmp"):
+                    os.remove(os.path.join(root, "objects", prefix, digest))
+                    continue
+                size = os.path.getsize(self._path(digest))
+                if self.used + size > self.budget:
+                    os.remove(self._path(digest))
+                    continue
+                self.items[digest] = size
+                self.used += size
+                self.policy.add(digest)
+
+    def _path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def lookup(self, digest):
+        # Returns the object path so the caller can read it without holding the cache lock
+        if digest not in self.items:
+            return None
+        self.policy.touch(digest)
+        return self._path(digest)
+
+    def get(self, digest):
+        path = self.lookup(digest)
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def stage(self, digest, data):
+        # Write to a temporary file without holding the cache lock; publish() moves it into place
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        return tmp
+
+    def reserve(self, digest, size):
+        """Make room for an object, under the lock. Returns the files publish() must delete, or None to skip it."""
+        if digest in self.items or digest in self.reserved or digest in self.removing:
+            return None
+        # Objects still being written cannot be evicted to make room
+        if size + sum(self.reserved.values()) > self.budget:
+            return None
+        victims = []
+        while self.used + size > self.budget:
+            victim = self.policy.victim()
+            self.evict(victim)
+            self.removing.add(victim)
+            victims.append(victim)
+        self.reserved[digest] = size
+        self.used += size
+        paths = [self._path(victim) for victim in victims] + list(self.pending_removal)
+        self.pending_removal.clear()
+        return paths
+
+    def publish(self, digest, tmp, paths):
+        """Delete the evicted files and move the staged object into place, without the lock.
+
+        Returns whether the object was stored and the files that could not be deleted yet.
+        """
+        failed = [path for path in paths if not self._remove(path)]
+        # Rename so a crash never leaves a truncated object behind
+        try:
+            os.replace(tmp, self._path(digest))
+        except PermissionError:
+            # An evicted copy of this object is still open by a reader; leave it uncached
+            self._remove(tmp)
+            return False, failed
+        return True, failed
+
+    def commit(self, digest, stored, paths, failed):
+        """Record the outcome of publish(), under the lock."""
+        size = self.reserved.pop(digest)
+        if stored:
+            self.items[digest] = size
+            self.policy.add(digest)
+        else:
+            self.used -= size
+        self.removing.difference_update(os.path.basename(path) for path in paths)
+        self.pending_removal.update(failed)
+
+    def discard(self, tmp):
+        self._remove(tmp)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            # Windows refuses to delete a file that is open; retry on a later admission
+            return False
+        return True
+
+    def put(self, digest, data):
+        # For single-threaded callers; ChunkCache runs these steps with its lock around reserve and commit
+        tmp = self.stage(digest, data)
+        paths = self.reserve(digest, len(data))
+        if paths is None:
+            self.discard(tmp)
+            return
+        stored, failed = self.publish(digest, tmp, paths)
+        self.commit(digest, stored, paths, failed)
+
+    def evict(self, digest):
+        # Accounting only; reserve() hands the file to publish() to delete
+        self.used -= self.items.pop(digest)
+        self.policy.remove(digest)
+        self.evictions += 1
+
+
+class ChunkCache:
+
+    def __init__(self, source, cache_dir, ram_bytes, disk_bytes, chunk_size=DEFAULT_CHUNK_SIZE,
+                 ram_policy="lru", disk_policy="lfu", revalidate_after=30.0, opener=open):
+        self.source = source
+        # Swappable for local_zone_tools.wan.WanOpener to emulate the Sydney link
+        self.opener = opener
+        self.cache_dir = cache_dir
+        self.chunk_size = chunk_size
+        self.revalidate_after = revalidate_after
+        self.ram = MemoryTier(ram_bytes, ram_policy)
+        self.disk = DiskTier(cache_dir, disk_bytes, disk_policy)
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.stat_cache = {}
+        # (relative path, mtime_ns, size, chunk index) -> content digest, and the keys of each path
+        self.chunk_index = self._load_index()
+        self.path_keys = defaultdict(set)
+        for key in self.chunk_index:
+            self.path_keys[key[0]].add(key)
+        self.counters = dict(requests=0, ram_hits=0, disk_hits=0, misses=0, coalesced=0,
+                             bytes_served=0, bytes_from_source=0)
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE)) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return {}
+        # Chunk indexes of another chunk size point at the wrong bytes; the objects age out of the disk tier
+        if not isinstance(index, dict) or index.get("chunk_size") != self.chunk_size:
+            return {}
+        return {tuple(key): digest for key, digest in index["entries"] if digest in self.disk}
+
+    def save_index(self):
+        with self.lock:
+            entries = [[list(key), digest] for key, digest in self.chunk_index.items() if digest in self.disk]
+        tmp = os.path.join(self.cache_dir, INDEX_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"chunk_size": self.chunk_size, "entries": entries}, f)
+        os.replace(tmp, os.path.join(self.cache_dir, INDEX_FILE))
+
+    def _source_path(self, relpath):
+        path = os.path.normpath(os.path.join(self.source, relpath))
+        if os.path.commonpath([path, os.path.normpath(self.source)]) != os.path.normpath(self.source):
+            raise ValueError(f"{relpath!r} is outside the cache source")
+        return path
+
+    def _version(self, relpath):
+        # Stat the source at most every revalidate_after seconds; each stat is a round trip to Sydney
+        now = time.monotonic()
+        cached = self.stat_cache.get(relpath)
+        if cached and now - cached[0] < self.revalidate_after:
+            return cached[1]
+        st = os.stat(self._source_path(relpath))
+        version = (st.st_mtime_ns, st.st_size)
+        self.stat_cache[relpath] = (now, version)
+        if not cached or cached[1] != version:
+            self._prune(relpath, version)
+        return version
+
+    def _prune(self, relpath, version):
+        # Drop index entries of earlier versions of a file
+        with self.lock:
+            keys = self.path_keys.get(relpath, ())
+            stale = [key for key in keys if key[1:3] != version]
+            for key in stale:
+                keys.discard(key)
+                del self.chunk_index[key]
+
+    def size(self, relpath):
+        return self._version(relpath)[1]
+
+    def _fetch(self, relpath, chunk):
+        with self.opener(self._source_path(relpath), "rb") as f:
+            f.seek(chunk * self.chunk_size)
+            return f.read(self.chunk_size)
+
+    def cached(self, relpath, chunk):
+        mtime, size = self._version(relpath)
+        with self.lock:
+            digest = self.chunk_index.get((relpath, mtime, size, chunk))
+            return digest is not None and (digest in self.ram or digest in self.disk)
+
+    def _read_disk(self, digest, path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except (FileNotFoundError, PermissionError):
+            # Evicted between the lookup and the read; Windows denies opening a file pending deletion
+            return None
+        with self.lock:
+            self.counters["disk_hits"] += 1
+            self.ram.put(digest, data)
+        return data
+
+    def get_chunk(self, relpath, chunk):
+        mtime, size = self._version(relpath)
+        key = (relpath, mtime, size, chunk)
+        with self.lock:
+            self.counters["requests"] += 1
+            digest = self.chunk_index.get(key)
+            path = None
+            if digest is not None:
+                data = self.ram.get(digest)
+                if data is not None:
+                    self.counters["ram_hits"] += 1
+                    return data
+                path = self.disk.lookup(digest)
+                if path is None:
+                    # Evicted from both tiers
+                    del self.chunk_index[key]
+                    self.path_keys[relpath].discard(key)
+        if path is not None:
+            data = self._read_disk(digest, path)
+            if data is not None:
+                return data
+
+        with self.lock:
+            future = self.inflight.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+                leader = False
+            else:
+                future = self.inflight[key] = Future()
+                self.counters["misses"] += 1
+                leader = True
+        if not leader:
+            return future.result()
+
+        try:
+            data = self._fetch(relpath, chunk)
+            digest = hashlib.sha256(data).hexdigest()
+            tmp = self.disk.stage(digest, data)
+            with self.lock:
+                self.counters["bytes_from_source"] += len(data)
+                self.chunk_index[key] = digest
+                self.path_keys[relpath].add(key)
+                self.ram.put(digest, data)
+                paths = self.disk.reserve(digest, len(data))
+            future.set_result(data)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+        # Waiters and RAM hits are served while the disk tier deletes and renames files
+        if paths is None:
+            self.disk.discard(tmp)
+        else:
+            stored, failed = self.disk.publish(digest, tmp, paths)
+            with self.lock:
+                self.disk.commit(digest, stored, paths, failed)
+        return data
+
+    def iter_read(self, relpath, offset, length):
+        """Yield the bytes of a range one chunk at a time, so large ranges are never held in memory."""
+        size = self.size(relpath)
+        end = min(offset + length, size)
+        pos = offset
+        while pos < end:
+            chunk, start = divmod(pos, self.chunk_size)
+            data = self.get_chunk(relpath, chunk)
+            piece = data[start:start + (end - pos)]
+            if not piece:
+                break
+            with self.lock:
+                self.counters["bytes_served"] += len(piece)
+            yield piece
+            pos += len(piece)
+
+    def read(self, relpath, offset, length):
+        return b"".join(self.iter_read(relpath, offset, length))
+
+    def stats(self):
+        with self.lock:
+            c = dict(self.counters)
+            lookups = c["requests"] or 1
+            c.update(
+                ram_hit_rate=c["ram_hits"] / lookups,
+                disk_hit_rate=c["disk_hits"] / lookups,
+                hit_rate=(c["ram_hits"] + c["disk_hits"] + c["coalesced"]) / lookups,
+                bytes_saved=max(c["bytes_served"] - c["bytes_from_source"], 0),
+                ram_used=self.ram.used, ram_budget=self.ram.budget, ram_evictions=self.ram.evictions,
+                disk_used=self.disk.used, disk_budget=self.disk.budget, disk_evictions=self.disk.evictions,
+            )
+        return c
+
+
+class RangeError(ValueError):
+
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+def parse_range(header, size):
+    """(start, end) of a single "bytes=" range, None to send the whole file; RangeError 400 or 416 otherwise."""
+    if not header or not header.startswith("bytes="):
+        # Other units are ignored, as RFC 7233 allows
+        return None
+    spec = header[6:].strip()
+    if "," in spec:
+        # Multipart responses are not supported
+        raise RangeError(416)
+    match = _BYTE_RANGE.match(spec)
+    if not match or not any(match.groups()):
+        raise RangeError(400)
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            raise RangeError(400)
+    else:
+        # Suffix range, the last N bytes
+        if not int(last):
+            raise RangeError(416)
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size:
+        raise RangeError(416)
+    return start, end
+
+
+def make_handler(cache):
+
+    class CacheRequestHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            relpath = unquote(self.path.lstrip("/"))
+            if relpath == "_stats":
+                return self._send(200, json.dumps(cache.stats()).encode(), "application/json")
+            try:
+                size = cache.size(relpath)
+            except (OSError, ValueError):
+                return self._send(404, b"not found")
+            try:
+                byte_range = parse_range(self.headers.get("Range"), size)
+            except RangeError as exc:
+                headers = {"Content-Range": f"bytes */{size}"} if exc.status == 416 else {}
+                return self._send(exc.status, b"", headers=headers)
+            if byte_range is None:
+                return self._stream(200, relpath, 0, size, {})
+            start, end = byte_range
+            self._stream(206, relpath, start, end - start + 1, {"Content-Range": f"bytes {start}-{end}/{size}"})
+
+        def do_HEAD(self):
+            relpath = unquote(self.path.lstrip("/"))
+            try:
+                size = cache.size(relpath)
+                byte_range = parse_range(self.headers.get("Range"), size)
+            except RangeError as exc:
+                return self._send(exc.status, b"", send_body=False)
+            except (OSError, ValueError):
+                return self._send(404, b"", send_body=False)
+            start, end = byte_range or (0, size - 1)
+            chunks = range(start // cache.chunk_size, end // cache.chunk_size + 1) if size else ()
+            headers = {"X-Cache": "hit" if all(cache.cached(relpath, c) for c in chunks) else "miss",
+                       "Content-Length": str(end - start + 1)}
+            if byte_range:
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            self._send(206 if byte_range else 200, b"", "application/octet-stream", headers, send_body=False)
+
+        def _stream(self, status, relpath, offset, length, headers):
+            # Written chunk by chunk; surveys are far larger than the memory of the cache instance
+            self._send(status, b"", "application/octet-stream", dict(headers, **{"Content-Length": str(length)}),
+                       send_body=False)
+            sent = 0
+            try:
+                for piece in cache.iter_read(relpath, offset, length):
+                    self.wfile.write(piece)
+                    sent += len(piece)
+            except OSError:
+                # The source failed mid-response, or the client went away
+                pass
+            if sent != length:
+                # The file changed size after the headers went out; a short body must end the connection
+                self.close_connection = True
+
+        def _send(self, status, body, content_type="text/plain", headers=None, send_body=True):
+            headers = dict(headers or {})
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", headers.pop("Content-Length", str(len(body))))
+            self.send_header("Accept-Ranges", "bytes")
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return CacheRequestHandler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Two-tier read-through chunk cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="serve the source directory through the cache over HTTP")
+    serve.add_argument("--source", required=True, help="directory to cache, e.g. the FSx share")
+    serve.add_argument("--cache-dir", required=True, help="directory on the local cache volume")
+    serve.add_argument("--ram-gb", type=float, default=8)
+    serve.add_argument("--disk-gb", type=float, default=100)
+    serve.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_SIZE / MB)
+    serve.add_argument("--ram-policy", choices=POLICIES, default="lru")
+    serve.add_argument("--disk-policy", choices=POLICIES, default="lfu")
+    serve.add_argument("--bind", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("--wan-profile", help="emulate a WAN path to the source, see local_zone_tools.wan")
+
+    args = parser.parse_args(argv)
+    opener = open
+    if args.wan_profile:
+        from local_zone_tools.wan import PROFILES, WanOpener
+        opener = WanOpener(PROFILES[args.wan_profile])
+    cache = ChunkCache(args.source, args.cache_dir, int(args.ram_gb * GB), int(args.disk_gb * GB),
+                       chunk_size=int(args.chunk_mb * MB), ram_policy=args.ram_policy,
+                       disk_policy=args.disk_policy, opener=opener)
+    server = ThreadingHTTPServer((args.bind, args.port), make_handler(cache))
+    print(f"serving {args.source} through {args.cache_dir} on {args.bind}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        cache.save_index()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Error-bounded float32 compression for seismic amplitudes.
+
+Two modes, applied chunk by chunk so data can be streamed:
+
+    lossless  byte-shuffle the float32 values into four byte planes, then DEFLATE.
+    lossy     quantise to a uniform grid of step 2 * error_bound, delta-encode
+              along the last (sample) axis, zigzag, byte-shuffle, then DEFLATE.
+              Every decoded value is within error_bound of the original.
+              A relative bound is taken as a fraction of the chunk's value range.
+
+Each encoded chunk is self-describing (mode, shape and bound are in its
+header), so a reader only needs decode_chunk(). Bricked volumes written with
+a codec (see local_zone_tools.bricks) store encoded bricks, which is how
+compressed data moves from the FSx volume to the cache-instance-edge disk.
+
+    python -m local_zone_tools.codec bench --mode lossy --rel-error 1e-3
+    python -m local_zone_tools.codec bench --segy survey.sgy --inlines 20
+"""
+import argparse
+import json
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from local_zone_tools import segy
+from local_zone_tools.stats import MB, throughput_mb_s
+
+RAW, LOSSLESS, LOSSY = 0, 1, 2
+MODES = {"raw": RAW, "lossless": LOSSLESS, "lossy": LOSSY}
+
+# magic, mode, ndim, error bound, payload length; followed by ndim uint32 dims
+_CHUNK_HEADER = struct.Struct("<2sBBdI")
+_MAGIC = b"LZ"
+_MAX_QUANT = 2 ** 29
+
+
+def _shuffle(values):
+    # Group byte k of every value together so similar exponent/high bytes compress well
+    return values.view(np.uint8).reshape(-1, values.dtype.itemsize).T.copy().tobytes()
+
+
+def _unshuffle(raw, dtype, count):
+    planes = np.frombuffer(raw, dtype=np.uint8).reshape(np.dtype(dtype).itemsize, count)
+    return planes.T.copy().view(dtype).ravel()
+
+
+def encode_chunk(samples, mode=LOSSLESS, abs_error=None, rel_error=None, level=1):
+    """Encode a float32 array. For LOSSY give abs_error or rel_error (fraction of the value range)."""
+    samples = np.ascontiguousarray(samples, dtype="<f4")
+    bound = 0.0
+    if mode == LOSSY:
+        bound = abs_error if abs_error is not None else 0.0
+        if rel_error is not None and samples.size:
+            bound = float(rel_error * (samples.max() - samples.min()))
+        span = float(np.abs(samples).max()) if samples.size else 0.0
+        # Leave room for rounding the reconstruction back to float32
+        bound -= span * 2.0 ** -23
+        # Fall back to lossless when the bound is used up, values are not finite or the grid would overflow
+        if bound <= 0 or not np.isfinite(span) or span / (2 * bound) >= _MAX_QUANT:
+            mode, bound = LOSSLESS, 0.0
+
+    if mode == RAW:
+        payload = samples.tobytes()
+    elif mode == LOSSLESS:
+        payload = zlib.compress(_shuffle(samples.ravel()), level)
+    elif mode == LOSSY:
+        q = np.rint(samples.astype(np.float64) / (2 * bound)).astype(np.int64)
+        delta = np.diff(q, axis=-1, prepend=np.int64(0)) if q.ndim else q
+        zigzag = ((delta << 1) ^ (delta >> 63)).astype("<u4")
+        payload = zlib.compress(_shuffle(zigzag.ravel()), level)
+    else:
+        raise ValueError(f"unknown codec mode {mode}")
+
+    header = _CHUNK_HEADER.pack(_MAGIC, mode, samples.ndim, bound, len(payload))
+    return header + struct.pack(f"<{samples.ndim}I", *samples.shape) + payload
+
+
+def decode_chunk(buf, offset=0):
+    """Decode one chunk from buf at offset. Returns (array, bytes consumed)."""
+    magic, mode, ndim, bound, length = _CHUNK_HEADER.unpack_from(buf, offset)
+    if magic != _MAGIC:
+        raise ValueError("not an encoded seismic chunk")
+    pos = offset + _CHUNK_HEADER.size
+    shape = struct.unpack_from(f"<{ndim}I", buf, pos)
+    pos += 4 * ndim
+    payload = bytes(buf[pos:pos + length])
+    count = int(np.prod(shape))
+
+    if mode == RAW:
+        samples = np.frombuffer(payload, dtype="<f4").copy()
+    elif mode == LOSSLESS:
+        samples = _unshuffle(zlib.decompress(payload), "<f4", count)
+    elif mode == LOSSY:
+        zigzag = _unshuffle(zlib.decompress(payload), "<u4", count).reshape(shape)
+        delta = (zigzag >> 1).astype(np.int64) ^ -(zigzag & 1).astype(np.int64)
+        q = np.cumsum(delta, axis=-1) if ndim else delta
+        samples = (q * (2 * bound)).astype(np.float32)
+    else:
+        raise ValueError(f"unknown codec mode {mode}")
+    return samples.reshape(shape).astype(np.float32, copy=False), pos + length - offset
+
+
+class StreamEncoder:
+    """Write a sequence of arrays as encoded chunks to a binary file object."""
+
+    def __init__(self, f, mode=LOSSLESS, abs_error=None, rel_error=None, level=1):
+        self.f = f
+        self.options = dict(mode=mode, abs_error=abs_error, rel_error=rel_error, level=level)
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def write(self, samples):
+        encoded = encode_chunk(samples, **self.options)
+        self.f.write(encoded)
+        self.bytes_in += np.asarray(samples).size * 4
+        self.bytes_out += len(encoded)
+
+
+def iter_decode(f):
+    """Yield arrays from a file object written by StreamEncoder, one chunk at a time."""
+    while True:
+        header = f.read(_CHUNK_HEADER.size)
+        if not header:
+            return
+        _, _, ndim, _, length = _CHUNK_HEADER.unpack(header)
+        rest = f.read(4 * ndim + length)
+        yield decode_chunk(header + rest)[0]
+
+
+def benchmark(chunks, mode, abs_error=None, rel_error=None, level=1):
+    """Compression ratio, single-core encode/decode MB/s and max error over a list of arrays."""
+    raw_bytes = sum(c.size * 4 for c in chunks)
+    start = time.perf_counter()
+    encoded = [encode_chunk(c, mode, abs_error, rel_error, level) for c in chunks]
+    encode_s = time.perf_counter() - start
+    start = time.perf_counter()
+    decoded = [decode_chunk(e)[0] for e in encoded]
+    decode_s = time.perf_counter() - start
+    max_error = max(float(np.abs(c - d).max()) for c, d in zip(chunks, decoded)) if chunks else 0.0
+    value_range = max(float(c.max() - c.min()) for c in chunks) if chunks else 0.0
+    encoded_bytes = sum(len(e) for e in encoded)
+    return {
+        "mode": {v: k for k, v in MODES.items()}[mode],
+        "abs_error": abs_error,
+        "rel_error": rel_error,
+        "chunks": len(chunks),
+        "raw_bytes": raw_bytes,
+        "encoded_bytes": encoded_bytes,
+        "ratio": raw_bytes / encoded_bytes if encoded_bytes else 0.0,
+        "encode_mb_s": throughput_mb_s(raw_bytes, encode_s),
+        "decode_mb_s": throughput_mb_s(raw_bytes, decode_s),
+        "max_abs_error": max_error,
+        "max_rel_error": max_error / value_range if value_range else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seismic float32 codec")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("bench", help="report ratio, speed and error on synthetic or real traces")
+    bench.add_argument("--segy", help="SEG-Y file to sample inlines from, synthetic data if omitted")
+    bench.add_argument("--inlines", type=int, default=16, help="number of inlines (chunks) to encode")
+    bench.add_argument("--mode", choices=MODES, nargs="+", default=["lossless", "lossy"])
+    bench.add_argument("--abs-error", type=float)
+    bench.add_argument("--rel-error", type=float, default=1e-3)
+    bench.add_argument("--level", type=int, default=1, help="DEFLATE level, 1 is fastest")
+
+    args = parser.parse_args(argv)
+    if args.segy:
+        geometry = segy.read_geometry(args.segy)
+        chunks = [s for _, s in segy.iter_inlines(args.segy, geometry, 0, min(args.inlines, geometry.n_inlines))]
+    else:
+        geometry = segy.SegyGeometry(args.inlines, 256, 1000)
+        chunks = [segy.synthetic_inline(geometry, il) for il in range(args.inlines)]
+    rel_error = None if args.abs_error is not None else args.rel_error
+    results = [benchmark(chunks, MODES[mode], args.abs_error, rel_error, args.level) for mode in args.mode]
+    print(json.dumps({"source": args.segy or "synthetic", "chunk_mb": chunks[0].nbytes / MB if chunks else 0,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+"""Offline analysis of exported VPC flow logs for the Local Zone and Sydney subnets.
+
+NetworkCdkStack sends flow logs for the workload VPC to CloudWatch Logs.
+Export them with a CloudWatch Logs export task to S3 (gzipped lines prefixed
+with an ingestion timestamp) or with aws logs filter-log-events, then:
+
+    python -m local_zone_tools.flowlogs analyze export/*.gz --window 3600 --top 20 --output flows.json
+
+Files are streamed in blocks of lines and each block is parsed and
+aggregated with numpy, so memory use depends on the number of distinct
+talkers and time windows, not on the size of the input. Reports:
+
+    * top talkers by bytes, with the zone of each end;
+    * bytes and MB/s per time window for SMB (445), NICE DCV (8443) and
+      RDP (3389), matched on either port so replies count too;
+    * volume between each Local Zone and Sydney per window in each
+      direction. Give one --local-zone NAME=CIDR per Local Zone subnet;
+      the default is perth=10.0.50.0/24.
+
+Traffic between two ENIs in the VPC is logged at both ENIs. Each flow is
+counted once, at the ENI of its source (or at the receiving ENI when the
+source is outside the VPC). An ENI's own address comes from the
+flow-direction field when the log format has it, and otherwise is the VPC
+address that appears in every one of its records. An ENI with a single
+peer has two such addresses; when another ENI logs the same pair the two
+are given different addresses, which counts each direction once, and
+otherwise all of its records are kept.
+"""
+import argparse
+import gzip
+import ipaddress
+import json
+import re
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from local_zone_tools.stats import MB
+
+DEFAULT_FORMAT = ("version account-id interface-id srcaddr dstaddr srcport dstport protocol "
+                  "packets bytes start end action log-status")
+PORTS = {445: "smb", 8443: "dcv", 3389: "rdp"}
+LOCAL_ZONES = {"perth": "10.0.50.0/24"}
+# Zone codes of addresses; the Local Zones follow from 2 in the order given
+EXTERNAL, REGION = range(2)
+# Every field a flow log record can have, to recognise the header line of S3 delivered files
+FIELD_NAMES = frozenset((
+    "version account-id interface-id srcaddr dstaddr srcport dstport protocol packets bytes start end action "
+    "log-status vpc-id subnet-id instance-id tcp-flags type pkt-srcaddr pkt-dstaddr region az-id sublocation-type "
+    "sublocation-id pkt-src-aws-service pkt-dst-aws-service flow-direction traffic-path ecs-cluster-arn "
+    "ecs-cluster-name ecs-container-instance-arn ecs-container-instance-id ecs-container-id ecs-second-container-id "
+    "ecs-service-name ecs-task-definition-arn ecs-task-arn ecs-task-id reject-reason").split())
+# eni_address value for ENIs whose records are all kept
+_KEEP_ALL = -2
+# Records start with a digit (the version or the export timestamp); any other line may be a header
+_NOT_A_RECORD = re.compile(rb"^[^\d\s]", re.MULTILINE)
+
+# own is the ENI's own address when the record has a flow-direction, else -1
+_AGGREGATE = np.dtype([("window", "<i8"), ("eni", "<i4"), ("src", "<i4"), ("dst", "<i4"), ("port", "<i4"),
+                       ("own", "<i4")])
+_FIELDS = _AGGREGATE.names
+
+
+def _open(path):
+    return gzip.open(path, "rb") if str(path).endswith(".gz") else open(path, "rb")
+
+
+def iter_blocks(paths, block_bytes=32 * MB):
+    """Yield lists of complete raw lines, about block_bytes at a time, file by file."""
+    for path in paths:
+        with _open(path) as f:
+            tail = b""
+            while True:
+                data = f.read(block_bytes)
+                if not data:
+                    break
+                data = tail + data
+                end = data.rfind(b"\n") + 1
+                if not end:
+                    tail = data
+                    continue
+                tail = data[end:]
+                yield data[:end].strip().split(b"\n")
+            if tail.strip():
+                yield [tail.strip()]
+
+
+def _group(columns):
+    """Group rows of equal integer columns. Returns (index of each group's first row, group of each row)."""
+    order = np.lexsort(columns[::-1])
+    change = np.zeros(len(order), dtype=bool)
+    change[:1] = True
+    for column in columns:
+        ordered = column[order]
+        change[1:] |= ordered[1:] != ordered[:-1]
+    inverse = np.empty(len(order), dtype=np.int64)
+    inverse[order] = np.cumsum(change) - 1
+    return order[change], inverse
+
+
+def _as_words(values):
+    # Fixed-width byte strings as columns of uint64 words, which sort much faster than strings
+    width = -(-values.dtype.itemsize // 8) * 8
+    words = np.ascontiguousarray(values.astype(f"S{width}")).view("<u8").reshape(len(values), -1)
+    return list(words.T)
+
+
+def _is_header(line):
+    parts = line.split(None, 1)
+    return bool(parts) and parts[0].decode(errors="replace").strip("${}") in FIELD_NAMES
+
+
+def _most_common(enis, addresses, size):
+    """The address seen most often with each ENI, -1 for ENIs not in enis."""
+    result = np.full(size, -1, dtype=np.int64)
+    if len(enis):
+        uniques, counts = np.unique(np.stack([enis, addresses], axis=1), axis=0, return_counts=True)
+        best = uniques[np.lexsort((counts, uniques[:, 0]))]
+        last = np.r_[best[1:, 0] != best[:-1, 0], True]
+        result[best[last, 0]] = best[last, 1]
+    return result
+
+
+class FlowLogAnalyzer:
+
+    def __init__(self, window_s=3600, local_zones=None, vpc_cidr="10.0.0.0/16", log_format=DEFAULT_FORMAT,
+                 region_name="sydney"):
+        self.window_s = window_s
+        self.local_zones = {name: ipaddress.ip_network(cidr) for name, cidr in (local_zones or LOCAL_ZONES).items()}
+        networks = list(self.local_zones.values())
+        for i, network in enumerate(networks):
+            if any(network.overlaps(other) for other in networks[:i]):
+                raise ValueError(f"local zone CIDR {network} overlaps another local zone")
+        self.vpc = ipaddress.ip_network(vpc_cidr)
+        self.zone_names = ["external", region_name] + list(self.local_zones)
+        self.set_format(log_format)
+        self.addresses = {}
+        self.zones = []
+        self.enis = {}
+        self.keys = np.zeros(0, dtype=_AGGREGATE)
+        self.bytes = np.zeros(0, dtype=np.int64)
+        self.records = 0
+        self.skipped = 0
+
+    def set_format(self, log_format):
+        self.fields = [f.strip("${}") for f in log_format.split()]
+        missing = {"interface-id", "srcaddr", "dstaddr", "srcport", "dstport", "bytes", "start"} - set(self.fields)
+        if missing:
+            raise ValueError(f"flow log format lacks fields {sorted(missing)}")
+        self.column = {name: i for i, name in enumerate(self.fields)}
+
+    def _zone(self, text):
+        try:
+            address = ipaddress.ip_address(text)
+        except ValueError:
+            return EXTERNAL
+        for i, network in enumerate(self.local_zones.values()):
+            if address in network:
+                return REGION + 1 + i
+        return REGION if address in self.vpc else EXTERNAL
+
+    def _codes(self, table, values, on_new=None):
+        # Map a column of byte strings to stable integer codes, touching only its distinct values in Python
+        firsts, inverse = _group(_as_words(values))
+        uniques = values[firsts]
+        codes = np.empty(len(uniques), dtype=np.int32)
+        for i, value in enumerate(uniques):
+            code = table.get(value)
+            if code is None:
+                code = table[value] = len(table)
+                if on_new:
+                    on_new(value)
+            codes[i] = code
+        return codes[inverse]
+
+    def _header_lines(self, block):
+        """Indexes of the header lines in a block, checking only lines that do not start like a record."""
+        text = b"\n".join(block)
+        headers = []
+        line, pos = 0, 0
+        for match in _NOT_A_RECORD.finditer(text):
+            line += text.count(b"\n", pos, match.start())
+            pos = match.start()
+            if _is_header(block[line]):
+                headers.append(line)
+        return headers
+
+    def _split(self, block):
+        # Lines of one format, without headers
+        width = len(self.fields)
+        tokens = b" ".join(block).split()
+        if len(tokens) == width * len(block):
+            return np.array(tokens).reshape(-1, width)
+        if len(tokens) == (width + 1) * len(block):
+            # CloudWatch Logs export prefixes each line with its ingestion time
+            return np.array(tokens).reshape(-1, width + 1)[:, 1:]
+        # Slow path for mixed export timestamps and malformed lines
+        rows = []
+        for line in block:
+            parts = line.split()
+            if not parts:
+                continue
+            if len(parts) == width + 1:
+                parts = parts[1:]
+            if len(parts) == width:
+                rows.append(parts)
+            else:
+                self.skipped += 1
+        if not rows:
+            return np.zeros((0, width), dtype="S1")
+        return np.array(rows)
+
+    def add_block(self, block):
+        # S3 delivered files start with a header line naming the fields, and files joined together repeat it
+        # further down, possibly with another format; each run of records is parsed with its own format
+        start = 0
+        for i in self._header_lines(block):
+            self._add_records(block[start:i])
+            self.set_format(block[i].decode())
+            start = i + 1
+        self._add_records(block[start:])
+
+    def _add_records(self, block):
+        if not block:
+            return
+        table = self._split(block)
+        column = self.column
+        status = table[:, column["log-status"]] if "log-status" in column else None
+        ok = table[:, column["bytes"]] != b"-"
+        if status is not None:
+            ok &= status == b"OK"
+        self.skipped += int((~ok).sum())
+        table = table[ok]
+        if not len(table):
+            return
+        self.records += len(table)
+
+        n_bytes = table[:, column["bytes"]].astype(np.int64)
+        window = table[:, column["start"]].astype(np.int64) // self.window_s
+        src_port = table[:, column["srcport"]].astype(np.int32)
+        dst_port = table[:, column["dstport"]].astype(np.int32)
+        port = np.where(np.isin(dst_port, list(PORTS)), dst_port, np.where(np.isin(src_port, list(PORTS)), src_port, 0))
+
+        addresses = self._codes(self.addresses, np.concatenate([table[:, column["srcaddr"]], table[:, column["dstaddr"]]]),
+                                lambda value: self.zones.append(self._zone(value.decode())))
+        keys = np.empty(len(table), dtype=_AGGREGATE)
+        keys["window"] = window
+        keys["eni"] = self._codes(self.enis, table[:, column["interface-id"]])
+        keys["src"] = addresses[:len(table)]
+        keys["dst"] = addresses[len(table):]
+        keys["port"] = port
+        keys["own"] = -1
+        if "flow-direction" in column:
+            direction = table[:, column["flow-direction"]]
+            keys["own"] = np.where(direction == b"egress", keys["src"],
+                                   np.where(direction == b"ingress", keys["dst"], -1))
+        self._merge(keys, n_bytes)
+
+    def _merge(self, keys, n_bytes):
+        keys = np.concatenate([self.keys, keys])
+        n_bytes = np.concatenate([self.bytes, n_bytes])
+        firsts, inverse = _group([keys[name] for name in _FIELDS])
+        self.keys = keys[firsts]
+        self.bytes = np.bincount(inverse, weights=n_bytes, minlength=len(firsts)).astype(np.int64)
+
+    def deduplicated(self):
+        """Aggregate rows with each flow counted at one ENI only."""
+        keys, n_bytes = self.keys, self.bytes
+        if not len(keys):
+            return keys, n_bytes
+        zones = np.array(self.zones, dtype=np.int8)
+        eni_address = self._eni_addresses(keys, zones)
+        own = eni_address[keys["eni"]]
+        keep = (keys["src"] == own) | (own == _KEEP_ALL) | (zones[keys["src"]] == EXTERNAL)
+        return keys[keep], n_bytes[keep]
+
+    def _eni_addresses(self, keys, zones):
+        size = len(self.enis)
+        known = keys["own"] >= 0
+        eni_address = _most_common(keys["eni"][known], keys["own"][known], size)
+
+        # Otherwise the in-VPC addresses found in every record of the ENI, as source or destination
+        pairs = np.concatenate([np.stack([keys["eni"], keys["src"]], axis=1),
+                                np.stack([keys["eni"], keys["dst"]], axis=1)[keys["src"] != keys["dst"]]])
+        pairs = pairs[zones[pairs[:, 1]] != EXTERNAL]
+        uniques, counts = np.unique(pairs, axis=0, return_counts=True)
+        rows = np.bincount(keys["eni"], minlength=size)
+        candidates = defaultdict(set)
+        for eni, address in uniques[counts == rows[uniques[:, 0]]].tolist():
+            if eni_address[eni] < 0:
+                candidates[eni].add(address)
+
+        # An address belongs to one ENI: settle ENIs left with one unclaimed candidate until none are
+        claimed = set(eni_address[eni_address >= 0].tolist())
+        settled = True
+        while settled:
+            settled = False
+            for eni, options in list(candidates.items()):
+                options -= claimed
+                if len(options) == 1:
+                    eni_address[eni] = address = options.pop()
+                    claimed.add(address)
+                    del candidates[eni]
+                    settled = True
+                elif not options:
+                    del candidates[eni]
+
+        # Both ends of a single peer flow: ENIs logging the same pair get different addresses, so each
+        # direction is kept once; an ENI whose pair no other ENI logs keeps all of its records
+        shared = defaultdict(list)
+        for eni, options in candidates.items():
+            shared[frozenset(options)].append(eni)
+        for options, enis in shared.items():
+            if len(enis) == 1:
+                eni_address[enis[0]] = _KEEP_ALL
+                continue
+            for eni, address in zip(sorted(enis), sorted(options)):
+                eni_address[eni] = address
+
+        # ENIs with several addresses of their own: the in-VPC address seen in most of their records
+        unresolved = eni_address[pairs[:, 0]] == -1
+        fallback = _most_common(pairs[unresolved, 0], pairs[unresolved, 1], size)
+        return np.where(eni_address == -1, fallback, eni_address)
+
+    def report(self, top=20):
+        keys, n_bytes = self.deduplicated()
+        names = [a.decode() for a in self.addresses]
+        zones = np.array(self.zones, dtype=np.int8)
+        src_zone = zones[keys["src"]] if len(keys) else np.zeros(0, dtype=np.int8)
+        dst_zone = zones[keys["dst"]] if len(keys) else np.zeros(0, dtype=np.int8)
+
+        pair = keys["src"].astype(np.int64) << 32 | keys["dst"].astype(np.int64)
+        pairs, inverse = np.unique(pair, return_inverse=True)
+        pair_bytes = np.bincount(inverse, weights=n_bytes, minlength=len(pairs)).astype(np.int64)
+        talkers = []
+        for i in np.argsort(pair_bytes)[::-1][:top]:
+            src, dst = int(pairs[i] >> 32), int(pairs[i] & 0xFFFFFFFF)
+            talkers.append({"src": names[src], "dst": names[dst], "src_zone": self.zone_names[zones[src]],
+                            "dst_zone": self.zone_names[zones[dst]], "bytes": int(pair_bytes[i])})
+
+        windows = []
+        region = self.zone_names[REGION]
+        cross = {}
+        for i, name in enumerate(self.local_zones, start=REGION + 1):
+            cross[f"{name}_to_{region}"] = (src_zone == i) & (dst_zone == REGION)
+            cross[f"{region}_to_{name}"] = (src_zone == REGION) & (dst_zone == i)
+        any_cross = np.zeros(len(keys), dtype=bool)
+        for mask in cross.values():
+            any_cross |= mask
+        for window in np.unique(keys["window"]):
+            in_window = keys["window"] == window
+            entry = {"start": datetime.fromtimestamp(int(window) * self.window_s, timezone.utc).isoformat(),
+                     "bytes": int(n_bytes[in_window].sum())}
+            for direction, mask in cross.items():
+                total = int(n_bytes[in_window & mask].sum())
+                entry[direction] = {"bytes": total, "mb_s": total / MB / self.window_s}
+            entry["ports"] = {}
+            for port, name in PORTS.items():
+                on_port = in_window & (keys["port"] == port)
+                total = int(n_bytes[on_port].sum())
+                cross_zone = int(n_bytes[on_port & any_cross].sum())
+                entry["ports"][name] = {"port": port, "bytes": total, "mb_s": total / MB / self.window_s,
+                                        "cross_zone_bytes": cross_zone}
+            windows.append(entry)
+
+        result = {
+            "window_s": self.window_s,
+            "local_zones": {name: str(network) for name, network in self.local_zones.items()},
+            "vpc_cidr": str(self.vpc),
+            "records": self.records,
+            "skipped": self.skipped,
+            "bytes_logged": int(self.bytes.sum()),
+            "bytes_deduplicated": int(n_bytes.sum()),
+        }
+        for direction, mask in cross.items():
+            result[f"{direction}_bytes"] = int(n_bytes[mask].sum())
+        result.update({
+            "top_talkers": talkers,
+            "windows": windows,
+        })
+        return result
+
+
+def analyze(paths, window_s=3600, local_zones=None, vpc_cidr="10.0.0.0/16", log_format=DEFAULT_FORMAT,
+            top=20, block_mb=16, region_name="sydney"):
+    analyzer = FlowLogAnalyzer(window_s, local_zones, vpc_cidr, log_format, region_name)
+    for block in iter_blocks(paths, int(block_mb * MB)):
+        analyzer.add_block(block)
+    return analyzer.report(top)
+
+
+def _local_zone(text):
+    name, sep, cidr = text.partition("=")
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"expected NAME=CIDR, got {text!r}")
+    try:
+        ipaddress.ip_network(cidr)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return name, cidr
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VPC flow log analyzer")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("analyze", help="report top talkers, port rates and Local Zone/Sydney volume")
+    run.add_argument("paths", nargs="+", help="exported flow log files, optionally gzipped")
+    run.add_argument("--window", type=int, default=3600, help="seconds per reporting window")
+    run.add_argument("--top", type=int, default=20, help="number of top talkers to report")
+    run.add_argument("--local-zone", action="append", type=_local_zone, metavar="NAME=CIDR",
+                     help="a Local Zone subnet, once per zone; default perth=10.0.50.0/24")
+    run.add_argument("--perth-cidr", help="shorthand for --local-zone perth=CIDR")
+    run.add_argument("--vpc-cidr", default="10.0.0.0/16")
+    run.add_argument("--region-name", default="sydney", help="label of the region's subnets in the report")
+    run.add_argument("--format", default=DEFAULT_FORMAT, help="flow log record format, space separated fields")
+    run.add_argument("--block-mb", type=float, default=16, help="MB of log text parsed per block, bounds memory use")
+    run.add_argument("--output", help="write JSON results here instead of stdout")
+
+    args = parser.parse_args(argv)
+    local_zones = dict(args.local_zone or [])
+    if args.perth_cidr:
+        local_zones["perth"] = args.perth_cidr
+    result = analyze(args.paths, args.window, local_zones or None, args.vpc_cidr, args.format, args.top,
+                     args.block_mb, args.region_name)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Publish cache and benchmark figures as CloudWatch custom metrics.
+
+Feeds the SeismicLocalZone widgets and alarms of ObservabilityCdkStack. Run
+the cache publisher next to the cache service on each cache instance, naming
+it after the instance so the alarms pick it up:
+
+    python -m local_zone_tools.metrics cache http://127.0.0.1:8080 --name cache-instance-edge
+
+and publish benchmark or replay reports after a run, keyed by their label or
+target:
+
+    python -m local_zone_tools.metrics report edge.json
+
+Needs boto3 and credentials allowed cloudwatch:PutMetricData (the instance
+role, or --dry-run to print the metric data instead).
+"""
+import argparse
+import json
+import platform
+import time
+from urllib.request import urlopen
+
+# Must match NAMESPACE in local_zone_cdk/observability_cdk_stack.py
+NAMESPACE = "SeismicLocalZone"
+_DELTA_COUNTERS = (("requests", "CacheRequests"), ("misses", "CacheMisses"),
+                   ("bytes_served", "CacheBytesServed"), ("bytes_from_source", "CacheBytesFromSource"))
+# Requests answered without a source read, as in ChunkCache.stats() hit_rate
+_HIT_COUNTERS = ("ram_hits", "disk_hits", "coalesced")
+
+
+def _datum(name, value, unit, dimensions):
+    return {"MetricName": name, "Value": float(value), "Unit": unit,
+            "Dimensions": [{"Name": k, "Value": str(v)} for k, v in dimensions.items()]}
+
+
+def cache_metrics(stats, previous, name):
+    """Metric data for one cache /_stats poll; counters and the hit rate cover the interval since previous."""
+    dimensions = {"Cache": name}
+    # A restarted cache resets its counters
+    restarted = bool(previous) and stats["requests"] < previous.get("requests", 0)
+
+    def delta(key):
+        if not previous or restarted:
+            return 0
+        return max(stats[key] - previous.get(key, stats[key]), 0)
+
+    data = []
+    for key, metric in _DELTA_COUNTERS:
+        data.append(_datum(metric, delta(key), "Bytes" if key.startswith("bytes") else "Count", dimensions))
+    # The lifetime hit_rate of /_stats barely moves after a long uptime, so the alarm uses the interval's
+    requests = delta("requests")
+    if requests:
+        hits = sum(delta(key) for key in _HIT_COUNTERS)
+        data.append(_datum("CacheHitRate", min(100 * hits / requests, 100), "Percent", dimensions))
+    data.append(_datum("CacheDiskUsed", stats["disk_used"], "Bytes", dimensions))
+    return data
+
+
+def report_metrics(report):
+    """Metric data for a benchmark or replay JSON report."""
+    data = []
+    if "aggregate" in report:
+        # replay report
+        path = report["target"]
+        groups = [({"Path": path}, report["aggregate"])]
+    else:
+        path = report["label"]
+        groups = [({"Path": path, "Pattern": f"{r['pattern']}-{r['method']}"}, r) for r in report["results"]]
+    for dimensions, result in groups:
+        latency = result["latency"]
+        if latency.get("count"):
+            data.append(_datum("ReadLatencyP50", latency["p50_ms"], "Milliseconds", dimensions))
+            data.append(_datum("ReadLatencyP99", latency["p99_ms"], "Milliseconds", dimensions))
+        data.append(_datum("ReadThroughput", result["throughput_mb_s"], "Megabytes/Second", dimensions))
+    return data
+
+
+def publish(data, client=None, dry_run=False):
+    if dry_run:
+        print(json.dumps(data, indent=2))
+        return
+    if client is None:
+        try:
+            import boto3
+        except ImportError:
+            raise SystemExit("publishing metrics needs boto3: pip install boto3")
+        client = boto3.client("cloudwatch")
+    # PutMetricData takes at most 1000 data points per call
+    for i in range(0, len(data), 1000):
+        client.put_metric_data(Namespace=NAMESPACE, MetricData=data[i:i + 1000])
+
+
+def watch_cache(url, name, interval, client=None, dry_run=False):
+    previous = None
+    while True:
+        with urlopen(url.rstrip("/") + "/_stats") as response:
+            stats = json.load(response)
+        publish(cache_metrics(stats, previous, name), client, dry_run)
+        previous = stats
+        time.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish CloudWatch custom metrics")
+    parser.add_argument("--dry-run", action="store_true", help="print metric data instead of publishing")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cache = sub.add_parser("cache", help="poll a cache service and publish its counters")
+    cache.add_argument("url", help="base URL of the cache service")
+    cache.add_argument("--name", default=platform.node(), help="Cache dimension, e.g. cache-instance-edge")
+    cache.add_argument("--interval", type=float, default=60.0, help="seconds between polls")
+    report = sub.add_parser("report", help="publish a benchmark or replay JSON report")
+    report.add_argument("paths", nargs="+")
+
+    args = parser.parse_args(argv)
+    if args.command == "cache":
+        try:
+            watch_cache(args.url, args.name, args.interval, dry_run=args.dry_run)
+        except KeyboardInterrupt:
+            pass
+        return
+    data = []
+    for path in args.paths:
+        with open(path) as f:
+            data.extend(report_metrics(json.load(f)))
+    publish(data, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
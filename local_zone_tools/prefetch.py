@@ -0,0 +1,294 @@
+"""Access-pattern-driven prefetcher for the edge cache.
+
+Learns from recorded access traces (see local_zone_tools.trace) which surveys
+and which byte ranges (and so which inline/crossline ranges) interpreters open
+at which time of day, predicts the working set for a target time and stages it
+into the edge cache ahead of time within a bandwidth and capacity budget.
+
+    # Evaluate the prediction against the last day of a trace
+    python -m local_zone_tools.prefetch dry-run --trace access.csv --capacity-gb 800
+
+    # Stage tomorrow morning's working set into the cache directory on the edge disk,
+    # within the 900 GB budget the cache service runs with
+    python -m local_zone_tools.prefetch run --trace access.csv --at 2026-10-19T08:00 \\
+        --source \\\\blogdatasvm.energyblog.example.com\\c$\\vol1 --cache-dir D:\\edge-cache \\
+        --capacity-gb 800 --cache-disk-gb 900 --bandwidth-mb 200
+
+    # Or warm a running cache service through its HTTP interface
+    python -m local_zone_tools.prefetch run --trace access.csv --cache-url http://localhost:8080
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from urllib.parse import quote
+
+import numpy as np
+
+from local_zone_tools import trace
+from local_zone_tools.cache import DEFAULT_CHUNK_SIZE, GB, ChunkCache
+from local_zone_tools.stats import MB, throughput_mb_s
+from local_zone_tools.throttle import TokenBucket
+
+DAY = 86400.0
+# Packs (path code, chunk) into one int64 for vectorised set membership
+_PATH_STRIDE = 1 << 40
+
+
+@dataclass
+class PrefetchModel:
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    # Weight of an access halves every half_life_days
+    half_life_days: float = 7.0
+    # Accesses within window_hours of the target time of day count in full, others are down-weighted
+    window_hours: float = 2.0
+    off_window_weight: float = 0.25
+    # Also stage this many chunks either side of an accessed chunk, for interpreters scrolling on
+    neighbours: int = 1
+    neighbour_weight: float = 0.5
+    # Local time zone of the interpreters, Perth is UTC+8
+    utc_offset_hours: float = 8.0
+
+
+def expand_chunks(offsets, lengths, chunk_size):
+    """Return (record index, chunk index) for every chunk touched by every access."""
+    first = offsets // chunk_size
+    last = (offsets + np.maximum(lengths, 1) - 1) // chunk_size
+    counts = last - first + 1
+    record = np.repeat(np.arange(offsets.size), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    return record, first[record] + np.arange(record.size) - starts
+
+
+def _hour_of_day(timestamps, utc_offset_hours):
+    return (timestamps / 3600.0 + utc_offset_hours) % 24.0
+
+
+def _rank(columns, at, capacity_bytes, model):
+    # Returns packed (path, chunk) keys and scores for the chunks that fit in capacity_bytes, best first
+    mask = columns["timestamp"] <= at
+    timestamps = columns["timestamp"][mask]
+    record, chunks = expand_chunks(columns["offset"][mask], columns["length"][mask], model.chunk_size)
+    paths = columns["path"][mask][record]
+
+    age_days = (at - timestamps[record]) / DAY
+    weights = 0.5 ** (age_days / model.half_life_days)
+    distance = np.abs(_hour_of_day(timestamps[record], model.utc_offset_hours)
+                      - _hour_of_day(at, model.utc_offset_hours))
+    distance = np.minimum(distance, 24.0 - distance)
+    weights = weights * np.where(distance <= model.window_hours, 1.0, model.off_window_weight)
+
+    # Spread some weight onto neighbouring chunks of the same file
+    all_paths, all_chunks, all_weights = [paths], [chunks], [weights]
+    for step in range(1, model.neighbours + 1):
+        for direction in (-step, step):
+            all_paths.append(paths)
+            all_chunks.append(chunks + direction)
+            all_weights.append(weights * model.neighbour_weight ** step)
+    paths = np.concatenate(all_paths)
+    chunks = np.concatenate(all_chunks)
+    weights = np.concatenate(all_weights)
+    keep = chunks >= 0
+
+    unique, inverse = np.unique(paths[keep] * _PATH_STRIDE + chunks[keep], return_inverse=True)
+    scores = np.bincount(inverse.ravel(), weights=weights[keep])
+    order = np.argsort(-scores, kind="stable")[:max(int(capacity_bytes // model.chunk_size), 0)]
+    return unique[order], scores[order]
+
+
+def predict(columns, at, capacity_bytes, model=PrefetchModel()):
+    """Rank (path, chunk) pairs by recency and time-of-day weighted access counts.
+
+    Returns a list of (path, chunk, score) whose chunks fit in capacity_bytes, best first.
+    """
+    keys, scores = _rank(columns, at, capacity_bytes, model)
+    names = columns["names"]
+    return [(names[key // _PATH_STRIDE], int(key % _PATH_STRIDE), float(score))
+            for key, score in zip(keys, scores)]
+
+
+def evaluate(columns, cutoff, capacity_bytes, model=PrefetchModel()):
+    """Predict from the trace before cutoff and score it against the accesses after."""
+    train = {k: (v[columns["timestamp"] < cutoff] if isinstance(v, np.ndarray) else v)
+             for k, v in columns.items()}
+    predicted, _ = _rank(train, cutoff, capacity_bytes, model)
+
+    test = columns["timestamp"] >= cutoff
+    record, chunks = expand_chunks(columns["offset"][test], columns["length"][test], model.chunk_size)
+    hits = np.isin(columns["path"][test][record] * _PATH_STRIDE + chunks, predicted)
+    n_records = int(test.sum())
+    # An access is a full hit only if every chunk it touches was prefetched
+    missed = np.bincount(record[~hits], minlength=n_records) if n_records else np.zeros(0)
+    return {
+        "cutoff": datetime.fromtimestamp(cutoff).isoformat(),
+        "model": asdict(model),
+        "capacity_bytes": int(capacity_bytes),
+        "predicted_chunks": len(predicted),
+        "predicted_bytes": len(predicted) * model.chunk_size,
+        "test_accesses": n_records,
+        "test_chunk_reads": int(hits.size),
+        "chunk_hit_rate": float(hits.mean()) if hits.size else 0.0,
+        "access_hit_rate": float((missed == 0).mean()) if n_records else 0.0,
+    }
+
+
+class CacheDirTarget:
+    # Stage straight into a ChunkCache directory; the cache service must not be running on it.
+    # disk_bytes is the cache's own budget; without it nothing already in the directory is evicted.
+
+    def __init__(self, source, cache_dir, chunk_size, disk_bytes=None):
+        self.cache = ChunkCache(source, cache_dir, 0, disk_bytes, chunk_size=chunk_size)
+
+    def cached(self, path, chunk):
+        return self.cache.cached(path, chunk)
+
+    def stage(self, path, chunk):
+        if chunk * self.cache.chunk_size >= self.cache.size(path):
+            # Predicted neighbour past the end of the file
+            return 0
+        return len(self.cache.get_chunk(path, chunk))
+
+    def close(self):
+        self.cache.save_index()
+
+
+class CacheUrlTarget:
+    # Warm a running cache service with ranged GETs
+
+    def __init__(self, url, chunk_size):
+        self.url = url.rstrip("/")
+        self.chunk_size = chunk_size
+
+    def _range(self, chunk):
+        start = chunk * self.chunk_size
+        return {"Range": f"bytes={start}-{start + self.chunk_size - 1}"}
+
+    def cached(self, path, chunk):
+        # HEAD reports whether the chunk is cached without transferring it
+        request = urllib.request.Request(f"{self.url}/{quote(path)}", headers=self._range(chunk), method="HEAD")
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.headers.get("X-Cache") == "hit"
+        except urllib.error.HTTPError as exc:
+            if exc.code in (404, 416, 501):
+                # Missing, past the end of the file, or a cache service without HEAD: let stage() decide
+                return False
+            raise
+
+    def stage(self, path, chunk):
+        start = chunk * self.chunk_size
+        request = urllib.request.Request(f"{self.url}/{quote(path)}",
+                                         headers={"Range": f"bytes={start}-{start + self.chunk_size - 1}"})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return len(response.read())
+        except urllib.error.HTTPError as exc:
+            if exc.code == 416:
+                # Predicted neighbour past the end of the file
+                return 0
+            if exc.code == 404:
+                # Counted as missing, as with a cache directory
+                raise FileNotFoundError(path) from exc
+            raise
+
+    def close(self):
+        pass
+
+
+def stage(predicted, target, chunk_size, bandwidth_bytes_s=None, streams=4):
+    """Copy the predicted chunks into the target, highest score first, within the bandwidth budget."""
+    bucket = TokenBucket(bandwidth_bytes_s, burst_bytes=chunk_size * streams)
+    counters = {"staged": 0, "already_cached": 0, "missing": 0, "outside_source": 0, "past_end": 0, "bytes": 0}
+    lock = threading.Lock()
+
+    def count(name, n=1):
+        with lock:
+            counters[name] += n
+
+    def stage_one(item):
+        path, chunk, _ = item
+        try:
+            if target.cached(path, chunk):
+                count("already_cached")
+                return
+            bucket.consume(chunk_size)
+            n_bytes = target.stage(path, chunk)
+            count("bytes", n_bytes)
+            count("staged" if n_bytes else "past_end")
+        except FileNotFoundError:
+            count("missing")
+        except ValueError:
+            # A trace path outside the cache source
+            count("outside_source")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=streams) as pool:
+        list(pool.map(stage_one, predicted))
+    target.close()
+    elapsed = time.perf_counter() - start
+    counters.update(elapsed_s=elapsed, throughput_mb_s=throughput_mb_s(counters["bytes"], elapsed))
+    return counters
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Predict and pre-stage the edge cache working set")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("dry-run", "run"):
+        p = sub.add_parser(name)
+        p.add_argument("--trace", required=True, help="CSV access trace")
+        p.add_argument("--capacity-gb", type=float, default=100)
+        p.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_SIZE / MB)
+        p.add_argument("--half-life-days", type=float, default=PrefetchModel.half_life_days)
+        p.add_argument("--window-hours", type=float, default=PrefetchModel.window_hours)
+        p.add_argument("--neighbours", type=int, default=PrefetchModel.neighbours)
+        p.add_argument("--utc-offset-hours", type=float, default=PrefetchModel.utc_offset_hours)
+    dry = sub.choices["dry-run"]
+    dry.add_argument("--split", help="ISO time to split the trace at, defaults to one day before its end")
+    run = sub.choices["run"]
+    run.add_argument("--at", help="ISO time to predict for, defaults to now")
+    run.add_argument("--source", help="source directory, used with --cache-dir")
+    run.add_argument("--cache-dir", help="edge cache directory to stage into")
+    run.add_argument("--cache-disk-gb", type=float,
+                     help="disk budget of the cache using --cache-dir (its serve --disk-gb); "
+                          "without it nothing already cached is evicted")
+    run.add_argument("--cache-url", help="URL of a running cache service to warm instead")
+    run.add_argument("--bandwidth-mb", type=float, help="MB/s budget for staging, unlimited if omitted")
+    run.add_argument("--streams", type=int, default=4)
+
+    args = parser.parse_args(argv)
+    model = PrefetchModel(chunk_size=int(args.chunk_mb * MB), half_life_days=args.half_life_days,
+                          window_hours=args.window_hours, neighbours=args.neighbours,
+                          utc_offset_hours=args.utc_offset_hours)
+    capacity = int(args.capacity_gb * GB)
+    columns = trace.load_columns(args.trace)
+
+    if args.command == "dry-run":
+        if args.split:
+            cutoff = datetime.fromisoformat(args.split).timestamp()
+        else:
+            cutoff = float(columns["timestamp"].max()) - DAY
+        print(json.dumps(evaluate(columns, cutoff, capacity, model), indent=2))
+        return
+
+    at = datetime.fromisoformat(args.at).timestamp() if args.at else time.time()
+    if args.cache_url:
+        target = CacheUrlTarget(args.cache_url, model.chunk_size)
+    elif args.source and args.cache_dir:
+        disk_bytes = int(args.cache_disk_gb * GB) if args.cache_disk_gb else None
+        target = CacheDirTarget(args.source, args.cache_dir, model.chunk_size, disk_bytes)
+    else:
+        parser.error("run needs either --cache-url or both --source and --cache-dir")
+    predicted = predict(columns, at, capacity, model)
+    bandwidth = args.bandwidth_mb * MB if args.bandwidth_mb else None
+    report = stage(predicted, target, model.chunk_size, bandwidth, args.streams)
+    report["predicted_chunks"] = len(predicted)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Concurrent TCP and application latency probe for the workstation ports.
+
+Measures, for every target and service, the TCP connect time and an
+application-level round trip on the ports opened by the InstanceCdkStack
+security groups, and prints p50/p95/p99/p99.9 side by side per target:
+
+    dcv  8443  TLS handshake, then HTTP HEAD / to first response byte
+    rdp  3389  X.224 connection request to connection confirm
+    smb   445  SMB2 NEGOTIATE to first response byte
+
+    python -m local_zone_tools.probe run --target perth=10.0.50.12 --target sydney=10.0.1.20 --count 200
+
+A target can override the port or protocol of a service with
+name=host,dcv=9443,smb=1445. Latencies go into HDR-style log-linear
+histograms (about 1% relative precision), so runs of any length use fixed
+memory and can be merged. The standin command serves the rdp, smb and plain
+HTTP protocols locally, for trying the probe without the stacks:
+
+    python -m local_zone_tools.probe standin --base-port 20000
+    python -m local_zone_tools.probe run --target local=127.0.0.1,dcv=20000/http,rdp=20001,smb=20002
+"""
+import argparse
+import asyncio
+import json
+import ssl
+import struct
+import time
+import uuid
+
+import numpy as np
+
+# service: (default port, protocol)
+SERVICES = {"dcv": (8443, "https"), "rdp": (3389, "rdp"), "smb": (445, "smb")}
+PROTOCOLS = ("tcp", "http", "https", "rdp", "smb")
+PERCENTILES = (50, 95, 99, 99.9)
+
+# TPKT + X.224 Connection Request + RDP negotiation request for TLS/CredSSP
+RDP_CONNECTION_REQUEST = bytes.fromhex("030000130ee00000000000" "0100080003000000")
+_SMB2_HEADER = struct.Struct("<4sHHIHHIIQIIQ16s")
+_SMB2_NEGOTIATE = struct.Struct("<HHHHI16sQ")
+SMB2_DIALECTS = (0x0202, 0x0210, 0x0300, 0x0302)
+
+
+def smb2_negotiate_request():
+    header = _SMB2_HEADER.pack(b"\xfeSMB", 64, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, b"\0" * 16)
+    body = _SMB2_NEGOTIATE.pack(36, len(SMB2_DIALECTS), 1, 0, 0, uuid.uuid4().bytes, 0)
+    body += struct.pack(f"<{len(SMB2_DIALECTS)}H", *SMB2_DIALECTS)
+    message = header + body
+    # Direct TCP transport: zero byte then 24-bit length
+    return struct.pack(">I", len(message)) + message
+
+
+class LatencyHistogram:
+    """Log-linear histogram of latencies in microseconds, 2**sub_bits buckets per power of two."""
+
+    def __init__(self, sub_bits=7, max_exponent=36):
+        self.sub_bits = sub_bits
+        self.counts = np.zeros((max_exponent + 1) << sub_bits, dtype=np.int64)
+        self.total = 0
+        self.sum_us = 0.0
+        self.min_us = None
+        self.max_us = None
+
+    def _index(self, values_us):
+        values = np.maximum(np.asarray(values_us, dtype=np.float64), 1.0)
+        exponent = np.floor(np.log2(values)).astype(np.int64)
+        sub = ((values / np.exp2(exponent) - 1.0) * (1 << self.sub_bits)).astype(np.int64)
+        return np.minimum((exponent << self.sub_bits) + sub, len(self.counts) - 1)
+
+    def record(self, seconds):
+        self.record_many([seconds])
+
+    def record_many(self, seconds):
+        values_us = np.asarray(seconds, dtype=np.float64) * 1e6
+        if not values_us.size:
+            return
+        np.add.at(self.counts, self._index(values_us), 1)
+        self.total += int(values_us.size)
+        self.sum_us += float(values_us.sum())
+        low, high = float(values_us.min()), float(values_us.max())
+        self.min_us = low if self.min_us is None else min(self.min_us, low)
+        self.max_us = high if self.max_us is None else max(self.max_us, high)
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.total += other.total
+        self.sum_us += other.sum_us
+        for name, pick in (("min_us", min), ("max_us", max)):
+            values = [v for v in (getattr(self, name), getattr(other, name)) if v is not None]
+            setattr(self, name, pick(values) if values else None)
+
+    def _bucket_value(self, index):
+        # Midpoint of the bucket, in microseconds
+        exponent, sub = index >> self.sub_bits, index & ((1 << self.sub_bits) - 1)
+        return 2.0 ** exponent * (1.0 + (sub + 0.5) / (1 << self.sub_bits))
+
+    def percentile(self, q):
+        if not self.total:
+            return None
+        rank = max(int(np.ceil(q / 100.0 * self.total)), 1)
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(max(self._bucket_value(index), self.min_us), self.max_us)
+
+    def summary(self):
+        """Count, mean and percentiles in milliseconds."""
+        if not self.total:
+            return {"count": 0}
+        result = {"count": self.total, "min_ms": self.min_us / 1000, "mean_ms": self.sum_us / self.total / 1000}
+        for q in PERCENTILES:
+            result[f"p{q:g}_ms"] = self.percentile(q) / 1000
+        result["max_ms"] = self.max_us / 1000
+        return result
+
+
+def parse_target(text):
+    """name=host[,service=port[/protocol]...] into (name, host, {service: (port, protocol)})."""
+    name, _, rest = text.partition("=")
+    if not rest:
+        name, rest = text, text
+    host, *overrides = rest.split(",")
+    services = dict(SERVICES)
+    for override in overrides:
+        service, _, value = override.partition("=")
+        port, _, protocol = value.partition("/")
+        if protocol and protocol not in PROTOCOLS:
+            raise ValueError(f"unknown protocol '{protocol}', expected one of {PROTOCOLS}")
+        services[service] = (int(port), protocol or services.get(service, (None, "tcp"))[1])
+    return name, host, services
+
+
+async def _first_byte(reader, writer, request, timeout):
+    writer.write(request)
+    await writer.drain()
+    start = time.perf_counter()
+    data = await asyncio.wait_for(reader.read(1), timeout)
+    if not data:
+        raise ConnectionError("connection closed before a response")
+    return time.perf_counter() - start
+
+
+async def probe_once(host, port, protocol, timeout=5.0):
+    """Return {phase: seconds} for one connection: connect, plus tls and app where the protocol has them."""
+    result = {}
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    result["connect"] = time.perf_counter() - start
+    try:
+        if protocol == "https":
+            context = ssl.create_default_context()
+            # Workstations use self-signed DCV certificates
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            start = time.perf_counter()
+            await asyncio.wait_for(writer.start_tls(context), timeout)
+            result["tls"] = time.perf_counter() - start
+        if protocol in ("http", "https"):
+            request = f"HEAD / HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode()
+            result["app"] = await _first_byte(reader, writer, request, timeout)
+        elif protocol == "rdp":
+            result["app"] = await _first_byte(reader, writer, RDP_CONNECTION_REQUEST, timeout)
+        elif protocol == "smb":
+            result["app"] = await _first_byte(reader, writer, smb2_negotiate_request(), timeout)
+    finally:
+        writer.close()
+    return result
+
+
+async def probe(targets, count=100, concurrency=4, interval=0.0, timeout=5.0):
+    """Probe every (target, service) count times, up to concurrency connections per pair at once."""
+    histograms = {}
+    errors = {}
+
+    async def worker(key, host, port, protocol, remaining):
+        while remaining:
+            remaining.pop()
+            try:
+                phases = await probe_once(host, port, protocol, timeout)
+            except (OSError, asyncio.TimeoutError, ssl.SSLError) as e:
+                errors.setdefault(key, {}).setdefault(type(e).__name__, 0)
+                errors[key][type(e).__name__] += 1
+            else:
+                for phase, seconds in phases.items():
+                    histograms.setdefault(key, {}).setdefault(phase, LatencyHistogram()).record(seconds)
+            if interval:
+                await asyncio.sleep(interval)
+
+    tasks = []
+    for name, host, services in targets:
+        for service, (port, protocol) in services.items():
+            remaining = list(range(count))
+            key = (name, service)
+            tasks += [worker(key, host, port, protocol, remaining) for _ in range(concurrency)]
+    await asyncio.gather(*tasks)
+    return histograms, errors
+
+
+def report(targets, histograms, errors):
+    results = []
+    for name, host, services in targets:
+        for service, (port, protocol) in services.items():
+            key = (name, service)
+            results.append({"target": name, "host": host, "service": service, "port": port, "protocol": protocol,
+                            "errors": errors.get(key, {}),
+                            "phases": {phase: h.summary() for phase, h in histograms.get(key, {}).items()}})
+    return results
+
+
+def format_table(results):
+    """Side-by-side percentiles, one row per service and phase, one column group per target."""
+    names = list(dict.fromkeys(r["target"] for r in results))
+    by_key = {(r["target"], r["service"]): r for r in results}
+    header = f"{'service':<8}{'phase':<9}" + "".join(f"{name:>34}" for name in names)
+    sub = " " * 17 + "".join(f"{'p50':>8}{'p95':>9}{'p99':>8}{'p99.9':>9}" for _ in names)
+    lines = [header, sub]
+    for service in dict.fromkeys(r["service"] for r in results):
+        phases = dict.fromkeys(p for name in names for p in by_key.get((name, service), {}).get("phases", {}))
+        for phase in phases:
+            row = f"{service:<8}{phase:<9}"
+            for name in names:
+                summary = by_key.get((name, service), {}).get("phases", {}).get(phase, {"count": 0})
+                if summary["count"]:
+                    row += "".join(f"{summary[f'p{q:g}_ms']:>{w}.2f}" for q, w in zip(PERCENTILES, (8, 9, 8, 9)))
+                else:
+                    row += f"{'-':>34}"
+            lines.append(row)
+    return "\n".join(lines) + "\n(ms)"
+
+
+async def _standin_handler(reader, writer, protocol):
+    try:
+        while True:
+            if protocol == "http":
+                request = await reader.readuntil(b"\r\n\r\n")
+                if not request:
+                    break
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                await writer.drain()
+                break
+            if protocol == "rdp":
+                await reader.readexactly(len(RDP_CONNECTION_REQUEST))
+                # Connection confirm without a negotiation response
+                writer.write(bytes.fromhex("0300000b06d00000123400"))
+            elif protocol == "smb":
+                length = struct.unpack(">I", await reader.readexactly(4))[0]
+                await reader.readexactly(length)
+                header = _SMB2_HEADER.pack(b"\xfeSMB", 64, 0, 0, 0, 1, 1, 0, 0, 0, 0, 0, b"\0" * 16)
+                writer.write(struct.pack(">I", len(header)) + header)
+            else:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                writer.write(data)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_standins(host="127.0.0.1", base_port=20000):
+    """Serve http, rdp, smb and tcp echo stand-ins on consecutive ports from base_port, or free ports if 0."""
+    servers = []
+    for offset, protocol in enumerate(("http", "rdp", "smb", "tcp")):
+        server = await asyncio.start_server(
+            lambda r, w, p=protocol: _standin_handler(r, w, p), host, base_port + offset if base_port else 0)
+        servers.append((protocol, server))
+    return servers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TCP and application latency probe")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="probe targets and print percentiles side by side")
+    run.add_argument("--target", action="append", required=True,
+                     help="name=host[,service=port[/protocol]], repeat to compare targets")
+    run.add_argument("--services", nargs="+", choices=SERVICES, help="only probe these services")
+    run.add_argument("--count", type=int, default=100, help="connections per target and service")
+    run.add_argument("--concurrency", type=int, default=4, help="parallel connections per target and service")
+    run.add_argument("--interval", type=float, default=0.0, help="seconds each worker waits between probes")
+    run.add_argument("--timeout", type=float, default=5.0)
+    run.add_argument("--output", help="also write JSON results here")
+    standin = sub.add_parser("standin", help="serve local http, rdp, smb and echo stand-ins")
+    standin.add_argument("--host", default="127.0.0.1")
+    standin.add_argument("--base-port", type=int, default=20000)
+
+    args = parser.parse_args(argv)
+    if args.command == "standin":
+        async def serve():
+            servers = await serve_standins(args.host, args.base_port)
+            for i, (protocol, _) in enumerate(servers):
+                print(f"{protocol} stand-in on {args.host}:{args.base_port + i}")
+            await asyncio.gather(*(server.serve_forever() for _, server in servers))
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        return
+
+    targets = []
+    for text in args.target:
+        name, host, services = parse_target(text)
+        if args.services:
+            services = {s: services[s] for s in args.services}
+        targets.append((name, host, services))
+    histograms, errors = asyncio.run(probe(targets, args.count, args.concurrency, args.interval, args.timeout))
+    results = report(targets, histograms, errors)
+    print(format_table(results))
+    for r in results:
+        if r["errors"]:
+            print(f"{r['target']} {r['service']}: errors {r['errors']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
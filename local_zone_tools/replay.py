@@ -0,0 +1,212 @@
+"""Capture file access traces and replay them with concurrent simulated users.
+
+Capture on a workstation either by exporting a Process Monitor session to CSV
+(filter on Operation is ReadFile and the survey share), or from Python code
+with Recorder. Traces use the CSV format in local_zone_tools.trace.
+
+    python -m local_zone_tools.replay import-procmon session.csv trace.csv --date 2026-10-19 \\
+        --strip-prefix \\\\cache-instance-edge\\surveys\\ --user alice
+
+Replay against a target mount at real-time or N times speed with M users, each
+replaying the trace (or the recorded user's part of it when the trace has more
+than one user), started stagger seconds apart:
+
+    python -m local_zone_tools.replay run trace.csv \\\\cache-instance-edge\\surveys --users 12 --speed 4
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from local_zone_tools import trace
+from local_zone_tools.stats import latency_summary, throughput_mb_s
+
+_PROCMON_DETAIL = re.compile(r"Offset:\s*([\d,]+),\s*Length:\s*([\d,]+)")
+
+
+def import_procmon(src, dst, date, strip_prefix="", user="", process=None):
+    """Convert a Process Monitor CSV export into a trace, keeping ReadFile events only."""
+    records = []
+    with open(src, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            if row.get("Operation") != "ReadFile" or row.get("Result") not in ("SUCCESS", "END OF FILE"):
+                continue
+            if process and row.get("Process Name", "").lower() != process.lower():
+                continue
+            match = _PROCMON_DETAIL.search(row.get("Detail", ""))
+            path = row.get("Path", "")
+            if not match or not path.lower().startswith(strip_prefix.lower()):
+                continue
+            # Time of Day looks like 9:15:02.1234567 AM; drop the sub-microsecond digits
+            clock, _, meridiem = row["Time of Day"].partition(" ")
+            hms, _, fraction = clock.partition(".")
+            stamp = datetime.strptime(f"{date} {hms}.{fraction[:6] or 0} {meridiem}".strip(),
+                                      "%Y-%m-%d %I:%M:%S.%f %p" if meridiem else "%Y-%m-%d %H:%M:%S.%f")
+            records.append(trace.AccessRecord(stamp.timestamp(), user or row.get("Process Name", ""),
+                                              path[len(strip_prefix):].replace("\\", "/"),
+                                              int(match.group(1).replace(",", "")),
+                                              int(match.group(2).replace(",", ""))))
+    records.sort()
+    trace.write_records(dst, records)
+    return len(records)
+
+
+class Recorder:
+    """Record reads made through files opened with Recorder.open into a trace."""
+
+    def __init__(self, root, user=""):
+        self.root = root
+        self.user = user
+        self.records = []
+        self.lock = threading.Lock()
+
+    def open(self, relpath):
+        return _RecordingFile(self, relpath, open(os.path.join(self.root, relpath), "rb"))
+
+    def save(self, path):
+        with self.lock:
+            trace.write_records(path, sorted(self.records))
+
+
+class _RecordingFile:
+
+    def __init__(self, recorder, relpath, f):
+        self.recorder = recorder
+        self.relpath = relpath
+        self.f = f
+
+    def read(self, size=-1):
+        offset = self.f.tell()
+        data = self.f.read(size)
+        with self.recorder.lock:
+            self.recorder.records.append(trace.AccessRecord(time.time(), self.recorder.user, self.relpath,
+                                                            offset, len(data)))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.f.close()
+
+
+def _sessions(records, n_users):
+    # One session per simulated user, cycling through the recorded users
+    by_user = defaultdict(list)
+    for record in records:
+        by_user[record.user].append(record)
+    recorded = list(by_user.values())
+    return [recorded[i % len(recorded)] for i in range(n_users)]
+
+
+def replay_session(target, session, speed, start_at, t0):
+    """Replay one user's records against target, timed relative to trace time t0.
+
+    Returns per-op latencies, bytes read, the worst schedule slip and the session duration.
+    """
+    handles = {}
+    latencies = []
+    n_bytes = 0
+    lateness = 0.0
+    try:
+        for record in session:
+            if speed:
+                due = start_at + (record.timestamp - t0) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    lateness = max(lateness, -delay)
+            started = time.perf_counter()
+            f = handles.get(record.path)
+            if f is None:
+                f = handles[record.path] = open(os.path.join(target, record.path), "rb")
+            f.seek(record.offset)
+            n_bytes += len(f.read(record.length))
+            latencies.append(time.perf_counter() - started)
+    finally:
+        for f in handles.values():
+            f.close()
+    return latencies, n_bytes, lateness, time.perf_counter() - start_at
+
+
+def replay(trace_path, target, users=1, speed=1.0, stagger=0.0):
+    """Replay a trace with concurrent simulated users; speed 0 replays as fast as possible."""
+    records = list(trace.read_records(trace_path))
+    if not records:
+        raise ValueError(f"{trace_path} has no records")
+    sessions = _sessions(records, users)
+    t0 = min(record.timestamp for record in records)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        futures = [pool.submit(replay_session, target, session, speed, started + i * stagger, t0)
+                   for i, session in enumerate(sessions)]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    per_user = []
+    all_latencies = []
+    for i, (latencies, n_bytes, lateness, duration) in enumerate(results):
+        all_latencies.extend(latencies)
+        per_user.append({"user": i, "recorded_user": sessions[i][0].user, "ops": len(latencies),
+                         "bytes": n_bytes, "duration_s": duration,
+                         "throughput_mb_s": throughput_mb_s(n_bytes, duration),
+                         "max_lateness_s": lateness, "latency": latency_summary(latencies)})
+    total = sum(u["bytes"] for u in per_user)
+    return {
+        "trace": trace_path,
+        "target": target,
+        "users": users,
+        "speed": speed,
+        "stagger_s": stagger,
+        "aggregate": {"ops": len(all_latencies), "bytes": total, "elapsed_s": elapsed,
+                      "throughput_mb_s": throughput_mb_s(total, elapsed),
+                      "latency": latency_summary(all_latencies)},
+        "per_user": per_user,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Capture and replay file access traces")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import-procmon", help="convert a Process Monitor CSV export into a trace")
+    imp.add_argument("src")
+    imp.add_argument("dst")
+    imp.add_argument("--date", required=True, help="date of the capture, YYYY-MM-DD")
+    imp.add_argument("--strip-prefix", default="", help="only keep paths under this prefix, made relative to it")
+    imp.add_argument("--user", default="", help="user name to record, defaults to the process name")
+    imp.add_argument("--process", help="only keep reads by this process, e.g. the interpretation application")
+
+    run = sub.add_parser("run", help="replay a trace against a target directory")
+    run.add_argument("trace")
+    run.add_argument("target", help="directory the trace paths are relative to")
+    run.add_argument("--users", type=int, default=1)
+    run.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier, 0 for as fast as possible")
+    run.add_argument("--stagger", type=float, default=0.0, help="seconds between simulated user starts")
+    run.add_argument("--output", help="write JSON results here instead of stdout")
+
+    args = parser.parse_args(argv)
+    if args.command == "import-procmon":
+        count = import_procmon(args.src, args.dst, args.date, args.strip_prefix, args.user, args.process)
+        print(f"wrote {count} records to {args.dst}")
+        return
+
+    text = json.dumps(replay(args.trace, args.target, args.users, args.speed, args.stagger), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import os
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+
+# SEG-Y rev1 layout constants
+TEXT_HEADER_SIZE = 3200
+BINARY_HEADER_SIZE = 400
+FILE_HEADER_SIZE = TEXT_HEADER_SIZE + BINARY_HEADER_SIZE
+TRACE_HEADER_SIZE = 240
+SAMPLE_SIZE = 4
+
+# IEEE float32, big endian (format code 5)
+SAMPLE_DTYPE = np.dtype(">f4")
+IEEE_FLOAT_FORMAT = 5
+
+# Byte positions (zero based) inside the binary and trace headers
+_BIN_SAMPLE_INTERVAL = 16
+_BIN_SAMPLE_COUNT = 20
+_BIN_FORMAT_CODE = 24
+_TRACE_INLINE = 188
+_TRACE_CROSSLINE = 192
+
+
+@dataclass(frozen=True)
+class SegyGeometry:
+    n_inlines: int
+    n_crosslines: int
+    n_samples: int
+    first_inline: int = 1
+    first_crossline: int = 1
+    sample_interval_us: int = 4000
+
+    @property
+    def trace_size(self):
+        return TRACE_HEADER_SIZE + self.n_samples * SAMPLE_SIZE
+
+    @property
+    def n_traces(self):
+        return self.n_inlines * self.n_crosslines
+
+    @property
+    def file_size(self):
+        return FILE_HEADER_SIZE + self.n_traces * self.trace_size
+
+    def trace_offset(self, inline_index, crossline_index):
+        # Byte offset of the trace header for a zero based inline/crossline index
+        trace_number = inline_index * self.n_crosslines + crossline_index
+        return FILE_HEADER_SIZE + trace_number * self.trace_size
+
+    def data_offset(self, inline_index, crossline_index, sample_index=0):
+        return (self.trace_offset(inline_index, crossline_index) + TRACE_HEADER_SIZE
+                + sample_index * SAMPLE_SIZE)
+
+
+def _binary_header(geometry):
+    header = bytearray(BINARY_HEADER_SIZE)
+    struct.pack_into(">h", header, _BIN_SAMPLE_INTERVAL, geometry.sample_interval_us)
+    struct.pack_into(">h", header, _BIN_SAMPLE_COUNT, geometry.n_samples)
+    struct.pack_into(">h", header, _BIN_FORMAT_CODE, IEEE_FLOAT_FORMAT)
+    return bytes(header)
+
+
+def _trace_headers(geometry, inline_index):
+    headers = np.zeros((geometry.n_crosslines, TRACE_HEADER_SIZE), dtype=np.uint8)
+    inline = np.full(geometry.n_crosslines, geometry.first_inline + inline_index, dtype=">i4")
+    crosslines = np.arange(geometry.first_crossline,
+                           geometry.first_crossline + geometry.n_crosslines, dtype=">i4")
+    headers[:, _TRACE_INLINE:_TRACE_INLINE + 4] = inline.view(np.uint8).reshape(-1, 4)
+    headers[:, _TRACE_CROSSLINE:_TRACE_CROSSLINE + 4] = crosslines.view(np.uint8).reshape(-1, 4)
+    headers[:, 114:116] = np.array([geometry.n_samples], dtype=">i2").view(np.uint8)
+    headers[:, 116:118] = np.array([geometry.sample_interval_us], dtype=">i2").view(np.uint8)
+    return headers
+
+
+def synthetic_inline(geometry, inline_index, seed=0):
+    """Generate one inline of layered synthetic amplitudes, shape (crosslines, samples)."""
+    rng = np.random.default_rng((seed, inline_index))
+    t = np.arange(geometry.n_samples, dtype=np.float32)
+    xl = np.arange(geometry.n_crosslines, dtype=np.float32)[:, None]
+    # Gently dipping reflectors with some amplitude decay and noise
+    dip = 0.05 * xl + 0.03 * inline_index
+    layers = np.sin(2 * np.pi * (t[None, :] + dip) / 24.0) * np.sin(2 * np.pi * (t[None, :] - dip) / 97.0)
+    decay = np.exp(-t / (geometry.n_samples * 1.5))
+    noise = rng.standard_normal((geometry.n_crosslines, geometry.n_samples), dtype=np.float32)
+    return (layers * decay + 0.05 * noise).astype(np.float32)
+
+
+def write_synthetic(path, geometry, seed=0):
+    """Write a synthetic SEG-Y volume one inline at a time and return its size in bytes."""
+    with open(path, "wb") as f:
+        text = "C 1 SYNTHETIC SEISMIC VOLUME GENERATED BY local_zone_tools".ljust(80)
+        f.write(text.encode("ascii").ljust(TEXT_HEADER_SIZE, b" "))
+        f.write(_binary_header(geometry))
+        for il in range(geometry.n_inlines):
+            traces = np.empty((geometry.n_crosslines, geometry.trace_size), dtype=np.uint8)
+            traces[:, :TRACE_HEADER_SIZE] = _trace_headers(geometry, il)
+            samples = synthetic_inline(geometry, il, seed).astype(SAMPLE_DTYPE)
+            traces[:, TRACE_HEADER_SIZE:] = samples.view(np.uint8)
+            f.write(traces.tobytes())
+    return os.path.getsize(path)
+
+
+def read_geometry(path):
+    """Derive the survey geometry from the binary header and the trace headers.
+
+    Assumes a regular, inline-sorted volume with IEEE float samples.
+    """
+    with open(path, "rb") as f:
+        f.seek(TEXT_HEADER_SIZE)
+        binary = f.read(BINARY_HEADER_SIZE)
+        sample_interval, = struct.unpack_from(">h", binary, _BIN_SAMPLE_INTERVAL)
+        n_samples, = struct.unpack_from(">h", binary, _BIN_SAMPLE_COUNT)
+        format_code, = struct.unpack_from(">h", binary, _BIN_FORMAT_CODE)
+        if format_code != IEEE_FLOAT_FORMAT:
+            raise ValueError(f"{path}: unsupported sample format code {format_code}, expected IEEE float (5)")
+
+        trace_size = TRACE_HEADER_SIZE + n_samples * SAMPLE_SIZE
+        n_traces, remainder = divmod(os.path.getsize(path) - FILE_HEADER_SIZE, trace_size)
+        if remainder:
+            raise ValueError(f"{path}: file size is not a whole number of {trace_size} byte traces")
+
+        def header_at(trace_number):
+            f.seek(FILE_HEADER_SIZE + trace_number * trace_size)
+            header = f.read(TRACE_HEADER_SIZE)
+            return (struct.unpack_from(">i", header, _TRACE_INLINE)[0],
+                    struct.unpack_from(">i", header, _TRACE_CROSSLINE)[0])
+
+        first_inline, first_crossline = header_at(0)
+        # Count traces in the first inline to get the crossline extent
+        n_crosslines = 1
+        while n_crosslines < n_traces and header_at(n_crosslines)[0] == first_inline:
+            n_crosslines += 1
+        if n_traces % n_crosslines:
+            raise ValueError(f"{path}: irregular geometry, {n_traces} traces is not a multiple of {n_crosslines}")
+
+    return SegyGeometry(n_inlines=n_traces // n_crosslines, n_crosslines=n_crosslines, n_samples=n_samples,
+                        first_inline=first_inline, first_crossline=first_crossline,
+                        sample_interval_us=sample_interval)
+
+
+def iter_inlines(path, geometry, start=0, stop=None):
+    """Yield (inline_index, samples) pairs, samples shaped (crosslines, samples) as native float32."""
+    stop = geometry.n_inlines if stop is None else stop
+    inline_bytes = geometry.n_crosslines * geometry.trace_size
+    with open(path, "rb") as f:
+        f.seek(geometry.trace_offset(start, 0))
+        for il in range(start, stop):
+            raw = np.frombuffer(f.read(inline_bytes), dtype=np.uint8)
+            traces = raw.reshape(geometry.n_crosslines, geometry.trace_size)[:, TRACE_HEADER_SIZE:]
+            yield il, traces.copy().view(SAMPLE_DTYPE).astype(np.float32)
@@ -0,0 +1,24 @@
+import numpy as np
+
+MB = 1024 * 1024
+
+
+def latency_summary(latencies_s):
+    """Summarise latencies given in seconds as milliseconds percentiles."""
+    values = np.asarray(latencies_s, dtype=np.float64) * 1000.0
+    if values.size == 0:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "min_ms": float(values.min()),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(values.max()),
+    }
+
+
+def throughput_mb_s(n_bytes, elapsed_s):
+    return n_bytes / MB / elapsed_s if elapsed_s > 0 else 0.0
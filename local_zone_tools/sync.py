@@ -0,0 +1,324 @@
+"""Parallel, resumable delta sync between the core (FSx) and edge storage.
+
+Files are split into content-defined chunks using a rolling hash, so an edit or
+insertion only changes the chunks around it. Each directory keeps a manifest of
+chunk offsets and SHA-256 digests under .lzsync/. A sync rebuilds each changed
+destination file from chunks it already holds plus the changed chunks read
+from the source, with a pool of concurrent streams shared by several files at
+a time. Every chunk is verified against its digest, and an interrupted sync
+resumes from its journal.
+
+Index the source where it is local (on cache-instance-core for the FSx share)
+so the edge only has to read the small manifest, then sync from the edge so
+reused chunks are local copies and only changed regions cross the link. A
+source file without a current manifest is read in full over the link to chunk
+it; that manifest is kept in the destination's .lzsync, never written to the
+source share:
+
+    python -m local_zone_tools.sync index \\\\blogdatasvm.energyblog.example.com\\c$\\vol1\\surveys
+    python -m local_zone_tools.sync sync \\\\blogdatasvm.energyblog.example.com\\c$\\vol1\\surveys D:\\surveys --streams 8
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from local_zone_tools.stats import MB, throughput_mb_s
+from local_zone_tools.throttle import TokenBucket
+
+MANIFEST_DIR = ".lzsync"
+PART_SUFFIX = ".lzpart"
+JOURNAL_SUFFIX = ".lzjournal"
+READ_BLOCK = 8 * MB
+
+# Fixed table so manifests computed on different hosts agree
+_GEAR = np.random.default_rng(0x5E15).integers(0, 1 << 32, 256, dtype=np.uint64)
+
+
+@dataclass(frozen=True)
+class ChunkParams:
+    min_size: int = 1 * MB
+    # Boundary when the low avg_bits bits of the rolling hash are zero: ~2**avg_bits bytes past min_size
+    avg_bits: int = 22
+    max_size: int = 16 * MB
+    window: int = 64
+
+
+def content_chunks(f, params=ChunkParams()):
+    """Yield (offset, length, sha256) for content-defined chunks of an open binary file.
+
+    The rolling hash is the sum of per-byte table values over a sliding window,
+    computed a block at a time with a cumulative sum.
+    """
+    mask = np.uint64((1 << params.avg_bits) - 1)
+    w = params.window
+    carry = b""
+    pos = 0
+    start = 0
+    hasher = hashlib.sha256()
+
+    while True:
+        block = f.read(READ_BLOCK)
+        if not block:
+            break
+        data = carry + block
+        cs = np.cumsum(_GEAR[np.frombuffer(data, dtype=np.uint8)])
+        if cs.size >= w:
+            sums = cs[w - 1:] - np.concatenate(([np.uint64(0)], cs[:-w]))
+            # Cut after the last byte of each matching window, ignoring windows already scanned
+            cuts = np.flatnonzero((sums & mask) == 0) + (pos - len(carry) + w)
+            cuts = cuts[cuts > pos]
+        else:
+            cuts = np.empty(0, dtype=np.int64)
+
+        cursor = pos
+        end = pos + len(block)
+        for cut in list(cuts) + [None]:
+            limit = end if cut is None else int(cut)
+            while limit - start > params.max_size:
+                at = start + params.max_size
+                hasher.update(block[cursor - pos:at - pos])
+                yield start, at - start, hasher.hexdigest()
+                hasher, start, cursor = hashlib.sha256(), at, at
+            if cut is not None and limit - start >= params.min_size:
+                hasher.update(block[cursor - pos:limit - pos])
+                yield start, limit - start, hasher.hexdigest()
+                hasher, start, cursor = hashlib.sha256(), limit, limit
+        hasher.update(block[cursor - pos:])
+        carry = data[-(w - 1):] if w > 1 else b""
+        pos = end
+
+    if pos > start or pos == 0:
+        yield start, pos - start, hasher.hexdigest()
+
+
+def _manifest_path(path, *subdir):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, MANIFEST_DIR, *subdir, name + ".json")
+
+
+def load_manifest(path, params=ChunkParams(), manifest_path=None):
+    """Return the stored manifest for path if it is current and used the same chunking, else None.
+
+    The manifest is read from manifest_path when given, else from the .lzsync directory next to path.
+    """
+    manifest_path = manifest_path or _manifest_path(path)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        st = os.stat(path)
+    except (FileNotFoundError, ValueError):
+        return None
+    if (manifest.get("size"), manifest.get("mtime_ns"), manifest.get("params")) != \
+            (st.st_size, st.st_mtime_ns, asdict(params)):
+        return None
+    return manifest
+
+
+def save_manifest(path, chunks, params=ChunkParams(), manifest_path=None):
+    manifest_path = manifest_path or _manifest_path(path)
+    st = os.stat(path)
+    manifest = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "params": asdict(params), "chunks": chunks}
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, manifest_path)
+    return manifest
+
+
+def index_file(path, params=ChunkParams(), manifest_path=None):
+    manifest = load_manifest(path, params, manifest_path)
+    if manifest is None:
+        with open(path, "rb") as f:
+            chunks = [list(chunk) for chunk in content_chunks(f, params)]
+        manifest = save_manifest(path, chunks, params, manifest_path)
+    return manifest
+
+
+def iter_files(root):
+    """Relative paths of the regular files under root, skipping sync metadata."""
+    if os.path.isfile(root):
+        yield ""
+        return
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d != MANIFEST_DIR]
+        for name in files:
+            if name.endswith((PART_SUFFIX, JOURNAL_SUFFIX)):
+                continue
+            yield os.path.relpath(os.path.join(directory, name), root)
+
+
+class StreamStats:
+    # Per worker byte counts and busy time for the MB/s report
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.streams = {}
+
+    def record(self, n_bytes, busy_s):
+        name = threading.current_thread().name
+        with self.lock:
+            stream = self.streams.setdefault(name, {"bytes": 0, "busy_s": 0.0, "chunks": 0})
+            stream["bytes"] += n_bytes
+            stream["busy_s"] += busy_s
+            stream["chunks"] += 1
+
+    def report(self):
+        return [{"stream": i, **s, "throughput_mb_s": throughput_mb_s(s["bytes"], s["busy_s"])}
+                for i, s in enumerate(self.streams.values())]
+
+
+class ChecksumError(Exception):
+    pass
+
+
+def sync_file(src, dst, pool, stream_stats, bucket, params=ChunkParams()):
+    """Bring dst up to date with src. Returns a dict of byte counts for the file."""
+    src_manifest = load_manifest(src, params)
+    if src_manifest is None:
+        # Chunking here reads the whole source over the link; keep the result on the destination side
+        src_manifest = index_file(src, params, _manifest_path(dst, "source"))
+    dst_manifest = load_manifest(dst, params) if os.path.exists(dst) else None
+    if dst_manifest is None and os.path.exists(dst):
+        dst_manifest = index_file(dst, params)
+    if dst_manifest and dst_manifest["chunks"] == src_manifest["chunks"]:
+        return {"bytes_from_source": 0, "bytes_reused": 0, "skipped": True}
+
+    # Chunks already held in the old destination file can be copied locally
+    reusable = {digest: offset for offset, _, digest in (dst_manifest or {"chunks": []})["chunks"]}
+    part, journal_path = dst + PART_SUFFIX, dst + JOURNAL_SUFFIX
+    plan_id = hashlib.sha256(json.dumps(src_manifest["chunks"]).encode()).hexdigest()
+
+    done = set()
+    if os.path.exists(part) and os.path.exists(journal_path):
+        with open(journal_path) as f:
+            lines = f.read().splitlines()
+        if lines and lines[0] == plan_id:
+            done = {int(line) for line in lines[1:] if line}
+    if not done:
+        with open(part, "wb") as f:
+            f.truncate(src_manifest["size"])
+        with open(journal_path, "w") as f:
+            f.write(plan_id + "\n")
+
+    journal = open(journal_path, "a")
+    journal_lock = threading.Lock()
+    counts = {"bytes_from_source": 0, "bytes_reused": 0, "resumed_chunks": len(done)}
+
+    def copy_chunk(i, offset, length, digest):
+        started = time.perf_counter()
+        if digest in reusable:
+            origin, origin_offset, counter = dst, reusable[digest], "bytes_reused"
+        else:
+            origin, origin_offset, counter = src, offset, "bytes_from_source"
+            bucket.consume(length)
+        with open(origin, "rb") as f:
+            f.seek(origin_offset)
+            data = f.read(length)
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ChecksumError(f"{origin} changed at offset {origin_offset} since it was indexed, re-run the sync")
+        with open(part, "r+b") as out:
+            out.seek(offset)
+            out.write(data)
+        with journal_lock:
+            journal.write(f"{i}\n")
+            journal.flush()
+            counts[counter] += length
+        if counter == "bytes_from_source":
+            stream_stats.record(length, time.perf_counter() - started)
+
+    futures = [pool.submit(copy_chunk, i, *chunk)
+               for i, chunk in enumerate(src_manifest["chunks"]) if i not in done]
+    try:
+        finished, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        if pending:
+            # A chunk failed: drop the queued ones and let the running ones finish before closing the journal
+            for future in pending:
+                future.cancel()
+            wait(pending)
+        for future in futures:
+            if not future.cancelled():
+                future.result()
+    finally:
+        journal.close()
+
+    os.replace(part, dst)
+    os.remove(journal_path)
+    save_manifest(dst, src_manifest["chunks"], params)
+    return counts
+
+
+def sync_tree(src_root, dst_root, streams=4, bandwidth_bytes_s=None, params=ChunkParams()):
+    stream_stats = StreamStats()
+    bucket = TokenBucket(bandwidth_bytes_s, burst_bytes=params.max_size)
+    started = time.perf_counter()
+
+    def sync_one(relpath):
+        src = os.path.join(src_root, relpath) if relpath else src_root
+        dst = os.path.join(dst_root, relpath) if relpath else dst_root
+        if os.path.dirname(dst):
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+        result = sync_file(src, dst, pool, stream_stats, bucket, params)
+        return {"path": relpath or os.path.basename(src), **result}
+
+    # Several files are indexed and planned at once so small files keep all the streams busy. File workers
+    # only wait on chunk futures, so they have their own pool rather than taking streams.
+    with ThreadPoolExecutor(max_workers=streams, thread_name_prefix="stream") as pool, \
+            ThreadPoolExecutor(max_workers=streams, thread_name_prefix="file") as file_pool:
+        jobs = [file_pool.submit(sync_one, relpath) for relpath in iter_files(src_root)]
+        try:
+            files = [job.result() for job in jobs]
+        except BaseException:
+            for job in jobs:
+                job.cancel()
+            raise
+    elapsed = time.perf_counter() - started
+    from_source = sum(f["bytes_from_source"] for f in files)
+    return {
+        "files": files,
+        "streams": stream_stats.report(),
+        "bytes_from_source": from_source,
+        "bytes_reused": sum(f["bytes_reused"] for f in files),
+        "elapsed_s": elapsed,
+        "throughput_mb_s": throughput_mb_s(from_source, elapsed),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel, resumable delta sync")
+    sub = parser.add_subparsers(dest="command", required=True)
+    idx = sub.add_parser("index", help="write chunk manifests for a file or tree")
+    idx.add_argument("path")
+    sync = sub.add_parser("sync", help="bring a destination file or tree up to date")
+    sync.add_argument("src")
+    sync.add_argument("dst")
+    sync.add_argument("--streams", type=int, default=4)
+    sync.add_argument("--bandwidth-mb", type=float, help="MB/s cap on source reads, unlimited if omitted")
+    for p in (idx, sync):
+        p.add_argument("--min-chunk-mb", type=float, default=ChunkParams.min_size / MB)
+        p.add_argument("--avg-bits", type=int, default=ChunkParams.avg_bits)
+        p.add_argument("--max-chunk-mb", type=float, default=ChunkParams.max_size / MB)
+
+    args = parser.parse_args(argv)
+    params = ChunkParams(min_size=int(args.min_chunk_mb * MB), avg_bits=args.avg_bits,
+                         max_size=int(args.max_chunk_mb * MB))
+    if args.command == "index":
+        for relpath in iter_files(args.path):
+            path = os.path.join(args.path, relpath) if relpath else args.path
+            manifest = index_file(path, params)
+            print(f"{path}: {len(manifest['chunks'])} chunks")
+        return
+
+    bandwidth = args.bandwidth_mb * MB if args.bandwidth_mb else None
+    print(json.dumps(sync_tree(args.src, args.dst, args.streams, bandwidth, params), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe byte rate limiter. A rate of None or 0 disables throttling."""
+
+    def __init__(self, rate_bytes_s, burst_bytes=None):
+        self.rate = rate_bytes_s or 0
+        self.capacity = burst_bytes or self.rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, n_bytes):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Go into debt and sleep it off so requests larger than the burst still make progress
+            self.tokens -= n_bytes
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
@@ -0,0 +1,370 @@
+"""Recommend FSx for ONTAP tiering settings per volume from access traces.
+
+Replays read traces (the CSV format in local_zone_tools.trace, for example
+several weeks of sessions from replay import-procmon) against each candidate
+tiering policy and cooling period, block by block, and reports per volume the
+reads that would hit the capacity pool tier and the SSD footprint:
+
+    python -m local_zone_tools.tiering simulate week*.csv --size energy_blog_ontap_volume=900 \\
+        --max-cold-fraction 0.001 --output tiering.json
+
+The recommendation is the candidate with the smallest mean SSD footprint whose
+share of cold reads stays under --max-cold-fraction. Pass the output to the CDK
+app to apply it (cdk deploy -c tiering_config=tiering.json). Traces whose
+paths start with a volume's folder can be split with --volume name=prefix.
+
+The model follows ONTAP tiering: with AUTO a block moves to the capacity pool
+once it has not been read for the cooling period; a random read brings it back
+to SSD, a sequential read leaves it there. ALL keeps every block in the
+capacity pool, NONE and SNAPSHOT_ONLY keep active data on SSD. The traces
+carry no history, so every block counts as read when the trace starts; use
+traces spanning several cooling periods. Blocks never read in the trace cool
+like the rest, sized from --size or the observed volume usage.
+
+To compare with what the file system holds now, fetch the current settings,
+SSD and capacity pool usage and daily reads per volume from FSx and CloudWatch
+(needs boto3 and fsx:DescribeVolumes, cloudwatch:ListMetrics and
+cloudwatch:GetMetricStatistics), then pass the file to simulate:
+
+    python -m local_zone_tools.tiering fsx-metrics fs-0123456789abcdef0 --output fsx.json
+    python -m local_zone_tools.tiering simulate week*.csv --observed fsx.json
+"""
+import argparse
+import json
+import time
+from collections import defaultdict
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from local_zone_tools import trace
+
+# Must match TIERING_POLICIES, COOLING_PERIOD_RANGE and TIERED_METADATA_FRACTION in local_zone_cdk/storage_plan.py
+TIERING_POLICIES = ("AUTO", "SNAPSHOT_ONLY", "ALL", "NONE")
+COOLING_PERIOD_RANGE = (2, 183)
+TIERED_METADATA_FRACTION = 0.05
+DEFAULT_VOLUME = "energy_blog_ontap_volume"
+COOLING_PERIODS = (2, 7, 14, 31, 62, 92, 183)
+DAY = 86400.0
+MB = 1024 * 1024
+GB = 1024 * MB
+
+
+class Policy(NamedTuple):
+    tiering_policy: str
+    cooling_period: Optional[int] = None
+
+    @property
+    def label(self):
+        return f"{self.tiering_policy}/{self.cooling_period}d" if self.cooling_period else self.tiering_policy
+
+    @classmethod
+    def parse(cls, text):
+        name, _, days = text.upper().partition("/")
+        if name not in TIERING_POLICIES:
+            raise ValueError(f"unknown tiering policy '{name}', expected one of {list(TIERING_POLICIES)}")
+        if name in ("AUTO", "SNAPSHOT_ONLY"):
+            days = int(days.rstrip("D") or 31)
+            low, high = COOLING_PERIOD_RANGE
+            if not low <= days <= high:
+                raise ValueError(f"{text}: cooling period must be {low}-{high} days")
+            return cls(name, days)
+        return cls(name)
+
+
+def default_policies():
+    return [Policy("NONE")] + [Policy("AUTO", days) for days in COOLING_PERIODS] + [Policy("ALL")]
+
+
+def split_volumes(records, volumes):
+    """Group records by volume; volumes maps name to a path prefix, made relative to it."""
+    by_prefix = sorted(volumes.items(), key=lambda item: len(item[1]), reverse=True)
+    grouped, unmatched = defaultdict(list), 0
+    for record in records:
+        for name, prefix in by_prefix:
+            if record.path.startswith(prefix):
+                grouped[name].append(record._replace(path=record.path[len(prefix):]))
+                break
+        else:
+            unmatched += 1
+    return grouped, unmatched
+
+
+class BlockReads:
+    """Block reads of one volume, ordered by block and then time."""
+
+    def __init__(self, records, block_size, start, end):
+        self.block_size = block_size
+        self.start, self.end = start, end
+        self.reads = len(records)
+        timestamp = np.array([r.timestamp for r in records], dtype=np.float64)
+        offset = np.array([r.offset for r in records], dtype=np.int64)
+        length = np.maximum(np.array([r.length for r in records], dtype=np.int64), 1)
+        _, path = np.unique(np.array([r.path for r in records], dtype=str), return_inverse=True)
+
+        # A read is sequential when it starts where the same user's previous read of the file ended
+        sequential = np.zeros(len(records), dtype=bool)
+        stream_end = {}
+        for i, r in enumerate(records):
+            key = (r.user, r.path)
+            sequential[i] = stream_end.get(key) == r.offset
+            stream_end[key] = r.offset + r.length
+
+        first = offset // block_size
+        count = (offset + length - 1) // block_size - first + 1
+        record = np.repeat(np.arange(len(records)), count)
+        block = first[record] + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        low = np.maximum(offset[record], block * block_size)
+        high = np.minimum(offset[record] + length[record], (block + 1) * block_size)
+        pairs, block_id = np.unique(np.stack([path.astype(np.int64)[record], block], axis=1), axis=0,
+                                    return_inverse=True)
+        block_id = block_id.reshape(-1)
+        self.blocks = len(pairs)
+
+        order = np.lexsort((record, block_id))
+        self.record = record[order]
+        self.time = timestamp[self.record]
+        self.bytes = (high - low)[order]
+        self.sequential = sequential[self.record]
+        block_id = block_id[order]
+        self.first = np.r_[True, block_id[1:] != block_id[:-1]]
+        self.last = np.r_[self.first[1:], True]
+        previous = np.r_[start, self.time[:-1]]
+        self.gap = self.time - np.where(self.first, start, previous)
+
+    @property
+    def touched_bytes(self):
+        return self.blocks * self.block_size
+
+
+def simulate(reads, policy, total_bytes):
+    """Cold reads and SSD footprint of one volume under a policy."""
+    span = max(reads.end - reads.start, 1.0)
+    total_bytes = max(total_bytes, reads.touched_bytes)
+    untouched = total_bytes - reads.touched_bytes
+    n = len(reads.time)
+    if policy.tiering_policy in ("NONE", "SNAPSHOT_ONLY"):
+        cold = np.zeros(n, dtype=bool)
+        warm_byte_s = float(total_bytes) * span
+        end_warm = float(total_bytes)
+    elif policy.tiering_policy == "ALL":
+        cold = np.ones(n, dtype=bool)
+        warm_byte_s = end_warm = 0.0
+    else:
+        cooling = policy.cooling_period * DAY
+        index = np.arange(n)
+        # Cooled since the previous read, or still cold after a sequential read of a cold block
+        cooled = reads.gap > cooling
+        run_start = reads.first | ~np.r_[False, reads.sequential[:-1]]
+        last_run_start = np.maximum.accumulate(np.where(run_start, index, 0))
+        last_cooled = np.maximum.accumulate(np.where(cooled, index, -1))
+        cold = last_cooled >= last_run_start
+
+        leaves_warm = ~(cold & reads.sequential)
+        warm_before = np.where(reads.first | np.r_[True, leaves_warm[:-1]], np.minimum(reads.gap, cooling), 0.0)
+        tail = reads.end - reads.time[reads.last]
+        warm_after = np.where(leaves_warm[reads.last], np.minimum(tail, cooling), 0.0)
+        warm_byte_s = (warm_before.sum() + warm_after.sum()) * reads.block_size + untouched * min(span, cooling)
+        end_warm = (np.count_nonzero(leaves_warm[reads.last] & (tail <= cooling)) * reads.block_size
+                    + (untouched if span <= cooling else 0))
+
+    cold_reads = np.unique(reads.record[cold]).size
+    mean_ssd = (warm_byte_s + TIERED_METADATA_FRACTION * (total_bytes * span - warm_byte_s)) / span
+    end_ssd = end_warm + TIERED_METADATA_FRACTION * (total_bytes - end_warm)
+    return {
+        "policy": policy.label,
+        "tiering_policy": policy.tiering_policy,
+        "cooling_period": policy.cooling_period,
+        "cold_reads": int(cold_reads),
+        "cold_read_fraction": cold_reads / reads.reads if reads.reads else 0.0,
+        "cold_reads_per_day": cold_reads / (span / DAY),
+        "cold_gb": float(reads.bytes[cold].sum()) / GB,
+        "mean_ssd_gb": mean_ssd / GB,
+        "end_ssd_gb": end_ssd / GB,
+        # Blocks idle for longer than the trace were never seen cooling, so cold reads are understated
+        "beyond_trace": bool(policy.cooling_period and policy.cooling_period * DAY > span),
+    }
+
+
+def recommend(results, max_cold_fraction):
+    """Smallest mean SSD footprint within the cold read budget; fewer cold reads breaks ties.
+
+    Cooling periods longer than the trace rank after the others, as their cold reads are not seen.
+    """
+    fitting = [r for r in results if r["cold_read_fraction"] <= max_cold_fraction]
+    if not fitting:
+        fitting = [min(results, key=lambda r: (r["beyond_trace"], r["cold_read_fraction"]))]
+    return min(fitting, key=lambda r: (r["beyond_trace"], round(r["mean_ssd_gb"], 3), r["cold_reads"],
+                                       -(r["cooling_period"] or 0)))
+
+
+def advise(paths, volumes=None, sizes_gb=None, policies=None, block_mb=4.0, max_cold_fraction=0.001,
+           observed=None):
+    records = sorted((r for path in paths for r in trace.read_records(path)), key=lambda r: r.timestamp)
+    if not records:
+        raise ValueError("no reads in the traces")
+    grouped, unmatched = split_volumes(records, volumes or {DEFAULT_VOLUME: ""})
+    start, end = records[0].timestamp, records[-1].timestamp
+    observed = (observed or {}).get("volumes", {})
+    policies = policies or default_policies()
+
+    settings, report = {}, {}
+    for name, volume_records in sorted(grouped.items()):
+        reads = BlockReads(volume_records, int(block_mb * MB), start, end)
+        if sizes_gb and name in sizes_gb:
+            total_bytes = int(sizes_gb[name] * GB)
+        elif name in observed:
+            total_bytes = int((observed[name]["ssd_gb"] + observed[name]["capacity_pool_gb"]) * GB)
+        else:
+            total_bytes = reads.touched_bytes
+        results = [simulate(reads, policy, total_bytes) for policy in policies]
+        best = recommend(results, max_cold_fraction)
+        settings[name] = {"tiering_policy": best["tiering_policy"], "cooling_period": best["cooling_period"]}
+        report[name] = {
+            "reads": reads.reads,
+            "size_gb": max(total_bytes, reads.touched_bytes) / GB,
+            "touched_gb": reads.touched_bytes / GB,
+            "recommended": best["policy"],
+            "observed": observed.get(name),
+            "results": results,
+        }
+    return {
+        "volumes": settings,
+        "trace_days": (end - start) / DAY,
+        "unmatched_reads": unmatched,
+        "max_cold_fraction": max_cold_fraction,
+        "report": report,
+    }
+
+
+def _storage_used(cloudwatch, file_system_id, volume_id, start, end):
+    # Latest StorageUsed per storage tier, from the metric without a DataType breakdown
+    used = defaultdict(float)
+    metrics = cloudwatch.list_metrics(Namespace="AWS/FSx", MetricName="StorageUsed", Dimensions=[
+        {"Name": "FileSystemId", "Value": file_system_id}, {"Name": "VolumeId", "Value": volume_id}])["Metrics"]
+    for metric in metrics:
+        dimensions = {d["Name"]: d["Value"] for d in metric["Dimensions"]}
+        if "StorageTier" not in dimensions or dimensions.get("DataType", "All") != "All":
+            continue
+        points = cloudwatch.get_metric_statistics(Namespace="AWS/FSx", MetricName="StorageUsed",
+                                                  Dimensions=metric["Dimensions"], StartTime=start, EndTime=end,
+                                                  Period=3600, Statistics=["Average"])["Datapoints"]
+        if points:
+            used[dimensions["StorageTier"]] += max(points, key=lambda p: p["Timestamp"])["Average"]
+    return used
+
+
+def fsx_metrics(file_system_id, days=14, fsx=None, cloudwatch=None):
+    """Tiering settings, tier usage and daily reads of the ONTAP volumes of a file system."""
+    if fsx is None or cloudwatch is None:
+        try:
+            import boto3
+        except ImportError:
+            raise SystemExit("fetching FSx metrics needs boto3: pip install boto3")
+        fsx = fsx or boto3.client("fsx")
+        cloudwatch = cloudwatch or boto3.client("cloudwatch")
+    end = time.time()
+    start = end - days * DAY
+    volumes = {}
+    for page in fsx.get_paginator("describe_volumes").paginate(
+            Filters=[{"Name": "file-system-id", "Values": [file_system_id]}]):
+        for volume in page["Volumes"]:
+            ontap = volume.get("OntapConfiguration", {})
+            if ontap.get("StorageVirtualMachineRoot"):
+                continue
+            tiering = ontap.get("TieringPolicy", {})
+            used = _storage_used(cloudwatch, file_system_id, volume["VolumeId"], end - DAY, end)
+            reads = cloudwatch.get_metric_statistics(
+                Namespace="AWS/FSx", MetricName="DataReadBytes", StartTime=start, EndTime=end,
+                Dimensions=[{"Name": "FileSystemId", "Value": file_system_id},
+                            {"Name": "VolumeId", "Value": volume["VolumeId"]}],
+                Period=int(DAY), Statistics=["Sum"])["Datapoints"]
+            volumes[volume["Name"]] = {
+                "volume_id": volume["VolumeId"],
+                "tiering_policy": tiering.get("Name"),
+                "cooling_period": tiering.get("CoolingPeriod"),
+                "ssd_gb": used.get("SSD", 0.0) / GB,
+                "capacity_pool_gb": sum(v for tier, v in used.items() if tier != "SSD") / GB,
+                "read_gb_per_day": sum(p["Sum"] for p in reads) / GB / days,
+            }
+    return {"file_system_id": file_system_id, "days": days, "volumes": volumes}
+
+
+def format_report(advice):
+    lines = [f"trace covers {advice['trace_days']:.1f} days, cold read budget "
+             f"{advice['max_cold_fraction']:.2%} of reads"]
+    for name, volume in advice["report"].items():
+        lines.append(f"\n{name}: {volume['reads']} reads, {volume['touched_gb']:.1f} of "
+                     f"{volume['size_gb']:.1f} GB read")
+        observed = volume["observed"]
+        if observed:
+            current = Policy(observed["tiering_policy"] or "NONE", observed["cooling_period"]).label
+            lines.append(f"  now {current}: {observed['ssd_gb']:.1f} GB SSD, "
+                         f"{observed['capacity_pool_gb']:.1f} GB capacity pool, "
+                         f"{observed['read_gb_per_day']:.1f} GB read per day")
+        lines.append(f"  {'policy':<18}{'cold reads':>11}{'per day':>9}{'cold GB':>9}{'mean SSD GB':>13}"
+                     f"{'end SSD GB':>12}")
+        for r in volume["results"]:
+            mark = (" *" if r["beyond_trace"] else "") + (" <" if r["policy"] == volume["recommended"] else "")
+            lines.append(f"  {r['policy']:<18}{r['cold_reads']:>11}{r['cold_reads_per_day']:>9.1f}"
+                         f"{r['cold_gb']:>9.2f}{r['mean_ssd_gb']:>13.1f}{r['end_ssd_gb']:>12.1f}{mark}")
+    if any(r["beyond_trace"] for volume in advice["report"].values() for r in volume["results"]):
+        lines.append("\n* cooling period longer than the trace, cold reads after longer idle times are not seen")
+    if advice["unmatched_reads"]:
+        lines.append(f"\n{advice['unmatched_reads']} reads matched no --volume prefix")
+    return "\n".join(lines)
+
+
+def _pairs(values, convert=str):
+    pairs = {}
+    for value in values or []:
+        name, sep, rest = value.partition("=")
+        pairs[name] = convert(rest) if sep else convert("")
+    return pairs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FSx for ONTAP tiering policy advisor")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sim = sub.add_parser("simulate", help="simulate tiering policies against read traces")
+    sim.add_argument("traces", nargs="+", help="trace CSV files, merged in time order")
+    sim.add_argument("--volume", action="append", metavar="NAME[=PREFIX]",
+                     help=f"volume and the trace path prefix of its files, default all reads in {DEFAULT_VOLUME}")
+    sim.add_argument("--size", action="append", metavar="NAME=GB", help="data held by a volume, read or not")
+    sim.add_argument("--policy", action="append", metavar="POLICY[/DAYS]",
+                     help="candidate such as AUTO/31, NONE or ALL, default NONE, ALL and AUTO from 2 to 183 days")
+    sim.add_argument("--block-mb", type=float, default=4.0, help="granularity of the simulation")
+    sim.add_argument("--max-cold-fraction", type=float, default=0.001,
+                     help="share of reads allowed to hit the capacity pool")
+    sim.add_argument("--observed", help="fsx-metrics output to size volumes and compare with")
+    sim.add_argument("--output", help="write the settings and report as JSON, for -c tiering_config")
+    fetch = sub.add_parser("fsx-metrics", help="fetch current tiering, tier usage and reads per volume")
+    fetch.add_argument("file_system_id")
+    fetch.add_argument("--days", type=int, default=14, help="days of read metrics to average")
+    fetch.add_argument("--output", help="write JSON here instead of stdout")
+
+    args = parser.parse_args(argv)
+    if args.command == "fsx-metrics":
+        text = json.dumps(fsx_metrics(args.file_system_id, args.days), indent=2)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(text)
+        else:
+            print(text)
+        return
+
+    observed = None
+    if args.observed:
+        with open(args.observed) as f:
+            observed = json.load(f)
+    advice = advise(args.traces, _pairs(args.volume) or None, _pairs(args.size, float) or None,
+                    [Policy.parse(p) for p in args.policy] if args.policy else None,
+                    args.block_mb, args.max_cold_fraction, observed)
+    print(format_report(advice))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(advice, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import csv
+from typing import NamedTuple
+
+import numpy as np
+
+FIELDS = ("timestamp", "user", "path", "offset", "length")
+
+
+class AccessRecord(NamedTuple):
+    timestamp: float
+    user: str
+    path: str
+    offset: int
+    length: int
+
+
+def read_records(path):
+    """Yield AccessRecords from a CSV trace with a timestamp,user,path,offset,length header."""
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            yield AccessRecord(float(row["timestamp"]), row.get("user") or "", row["path"],
+                               int(row["offset"]), int(row["length"]))
+
+
+def write_records(path, records):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        for record in records:
+            writer.writerow(record)
+
+
+def load_columns(path):
+    """Load a trace into numpy columns; paths are returned as codes into a list of unique names."""
+    records = list(read_records(path))
+    names, codes = np.unique(np.array([r.path for r in records], dtype=str), return_inverse=True)
+    return {
+        "timestamp": np.array([r.timestamp for r in records], dtype=np.float64),
+        "user": [r.user for r in records],
+        "path": codes.astype(np.int64),
+        "offset": np.array([r.offset for r in records], dtype=np.int64),
+        "length": np.array([r.length for r in records], dtype=np.int64),
+        "names": [str(n) for n in names],
+    }
@@ -0,0 +1,241 @@
+"""Local WAN emulation for the Perth Local Zone and Sydney region paths.
+
+Lets the cache, sync, prefetch and benchmark tooling be evaluated on one Linux
+machine without deploying the CDK stacks. Two forms:
+
+    * a TCP proxy that forwards to an upstream service (e.g. the cache service,
+      an SMB or HTTP server) and adds the profile's round-trip time, jitter and
+      bandwidth cap, pacing data out in MTU-sized segments over a link shared by
+      all connections in each direction;
+    * WanOpener, a drop-in for open() that applies the same profile to file
+      reads, e.g. ChunkCache(..., opener=WanOpener(PROFILES["perth-lz-to-sydney"])).
+
+Profiles follow the topology deployed by this repo: interpreters in an office
+near Perth, the Perth Local Zone subnet (10.0.50.0/24) holding the workstation
+and edge cache, and the Sydney private subnets holding the core cache and FSx.
+The figures are starting points; measure your own paths and override them.
+
+    python -m local_zone_tools.wan proxy --listen 127.0.0.1:9445 --upstream 127.0.0.1:8080 --profile perth-lz-to-sydney
+    python -m local_zone_tools.wan profiles
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+
+from local_zone_tools.stats import MB
+
+
+@dataclass(frozen=True)
+class WanProfile:
+    name: str
+    rtt_ms: float
+    jitter_ms: float = 0.0
+    bandwidth_mbit_s: float = 0.0
+    mtu: int = 1448
+    description: str = ""
+
+    @property
+    def one_way_s(self):
+        return self.rtt_ms / 2000.0
+
+    @property
+    def bytes_per_s(self):
+        return self.bandwidth_mbit_s * 1e6 / 8
+
+    def sample_delay(self, rng=random):
+        # One-way delay with gaussian jitter, never negative
+        return max(self.one_way_s + rng.gauss(0.0, self.jitter_ms / 1000.0), 0.0)
+
+
+PROFILES = {p.name: p for p in (
+    WanProfile("local", 0.0, description="no impairment"),
+    WanProfile("office-to-perth-lz", 4.0, 0.5, 1000.0,
+               description="interpreter office to the Perth Local Zone subnet 10.0.50.0/24"),
+    WanProfile("office-to-sydney", 55.0, 3.0, 1000.0,
+               description="interpreter office near Perth to the Sydney region"),
+    WanProfile("perth-lz-to-sydney", 50.0, 2.0, 5000.0,
+               description="Perth Local Zone subnet (edge cache, workstations) to the Sydney private subnets (FSx)"),
+    WanProfile("sydney-cross-az", 1.0, 0.1, 10000.0,
+               description="core cache instance to FSx ONTAP within the Sydney region"),
+)}
+
+
+class Link:
+    """One direction of an emulated path: serialises segments at the bandwidth cap then delays them."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.free_at = 0.0
+        self.lock = threading.Lock()
+
+    def schedule(self, n_bytes, now=None):
+        """Return the monotonic time at which a segment of n_bytes sent now is delivered."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            start = max(now, self.free_at)
+            if self.profile.bandwidth_mbit_s:
+                self.free_at = start + n_bytes / self.profile.bytes_per_s
+            else:
+                self.free_at = start
+            sent = self.free_at
+        return sent + self.profile.sample_delay()
+
+
+async def _pipe(reader, writer, link, stats, key):
+    # Reader side chops data into segments and stamps delivery times; delivery keeps order
+    queue = asyncio.Queue(maxsize=256)
+    mtu = link.profile.mtu
+
+    async def deliver():
+        last = 0.0
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            due, segment = item
+            # Jitter must not reorder a TCP stream
+            last = max(due, last)
+            delay = last - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            writer.write(segment)
+            await writer.drain()
+            stats[key] += len(segment)
+        if writer.can_write_eof():
+            writer.write_eof()
+
+    task = asyncio.create_task(deliver())
+    try:
+        while True:
+            data = await reader.read(64 * 1024)
+            if not data:
+                break
+            for i in range(0, len(data), mtu):
+                segment = data[i:i + mtu]
+                await queue.put((link.schedule(len(segment)), segment))
+    except ConnectionError:
+        pass
+    finally:
+        await queue.put(None)
+        try:
+            await task
+        except ConnectionError:
+            pass
+
+
+class WanProxy:
+    """Asyncio TCP proxy applying a WanProfile in both directions."""
+
+    def __init__(self, listen, upstream, profile):
+        self.listen = listen
+        self.upstream = upstream
+        self.profile = profile
+        self.uplink = Link(profile)
+        self.downlink = Link(profile)
+        self.stats = {"connections": 0, "bytes_up": 0, "bytes_down": 0}
+        self.server = None
+
+    async def _handle(self, client_reader, client_writer):
+        self.stats["connections"] += 1
+        # Connection setup costs one round trip
+        await asyncio.sleep(self.profile.sample_delay() * 2)
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection(*self.upstream)
+        except OSError:
+            client_writer.close()
+            return
+        await asyncio.gather(
+            _pipe(client_reader, upstream_writer, self.uplink, self.stats, "bytes_up"),
+            _pipe(upstream_reader, client_writer, self.downlink, self.stats, "bytes_down"),
+        )
+        for writer in (client_writer, upstream_writer):
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, *self.listen)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+
+class _WanFile:
+
+    def __init__(self, f, link):
+        self.f = f
+        self.link = link
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        # A read is a request/response: one round trip plus serialisation of the reply
+        delay = self.link.schedule(len(data)) + self.link.profile.one_way_s - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.f.close()
+
+
+class WanOpener:
+    """Callable with the signature of open() whose binary reads are delayed by a profile."""
+
+    def __init__(self, profile):
+        self.link = Link(profile)
+
+    def __call__(self, path, mode="rb", *args, **kwargs):
+        f = open(path, mode, *args, **kwargs)
+        return _WanFile(f, self.link) if "r" in mode and "b" in mode else f
+
+
+def _address(text):
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WAN emulation proxy")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("profiles", help="list the built-in path profiles")
+    proxy = sub.add_parser("proxy", help="run a TCP proxy with WAN impairment")
+    proxy.add_argument("--listen", required=True, help="host:port to listen on")
+    proxy.add_argument("--upstream", required=True, help="host:port to forward to")
+    proxy.add_argument("--profile", choices=PROFILES, default="perth-lz-to-sydney")
+    proxy.add_argument("--rtt-ms", type=float, help="override the profile round-trip time")
+    proxy.add_argument("--jitter-ms", type=float, help="override the profile jitter")
+    proxy.add_argument("--bandwidth-mbit", type=float, help="override the profile bandwidth cap, 0 for none")
+
+    args = parser.parse_args(argv)
+    if args.command == "profiles":
+        print(json.dumps([asdict(p) for p in PROFILES.values()], indent=2))
+        return
+
+    profile = PROFILES[args.profile]
+    overrides = {k: v for k, v in (("rtt_ms", args.rtt_ms), ("jitter_ms", args.jitter_ms),
+                                   ("bandwidth_mbit_s", args.bandwidth_mbit)) if v is not None}
+    profile = replace(profile, **overrides)
+    wan_proxy = WanProxy(_address(args.listen), _address(args.upstream), profile)
+    print(f"{args.listen} -> {args.upstream} as {profile.name}: rtt {profile.rtt_ms} ms, "
+          f"jitter {profile.jitter_ms} ms, {profile.bandwidth_mbit_s or 'unlimited'} Mbit/s "
+          f"({profile.bytes_per_s / MB:.0f} MB/s)")
+    try:
+        asyncio.run(wan_proxy.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import aws_cdk as cdk
+
+from local_zone_cdk.network_cdk_stack import NetworkCdkStack
+from local_zone_cdk.directory_cdk_stack import DirectoryCdkStack
+from local_zone_cdk.storage_cdk_stack import StorageCdkStack
+from local_zone_cdk.instance_cdk_stack import InstanceCdkStack
+from local_zone_cdk.observability_cdk_stack import ObservabilityCdkStack
+from local_zone_cdk.config import FleetConfig
+from local_zone_cdk.storage_plan import StoragePlan
+from local_zone_cdk.throughput_autoscaler import AutoscalingConfig
+from local_zone_cdk.network_profile import NetworkProfile
+
+
+def build_stacks(context=None):
+    """The stacks of app.py for the given CDK context, without the image stack."""
+    app = cdk.App(context=context or {})
+    env = cdk.Environment(account=cdk.Aws.ACCOUNT_ID, region=cdk.Aws.REGION)
+    fleet = FleetConfig.from_context(app.node)
+    network_profile = NetworkProfile.from_context(app.node)
+    network = NetworkCdkStack(app, "NetworkCdkStack", env=env, local_zones=fleet.local_zones, profile=network_profile)
+    directory = DirectoryCdkStack(app, "DirectoryCdkStack", env=env, network_cdk_stack=network)
+    storage = StorageCdkStack(app, "StorageCdkStack", env=env, network_cdk_stack=network,
+                              directory_cdk_stack=directory,
+                              plan=StoragePlan.from_context(app.node, seats=len(fleet.workstation_names())),
+                              autoscaling=AutoscalingConfig.from_context(app.node))
+    instance = InstanceCdkStack(app, "InstanceCdkStack", env=env, network_cdk_stack=network,
+                                directory_cdk_stack=directory, keys="aws-energy-blog-keypair",
+                                sg_source_ips=["192.168.0.1/32"], fleet=fleet, network_profile=network_profile)
+    observability = ObservabilityCdkStack(app, "ObservabilityCdkStack", env=env, storage_cdk_stack=storage,
+                                          instance_cdk_stack=instance)
+    return {"network": network, "directory": directory, "storage": storage, "instance": instance,
+            "observability": observability}
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pytest
+
+from local_zone_tools import attributes, bricks, codec, segy
+from local_zone_tools.attributes import AttributeParams, compute
+
+GEOMETRY = segy.SegyGeometry(n_inlines=12, n_crosslines=12, n_samples=48)
+BRICK = (4, 4, 16)
+PARAMS = AttributeParams(envelope_halo=16)
+NAMES = ["rms", "envelope", "similarity"]
+
+
+@pytest.fixture
+def volume(tmp_path):
+    survey = tmp_path / "survey.sgy"
+    segy.write_synthetic(survey, GEOMETRY, seed=5)
+    path = tmp_path / "survey.bricks"
+    bricks.convert_segy(survey, path, BRICK)
+    return path
+
+
+def read_all(path):
+    with bricks.BrickedVolume(path) as volume:
+        return volume.read_subvolume(*map(range, volume.shape))
+
+
+def whole_volume(name, data):
+    # The kernel over the whole volume, with edge values repeated outside it as the halo reader does
+    halo = PARAMS.halo(name)
+    padded = np.pad(data, [(h, h) for h in halo], mode="edge")
+    core = tuple(slice(h, h + n) for h, n in zip(halo, data.shape))
+    return attributes.KERNELS[name](padded, PARAMS)[core].astype(np.float32)
+
+
+@pytest.mark.parametrize("name", ["rms", "similarity"])
+def test_bricked_kernels_match_the_whole_volume(volume, tmp_path, name):
+    report = compute(str(volume), [name], str(tmp_path / "out"), PARAMS, workers=2)
+    result = read_all(report["attributes"][name])
+    np.testing.assert_allclose(result, whole_volume(name, read_all(volume)), rtol=1e-5, atol=1e-6)
+
+
+def test_envelope_bounds_the_trace():
+    t = np.arange(256)
+    trace = np.sin(2 * np.pi * t / 16)[None, None, :]
+    env = attributes.envelope(trace, PARAMS)
+    np.testing.assert_allclose(env[0, 0, 32:-32], 1.0, atol=1e-6)
+
+
+def rewrite_brick(path, coords, scale):
+    with bricks.BrickedVolume(path) as volume:
+        offset, length = volume.index[volume.header.brick_id(*coords)]
+        data = volume.read_brick(*coords) * scale
+    st = os.stat(path)
+    with open(path, "r+b") as f:
+        f.seek(int(offset))
+        f.write(data.astype(bricks.BRICK_DTYPE).tobytes())
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def test_incremental_matches_full_recompute(volume, tmp_path):
+    incremental, full = tmp_path / "incremental", tmp_path / "full"
+    first = compute(str(volume), NAMES, str(incremental), PARAMS, workers=2)
+    assert first["bricks_computed"] == first["bricks"] == 27
+
+    rewrite_brick(volume, (1, 1, 1), 3.0)
+    second = compute(str(volume), NAMES, str(incremental), PARAMS, workers=2)
+    # Similarity reaches one brick across inlines and crosslines, the envelope one brick along samples
+    assert second["bricks_computed"] == 3 * 3 * 3
+    rewrite_brick(volume, (0, 0, 0), 0.5)
+    third = compute(str(volume), NAMES, str(incremental), PARAMS, workers=2)
+    assert third["bricks_computed"] == 2 * 2 * 2
+    assert third["bricks_reused"] == 27 - 8
+
+    reference = compute(str(volume), NAMES, str(full), PARAMS, workers=2, full=True)
+    for name in NAMES:
+        np.testing.assert_array_equal(read_all(third["attributes"][name]), read_all(reference["attributes"][name]))
+
+
+def test_unchanged_input_is_skipped(volume, tmp_path):
+    compute(str(volume), ["rms"], str(tmp_path), PARAMS, workers=1)
+    again = compute(str(volume), ["rms"], str(tmp_path), PARAMS, workers=1)
+    assert again["bricks_computed"] == 0
+
+
+def test_changed_settings_recompute_everything(volume, tmp_path):
+    compute(str(volume), ["rms"], str(tmp_path), PARAMS, workers=1)
+    report = compute(str(volume), ["rms"], str(tmp_path), PARAMS, workers=1, codec_mode=codec.LOSSLESS)
+    assert report["bricks_computed"] == report["bricks"]
+    with bricks.BrickedVolume(report["attributes"]["rms"]) as volume:
+        assert volume.header.codec == codec.LOSSLESS
+
+
+def test_unknown_attribute():
+    with pytest.raises(ValueError, match="unknown attribute"):
+        compute("survey.bricks", ["coherence"])
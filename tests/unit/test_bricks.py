@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from local_zone_tools import codec, segy
+from local_zone_tools.bricks import HEADER_SIZE, BrickedVolume, BrickHeader, convert_segy
+
+# Not a multiple of the brick shape on any axis, so the edge bricks are partial
+GEOMETRY = segy.SegyGeometry(n_inlines=11, n_crosslines=13, n_samples=37, first_inline=100, first_crossline=200)
+BRICK = (4, 8, 16)
+
+
+@pytest.fixture(scope="module")
+def survey(tmp_path_factory):
+    path = tmp_path_factory.mktemp("survey") / "survey.sgy"
+    segy.write_synthetic(path, GEOMETRY, seed=3)
+    volume = np.stack([samples for _, samples in segy.iter_inlines(path, GEOMETRY)])
+    return path, volume
+
+
+@pytest.fixture(scope="module")
+def raw_bricks(survey, tmp_path_factory):
+    path = tmp_path_factory.mktemp("bricks") / "survey.bricks"
+    convert_segy(survey[0], path, BRICK)
+    return path
+
+
+def test_header_round_trip():
+    header = BrickHeader(shape=(11, 13, 37), brick_shape=BRICK, first_inline=100, first_crossline=200,
+                         codec=codec.LOSSY)
+    assert BrickHeader.unpack(header.pack()) == header
+    assert header.grid == (3, 2, 3)
+    with pytest.raises(ValueError, match="not a bricked"):
+        BrickHeader.unpack(b"x" * HEADER_SIZE)
+
+
+def test_raw_bricks_round_trip(survey, raw_bricks):
+    _, volume = survey
+    with BrickedVolume(raw_bricks) as bricks:
+        assert bricks.shape == volume.shape
+        assert (bricks.header.first_inline, bricks.header.first_crossline) == (100, 200)
+        full = bricks.read_subvolume(range(11), range(13), range(37))
+    np.testing.assert_array_equal(full, volume)
+
+
+@pytest.mark.parametrize("reader, index, expected", [
+    ("read_inline", 10, lambda v: v[10]),
+    ("read_crossline", 5, lambda v: v[:, 5]),
+    ("read_timeslice", 36, lambda v: v[:, :, 36]),
+])
+def test_slices(survey, raw_bricks, reader, index, expected):
+    _, volume = survey
+    with BrickedVolume(raw_bricks) as bricks:
+        np.testing.assert_array_equal(getattr(bricks, reader)(index), expected(volume))
+
+
+def test_subvolume_only_reads_intersecting_bricks(survey, raw_bricks):
+    _, volume = survey
+    with BrickedVolume(raw_bricks) as bricks:
+        box = bricks.read_subvolume(range(3, 6), range(7, 9), range(15, 17))
+        # Inline bricks 0-1, crossline bricks 0-1, sample bricks 0-1
+        assert bricks.bricks_read == 8
+        assert bricks.bytes_read == 8 * bricks.header.brick_nbytes
+    np.testing.assert_array_equal(box, volume[3:6, 7:9, 15:17])
+
+
+def test_compressed_bricks_round_trip(survey, tmp_path):
+    _, volume = survey
+    lossless, lossy = tmp_path / "lossless.bricks", tmp_path / "lossy.bricks"
+    convert_segy(survey[0], lossless, BRICK, codec.LOSSLESS)
+    convert_segy(survey[0], lossy, BRICK, codec.LOSSY, abs_error=1e-3)
+    with BrickedVolume(lossless) as bricks:
+        np.testing.assert_array_equal(bricks.read_subvolume(range(11), range(13), range(37)), volume)
+    with BrickedVolume(lossy) as bricks:
+        decoded = bricks.read_subvolume(range(11), range(13), range(37))
+        assert bricks.header.codec == codec.LOSSY
+    assert np.abs(decoded - volume).max() <= 1e-3
@@ -0,0 +1,191 @@
+import http.client
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from local_zone_tools.cache import ChunkCache, DiskTier, RangeError, make_handler, parse_range
+
+CHUNK = 1024
+
+
+@pytest.fixture
+def source(tmp_path):
+    root = tmp_path / "source"
+    root.mkdir()
+    (root / "survey.segy").write_bytes(os.urandom(10 * CHUNK + 100))
+    (root / "empty.segy").write_bytes(b"")
+    return root
+
+
+def make_cache(source, cache_dir, disk_bytes=None, chunk_size=CHUNK, ram_bytes=4 * CHUNK, opener=open):
+    return ChunkCache(str(source), str(cache_dir), ram_bytes, disk_bytes, chunk_size=chunk_size, opener=opener)
+
+
+class CountingOpener:
+
+    def __init__(self):
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, path, mode):
+        with self.lock:
+            self.opened += 1
+        return open(path, mode)
+
+
+def objects_on_disk(cache_dir):
+    root = os.path.join(cache_dir, "objects")
+    return {name for prefix in os.listdir(root) for name in os.listdir(os.path.join(root, prefix))}
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    # Other units are ignored
+    ("items=0-10", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-10", (990, 999)),
+    # Clamped to the end of the file
+    ("bytes=900-5000", (900, 999)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header, status", [
+    ("bytes=1000-", 416),
+    ("bytes=500-100", 400),
+    ("bytes=-0", 416),
+    # Multipart responses are not supported
+    ("bytes=0-1,5-9", 416),
+    ("bytes=abc", 400),
+])
+def test_parse_range_rejects(header, status):
+    with pytest.raises(RangeError) as exc:
+        parse_range(header, 1000)
+    assert exc.value.status == status
+
+
+@pytest.fixture
+def server(source, tmp_path):
+    cache = make_cache(source, tmp_path / "cache")
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(cache))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(address, path, headers=None):
+    connection = http.client.HTTPConnection(*address, timeout=10)
+    try:
+        connection.request("GET", path, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def test_get_streams_whole_file(server, source):
+    status, headers, body = get(server, "/survey.segy")
+    assert status == 200
+    assert int(headers["Content-Length"]) == len(body)
+    assert body == (source / "survey.segy").read_bytes()
+
+
+def test_get_empty_file(server):
+    status, headers, body = get(server, "/empty.segy")
+    assert status == 200
+    assert headers["Content-Length"] == "0"
+    assert body == b""
+
+
+@pytest.mark.parametrize("header", ["bytes=0-0", "bytes=1000-3000", "bytes=-100", f"bytes={CHUNK}-"])
+def test_get_range_across_chunks(server, source, header):
+    data = (source / "survey.segy").read_bytes()
+    start, end = parse_range(header, len(data))
+    status, headers, body = get(server, "/survey.segy", {"Range": header})
+    assert status == 206
+    assert headers["Content-Range"] == f"bytes {start}-{end}/{len(data)}"
+    assert body == data[start:end + 1]
+
+
+def test_get_range_errors(server, source):
+    size = (source / "survey.segy").stat().st_size
+    status, headers, _ = get(server, "/survey.segy", {"Range": f"bytes={size}-"})
+    assert status == 416
+    assert headers["Content-Range"] == f"bytes */{size}"
+    assert get(server, "/survey.segy", {"Range": "bytes=9-1"})[0] == 400
+    assert get(server, "/missing.segy")[0] == 404
+    assert get(server, "/../outside.segy")[0] == 404
+
+
+def test_disk_budget_evicts(source, tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache = make_cache(source, cache_dir, disk_bytes=3 * CHUNK, ram_bytes=0)
+    data = (source / "survey.segy").read_bytes()
+    assert cache.read("survey.segy", 0, len(data)) == data
+    assert cache.disk.used <= cache.disk.budget
+    assert cache.disk.evictions > 0
+    assert objects_on_disk(cache_dir) == set(cache.disk.items)
+    assert not cache.disk.reserved and not cache.disk.removing
+
+
+def test_disk_tier_skips_objects_over_budget(tmp_path):
+    disk = DiskTier(str(tmp_path), budget_bytes=10)
+    disk.put("ab" * 32, b"x" * 11)
+    assert disk.used == 0
+    assert objects_on_disk(str(tmp_path)) == set()
+
+
+def test_restart_serves_from_disk(source, tmp_path):
+    data = (source / "survey.segy").read_bytes()
+    make_cache(source, tmp_path / "cache").read("survey.segy", 0, len(data))
+    first = make_cache(source, tmp_path / "cache")
+    assert first.read("survey.segy", 0, len(data)) == data
+    first.save_index()
+
+    opener = CountingOpener()
+    restarted = make_cache(source, tmp_path / "cache", opener=opener)
+    assert restarted.read("survey.segy", 0, len(data)) == data
+    assert opener.opened == 0
+    assert restarted.stats()["disk_hits"] == 11
+
+
+def test_restart_with_other_chunk_size_discards_index(source, tmp_path):
+    data = (source / "survey.segy").read_bytes()
+    cache = make_cache(source, tmp_path / "cache")
+    cache.read("survey.segy", 0, len(data))
+    cache.save_index()
+
+    restarted = make_cache(source, tmp_path / "cache", chunk_size=4 * CHUNK)
+    assert restarted.chunk_index == {}
+    assert restarted.read("survey.segy", 0, len(data)) == data
+    assert restarted.stats()["misses"] == 3
+
+
+def test_modified_file_is_refetched(source, tmp_path):
+    cache = make_cache(source, tmp_path / "cache")
+    cache.revalidate_after = 0
+    assert cache.read("survey.segy", 0, 10) == (source / "survey.segy").read_bytes()[:10]
+    (source / "survey.segy").write_bytes(b"new header" + os.urandom(CHUNK))
+    assert cache.read("survey.segy", 0, 10) == b"new header"
+
+
+def test_concurrent_misses_share_a_fetch(source, tmp_path):
+    opener = CountingOpener()
+    cache = make_cache(source, tmp_path / "cache", opener=opener)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_chunk("survey.segy", 2)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [(source / "survey.segy").read_bytes()[2 * CHUNK:3 * CHUNK]] * 8
+    stats = cache.stats()
+    assert opener.opened == stats["misses"]
+    assert stats["misses"] + stats["coalesced"] + stats["ram_hits"] + stats["disk_hits"] == 8
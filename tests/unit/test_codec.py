@@ -0,0 +1,93 @@
+import io
+
+import numpy as np
+import pytest
+
+from local_zone_tools import codec, segy
+
+GEOMETRY = segy.SegyGeometry(n_inlines=4, n_crosslines=64, n_samples=500)
+
+
+@pytest.fixture(scope="module")
+def inline():
+    return segy.synthetic_inline(GEOMETRY, 2, seed=7)
+
+
+def decode(encoded):
+    samples, consumed = codec.decode_chunk(encoded)
+    assert consumed == len(encoded)
+    return samples
+
+
+@pytest.mark.parametrize("mode", [codec.RAW, codec.LOSSLESS])
+def test_exact_modes_round_trip(inline, mode):
+    decoded = decode(codec.encode_chunk(inline, mode))
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, inline)
+
+
+@pytest.mark.parametrize("abs_error", [1e-1, 1e-3, 1e-5])
+def test_lossy_absolute_bound(inline, abs_error):
+    encoded = codec.encode_chunk(inline, codec.LOSSY, abs_error=abs_error)
+    assert np.abs(decode(encoded) - inline).max() <= abs_error
+
+
+@pytest.mark.parametrize("rel_error", [1e-2, 1e-4])
+def test_lossy_relative_bound(inline, rel_error):
+    encoded = codec.encode_chunk(inline, codec.LOSSY, rel_error=rel_error)
+    assert np.abs(decode(encoded) - inline).max() <= rel_error * float(inline.max() - inline.min())
+
+
+def test_lossy_bound_holds_for_large_offsets():
+    # Float32 rounding of large reconstructed values must not push the error past the bound
+    samples = (1e4 + np.random.default_rng(0).standard_normal((8, 300))).astype(np.float32)
+    encoded = codec.encode_chunk(samples, codec.LOSSY, abs_error=1e-2)
+    assert np.abs(decode(encoded).astype(np.float64) - samples).max() <= 1e-2
+
+
+def test_lossy_compresses_better_than_lossless(inline):
+    lossless = codec.encode_chunk(inline, codec.LOSSLESS)
+    lossy = codec.encode_chunk(inline, codec.LOSSY, rel_error=1e-3)
+    assert len(lossy) < len(lossless) < inline.nbytes
+
+
+@pytest.mark.parametrize("samples, options", [
+    # Bound too small for the values, non-finite values, and a bound of zero
+    (np.full((4, 4), 1e30, dtype=np.float32), {"abs_error": 1e-3}),
+    (np.array([[0.0, np.nan, 1.0]], dtype=np.float32), {"abs_error": 1e-3}),
+    (np.zeros((4, 4), dtype=np.float32), {"rel_error": 1e-3}),
+])
+def test_lossy_falls_back_to_lossless(samples, options):
+    decoded = decode(codec.encode_chunk(samples, codec.LOSSY, **options))
+    np.testing.assert_array_equal(decoded, samples)
+
+
+def test_empty_chunk():
+    samples = np.zeros((0, 10), dtype=np.float32)
+    assert decode(codec.encode_chunk(samples, codec.LOSSY, rel_error=1e-3)).shape == (0, 10)
+
+
+def test_stream_round_trip(inline):
+    f = io.BytesIO()
+    encoder = codec.StreamEncoder(f, codec.LOSSY, abs_error=1e-3)
+    chunks = [inline[:10], inline[10:40], inline[40:]]
+    for chunk in chunks:
+        encoder.write(chunk)
+    assert encoder.bytes_in == inline.nbytes
+    assert encoder.bytes_out == len(f.getvalue())
+    f.seek(0)
+    decoded = list(codec.iter_decode(f))
+    assert [d.shape for d in decoded] == [c.shape for c in chunks]
+    assert np.abs(np.concatenate(decoded) - inline).max() <= 1e-3
+
+
+def test_benchmark_reports_error(inline):
+    result = codec.benchmark([inline], codec.LOSSY, rel_error=1e-3)
+    assert result["mode"] == "lossy"
+    assert 0 < result["max_rel_error"] <= 1e-3
+    assert result["ratio"] > 1
+
+
+def test_rejects_foreign_data():
+    with pytest.raises(ValueError, match="not an encoded seismic chunk"):
+        codec.decode_chunk(b"XX" + bytes(32))
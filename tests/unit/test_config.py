@@ -0,0 +1,69 @@
+import json
+
+import aws_cdk as cdk
+import pytest
+
+from local_zone_cdk.config import CacheTier, FleetConfig, WorkstationGroup
+from local_zone_cdk.instance_limits import validate_ebs_volume
+
+
+def test_workstation_group_profile_and_names():
+    group = WorkstationGroup.from_dict({"name": "interpreter", "count": 3, "profile": "interpretation-large"})
+    assert (group.instance_type, group.volume_size) == ("g4dn.4xlarge", 200)
+    assert group.instance_names() == ["interpreter-1", "interpreter-2", "interpreter-3"]
+
+
+@pytest.mark.parametrize("values, message", [
+    ({"name": "interpreter", "seats": 2}, r"workstation group 'interpreter': unknown keys \['seats'\]"),
+    ({"count": 2}, r"missing keys \['name'\]"),
+    ({"name": "interpreter", "count": True}, "count: must be a positive integer, got True"),
+    ({"name": "interpreter", "count": 0}, "must be a positive integer"),
+    ({"name": "interpreter", "volume_size": 100.5}, "volume_size: must be a positive integer"),
+    ({"name": "interpreter", "profile": "gaming"}, "unknown profile 'gaming'"),
+    ("interpreter", "must be an object"),
+])
+def test_workstation_group_rejects(values, message):
+    with pytest.raises(ValueError, match=message):
+        WorkstationGroup.from_dict(values)
+
+
+@pytest.mark.parametrize("values, message", [
+    ({"instance_type": "r5.2xlarge", "volume_size": 1000, "volume_typ": "gp3"},
+     r"edge_cache: unknown keys \['volume_typ'\]"),
+    ({"instance_type": "r5.2xlarge"}, r"edge_cache: missing keys \['volume_size'\]"),
+    ({"instance_type": "r5.2xlarge", "volume_size": False}, "volume_size: must be a positive integer"),
+    ({"instance_type": "r5.2xlarge", "volume_size": 1000, "volume_type": "gp3", "iops": True},
+     "iops: must be a positive integer"),
+    ({"instance_type": "r5.2xlarge", "volume_size": 1000, "cache_drive": "C"}, "drive letter"),
+])
+def test_cache_tier_rejects(values, message):
+    with pytest.raises(ValueError, match=message):
+        CacheTier.from_dict(values, "edge_cache")
+
+
+def test_cache_tier_accepts_all_fields():
+    tier = CacheTier.from_dict({"instance_type": "r5d.4xlarge", "volume_size": 2000, "volume_type": "gp3",
+                                "iops": 12000, "throughput": 500, "instance_store": True, "cache_drive": "F"},
+                               "edge_cache")
+    assert (tier.iops, tier.throughput, tier.instance_store) == (12000, 500, True)
+
+
+def test_instance_bandwidth_is_compared_in_mb_s():
+    # 340 MiB/s is 356.5 MB/s, over the 347.5 MB/s of a t3.xlarge although 340 < 347.5
+    with pytest.raises(ValueError, match=r"340 MiB/s \(356.5 MB/s\) exceeds the 347.5 MB/s"):
+        validate_ebs_volume("core_cache", "t3.xlarge", 500, "gp3", 3000, 340)
+    validate_ebs_volume("core_cache", "t3.xlarge", 500, "gp3", 3000, 330)
+
+
+def test_fleet_from_inline_json_context():
+    fleet = {"workstations": [{"name": "interpreter", "count": 2}],
+             "core_cache": {"instance_type": "m5.2xlarge", "volume_size": 500}}
+    node = cdk.App(context={"fleet": json.dumps(fleet)}).node
+    config = FleetConfig.from_context(node)
+    assert config.workstation_names() == ["interpreter-1", "interpreter-2"]
+    assert config.core_cache.instance_type == "m5.2xlarge"
+
+
+def test_fleet_rejects_unknown_keys_in_nested_objects():
+    with pytest.raises(ValueError, match=r"core_cache: unknown keys \['size'\]"):
+        FleetConfig.from_dict({"core_cache": {"instance_type": "m5.2xlarge", "size": 500}})
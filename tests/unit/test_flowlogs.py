@@ -0,0 +1,95 @@
+import gzip
+
+import pytest
+
+from local_zone_tools.flowlogs import DEFAULT_FORMAT, FlowLogAnalyzer, analyze
+
+START = 1_700_000_000
+WORKSTATION, FSX, INTERNET = "10.0.50.20", "10.0.1.10", "52.95.1.2"
+DIRECTION_FORMAT = DEFAULT_FORMAT + " flow-direction"
+
+
+def record(eni, src, dst, sport, dport, n_bytes, start=START, status="OK", direction=None):
+    line = f"2 123456789012 {eni} {src} {dst} {sport} {dport} 6 10 {n_bytes} {start} {start + 60} ACCEPT {status}"
+    return line + (f" {direction}" if direction else "")
+
+
+def smb_session(direction=False):
+    """An SMB read between the Perth workstation and FSx, logged at both ENIs, plus DCV from the internet."""
+    def tagged(eni, src, *rest):
+        own = {"eni-ws": WORKSTATION, "eni-fsx": FSX}[eni]
+        return record(eni, src, *rest, direction=("egress" if src == own else "ingress") if direction else None)
+    return [
+        tagged("eni-ws", WORKSTATION, FSX, 50000, 445, 1000),
+        tagged("eni-ws", FSX, WORKSTATION, 445, 50000, 50000),
+        tagged("eni-fsx", WORKSTATION, FSX, 50000, 445, 1000),
+        tagged("eni-fsx", FSX, WORKSTATION, 445, 50000, 50000),
+        tagged("eni-ws", INTERNET, WORKSTATION, 40000, 8443, 7000),
+    ]
+
+
+def write(path, lines):
+    with gzip.open(path, "wt") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def check_session(result):
+    assert result["bytes_logged"] == 2 * 51000 + 7000
+    assert result["bytes_deduplicated"] == 51000 + 7000
+    assert result["perth_to_sydney_bytes"] == 1000
+    assert result["sydney_to_perth_bytes"] == 50000
+    ports = result["windows"][0]["ports"]
+    assert ports["smb"]["bytes"] == 51000
+    assert ports["smb"]["cross_zone_bytes"] == 51000
+    assert ports["dcv"]["bytes"] == 7000
+    assert ports["dcv"]["cross_zone_bytes"] == 0
+
+
+@pytest.mark.parametrize("block_mb", [16, 0.0001])
+def test_flows_seen_at_both_enis_count_once(tmp_path, block_mb):
+    path = write(tmp_path / "flows.gz", smb_session())
+    result = analyze([path], block_mb=block_mb)
+    check_session(result)
+    assert result["records"] == 5
+    top = result["top_talkers"][0]
+    assert (top["src"], top["dst"], top["src_zone"], top["dst_zone"]) == (FSX, WORKSTATION, "sydney", "perth")
+
+
+def test_flow_direction_from_the_header(tmp_path):
+    path = write(tmp_path / "flows.gz", [DIRECTION_FORMAT] + smb_session(direction=True))
+    check_session(analyze([path]))
+
+
+def test_single_peer_enis_keep_each_direction_once():
+    analyzer = FlowLogAnalyzer()
+    analyzer.add_block([line.encode() for line in smb_session()[:4]])
+    keys, n_bytes = analyzer.deduplicated()
+    assert sorted(n_bytes.tolist()) == [1000, 50000]
+
+
+def test_header_switches_format_mid_block(tmp_path):
+    default = smb_session()
+    with_direction = [record("eni-ws", WORKSTATION, FSX, 50001, 445, 300, start=START + 7200, direction="egress"),
+                      record("eni-ws", FSX, WORKSTATION, 445, 50001, 900, start=START + 7200, direction="ingress")]
+    joined = write(tmp_path / "joined.gz", [DEFAULT_FORMAT] + default + [DIRECTION_FORMAT] + with_direction)
+    first = write(tmp_path / "first.gz", [DEFAULT_FORMAT] + default)
+    second = write(tmp_path / "second.gz", [DIRECTION_FORMAT] + with_direction)
+    result = analyze([joined], window_s=3600)
+    assert result == analyze([first, second], window_s=3600)
+    assert result["records"] == 7
+    assert result["skipped"] == 0
+    assert len(result["windows"]) == 2
+
+
+def test_export_timestamps_and_skipped_records(tmp_path):
+    lines = [f"2023-11-14T22:13:20.000Z {line}" for line in smb_session()]
+    lines += [record("eni-ws", "-", "-", "-", "-", "-", status="NODATA"), "2 truncated line"]
+    result = analyze([write(tmp_path / "export.gz", lines)])
+    check_session(result)
+    assert result["skipped"] == 2
+
+
+def test_overlapping_local_zones_are_rejected():
+    with pytest.raises(ValueError, match="overlaps"):
+        FlowLogAnalyzer(local_zones={"perth": "10.0.50.0/24", "lax": "10.0.50.128/25"})
@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from local_zone_cdk.lambdas.fsx_throughput_autoscaler.index import Scaler, Settings, decide
+
+NOW = datetime(2026, 3, 2, 12, 0, tzinfo=timezone.utc)
+SETTINGS = Settings(file_system_id="fs-0123456789abcdef0", capacities=(128, 256, 512, 1024, 2048, 4096),
+                    min_capacity=256, max_capacity=2048)
+
+
+class StubFsx:
+
+    def __init__(self, capacity, actions=()):
+        self.file_system = {"FileSystemId": SETTINGS.file_system_id,
+                            "OntapConfiguration": {"ThroughputCapacity": capacity},
+                            "AdministrativeActions": list(actions)}
+        self.updates = []
+
+    def describe_file_systems(self, FileSystemIds):
+        assert FileSystemIds == [SETTINGS.file_system_id]
+        return {"FileSystems": [self.file_system]}
+
+    def update_file_system(self, FileSystemId, OntapConfiguration):
+        self.updates.append((FileSystemId, OntapConfiguration))
+        return {"FileSystem": self.file_system}
+
+
+class StubCloudWatch:
+
+    def __init__(self, throughput, ssd=None):
+        self.series = {"throughput": throughput, "ssd": ssd or [0.0] * len(throughput)}
+        self.requests = []
+
+    def get_metric_data(self, MetricDataQueries, StartTime, EndTime, ScanBy):
+        self.requests.append({"queries": MetricDataQueries, "start": StartTime, "end": EndTime})
+        results = []
+        for query in MetricDataQueries:
+            if query["ReturnData"]:
+                values = self.series[query["Id"]]
+                timestamps = [StartTime + timedelta(minutes=i + 1) for i in range(len(values))]
+                results.append({"Id": query["Id"], "Timestamps": timestamps, "Values": values})
+        return {"MetricDataResults": results}
+
+
+def update_action(status, minutes_ago, throughput=1024):
+    action = {"AdministrativeActionType": "FILE_SYSTEM_UPDATE", "Status": status,
+              "RequestTime": NOW - timedelta(minutes=minutes_ago)}
+    if throughput:
+        action["TargetFileSystemValues"] = {"OntapConfiguration": {"ThroughputCapacity": throughput}}
+    return action
+
+
+def scaler(fsx, cloudwatch, settings=SETTINGS):
+    return Scaler(settings, fsx, cloudwatch, now=lambda: NOW)
+
+
+@pytest.mark.parametrize("current, samples, expected", [
+    # Up to the smallest capacity that brings utilization back to 60%
+    (512, [0.85, 0.9, 0.95], 1024),
+    (1024, [0.95] * 3, 2048),
+    # Never past the maximum, even when more is needed
+    (1024, [1.0] * 3, 2048),
+    # Down one step when every sample is low
+    (1024, [0.1, 0.12, 0.05], 512),
+    # Back inside the limits
+    (128, [0.5], 256),
+    (4096, [0.5], 2048),
+])
+def test_decide_scales(current, samples, expected):
+    target, _ = decide(SETTINGS, current, samples)
+    assert target == expected
+
+
+@pytest.mark.parametrize("current, samples, reason", [
+    (2048, [0.95] * 3, "already at the maximum"),
+    (256, [0.05] * 3, "already at the minimum"),
+    # 29% at 512 would be 58% at 256, above the midpoint of the thresholds
+    (512, [0.29] * 3, "would be above"),
+    # One busy minute holds the capacity
+    (1024, [0.1, 0.5, 0.1], "within thresholds"),
+    (1024, [], "no utilization data"),
+])
+def test_decide_holds(current, samples, reason):
+    target, why = decide(SETTINGS, current, samples)
+    assert target is None
+    assert reason in why
+
+
+@pytest.mark.parametrize("actions, blocked", [
+    ([], None),
+    ([update_action("IN_PROGRESS", 5)], "update in_progress"),
+    ([update_action("PENDING", 1)], "update pending"),
+    ([update_action("UPDATED_OPTIMIZING", 30)], "update updated_optimizing"),
+    ([update_action("COMPLETED", 60)], "last throughput update"),
+    # Past the cooldown
+    ([update_action("COMPLETED", SETTINGS.cooldown_minutes + 1)], None),
+    # Updates of other settings and other action types do not start the cooldown
+    ([update_action("COMPLETED", 60, throughput=None)], None),
+    ([{"AdministrativeActionType": "STORAGE_OPTIMIZATION", "Status": "IN_PROGRESS",
+       "RequestTime": NOW}], None),
+])
+def test_cooling_down(actions, blocked):
+    fsx = StubFsx(1024, actions)
+    result = scaler(fsx, StubCloudWatch([])).cooling_down(fsx.file_system)
+    if blocked is None:
+        assert result is None
+    else:
+        assert result.startswith(blocked)
+
+
+def test_run_scales_up():
+    fsx = StubFsx(512)
+    # SSD IOPS utilization is the busier of the two in the last minute
+    cloudwatch = StubCloudWatch([0.85, 0.9, 0.5], ssd=[0.1, 0.1, 0.95])
+    result = scaler(fsx, cloudwatch).run()
+    assert result["current"] == 512
+    assert result["target"] == 1024
+    assert result["samples"] == 3
+    assert fsx.updates == [(SETTINGS.file_system_id, {"ThroughputCapacity": 1024})]
+
+    request, = cloudwatch.requests
+    assert request["end"] - request["start"] == timedelta(minutes=SETTINGS.evaluation_minutes)
+    throughput = next(q for q in request["queries"] if q["Id"] == "throughput")
+    assert str(60 * 1024 * 1024 * 512) in throughput["Expression"]
+
+
+def test_run_scales_down():
+    fsx = StubFsx(1024)
+    result = scaler(fsx, StubCloudWatch([0.1] * 15)).run()
+    assert result["target"] == 512
+    assert fsx.updates == [(SETTINGS.file_system_id, {"ThroughputCapacity": 512})]
+
+
+def test_run_holds_within_thresholds():
+    fsx = StubFsx(1024)
+    result = scaler(fsx, StubCloudWatch([0.5] * 15)).run()
+    assert result["target"] is None
+    assert fsx.updates == []
+
+
+def test_run_waits_for_update_in_progress():
+    fsx = StubFsx(512, [update_action("IN_PROGRESS", 2)])
+    cloudwatch = StubCloudWatch([0.95] * 15)
+    result = scaler(fsx, cloudwatch).run()
+    assert result["target"] is None
+    assert result["reason"] == "cooling down: update in_progress"
+    assert cloudwatch.requests == []
+    assert fsx.updates == []
+
+
+def test_run_dry_run_does_not_update():
+    fsx = StubFsx(512)
+    settings = Settings(**{**SETTINGS.__dict__, "dry_run": True})
+    result = scaler(fsx, StubCloudWatch([0.95] * 15), settings).run()
+    assert result["target"] == 1024
+    assert fsx.updates == []
@@ -0,0 +1,89 @@
+import pytest
+from aws_cdk.assertions import Template
+
+from tests.unit.app_stacks import build_stacks
+
+LAX = {"name": "lax", "availability_zone": "us-west-2-lax-1a", "cidr_block": "10.0.50.0/24"}
+DEN = {"name": "den", "availability_zone": "us-west-2-den-1a", "cidr_block": "10.0.51.0/24",
+       "workstations": [{"name": "interpreter-den", "count": 2}],
+       "edge_cache": {"instance_type": "r5.2xlarge", "volume_size": 1000}}
+DCV_AMIS = {"us-west-2": "ami-0123456789abcdef0"}
+
+
+def templates(fleet=None):
+    stacks = build_stacks({"fleet": fleet} if fleet else None)
+    return {name: Template.from_stack(stack).to_json() for name, stack in stacks.items()}
+
+
+def resource_types(templates):
+    return {(stack, logical_id): resource["Type"]
+            for stack, template in templates.items() for logical_id, resource in template["Resources"].items()}
+
+
+@pytest.fixture(scope="module")
+def two_zones():
+    return templates({"local_zones": [LAX, DEN], "dcv_amis": DCV_AMIS})
+
+
+def zone_subnets(network):
+    """Logical id of each Local Zone subnet by availability zone."""
+    return {resource["Properties"]["AvailabilityZone"]: logical_id
+            for logical_id, resource in network["Resources"].items()
+            if resource["Type"] == "AWS::EC2::Subnet"
+            and isinstance(resource["Properties"]["AvailabilityZone"], str)}
+
+
+def instances_by_subnet(network, instance):
+    """Name tags of the instances in each network stack subnet, by the subnet's logical id."""
+    exports = {}
+    for output in network.get("Outputs", {}).values():
+        value = output["Value"]
+        subnet = value["Fn::GetAtt"][0] if "Fn::GetAtt" in value else value.get("Ref")
+        exports[output["Export"]["Name"]] = subnet
+    groups = {}
+    for resource in instance["Resources"].values():
+        if resource["Type"] != "AWS::EC2::Instance":
+            continue
+        properties = resource["Properties"]
+        name = next(tag["Value"] for tag in properties["Tags"] if tag["Key"] == "Name")
+        groups.setdefault(exports[properties["SubnetId"]["Fn::ImportValue"]], set()).add(name)
+    return groups
+
+
+def test_one_subnet_per_zone(two_zones):
+    subnets = zone_subnets(two_zones["network"])
+    assert set(subnets) == {"us-west-2-lax-1a", "us-west-2-den-1a"}
+    cidrs = {az: two_zones["network"]["Resources"][logical_id]["Properties"]["CidrBlock"]
+             for az, logical_id in subnets.items()}
+    assert cidrs == {"us-west-2-lax-1a": "10.0.50.0/24", "us-west-2-den-1a": "10.0.51.0/24"}
+
+
+def test_edge_cache_and_workstations_per_zone(two_zones):
+    subnets = zone_subnets(two_zones["network"])
+    groups = instances_by_subnet(two_zones["network"], two_zones["instance"])
+    assert groups[subnets["us-west-2-lax-1a"]] == {"nice-dcv-lax-instance", "cache-instance-edge"}
+    assert groups[subnets["us-west-2-den-1a"]] == {"interpreter-den-1", "interpreter-den-2",
+                                                   "cache-instance-edge-den"}
+
+
+def test_hit_rate_alarm_per_edge_cache(two_zones):
+    caches = []
+    for resource in two_zones["observability"]["Resources"].values():
+        if resource["Type"] != "AWS::CloudWatch::Alarm":
+            continue
+        # Labelled metrics are rendered as a one-entry metric query
+        for query in resource["Properties"].get("Metrics", []):
+            metric = query.get("MetricStat", {}).get("Metric", {})
+            if metric.get("MetricName") == "CacheHitRate":
+                caches.extend(dimension["Value"] for dimension in metric["Dimensions"])
+    assert sorted(caches) == ["cache-instance-edge", "cache-instance-edge-den"]
+
+
+def test_first_zone_keeps_its_logical_ids(two_zones):
+    one_zone = resource_types(templates({"local_zones": [LAX], "dcv_amis": DCV_AMIS}))
+    both = resource_types(two_zones)
+    assert {key: both.get(key) for key in one_zone} == one_zone
+
+
+def test_perth_zone_matches_the_default_layout():
+    assert resource_types(templates({"local_zones": [{"name": "perth"}]})) == resource_types(templates())
@@ -0,0 +1,33 @@
+from local_zone_tools.metrics import cache_metrics
+
+
+def stats(requests, ram_hits, disk_hits=0, coalesced=0):
+    misses = requests - ram_hits - disk_hits - coalesced
+    return {"requests": requests, "misses": misses, "ram_hits": ram_hits, "disk_hits": disk_hits,
+            "coalesced": coalesced, "bytes_served": requests * 10, "bytes_from_source": misses * 10,
+            "hit_rate": (ram_hits + disk_hits + coalesced) / (requests or 1), "disk_used": 0}
+
+
+def values(data):
+    return {datum["MetricName"]: datum["Value"] for datum in data}
+
+
+def test_hit_rate_covers_the_interval():
+    # A long warm run, then an interval where every request misses
+    previous = stats(10000, 9900)
+    published = values(cache_metrics(stats(10100, 9900), previous, "cache-instance-edge"))
+    assert published["CacheHitRate"] == 0
+    assert published["CacheRequests"] == 100
+    assert published["CacheMisses"] == 100
+
+    published = values(cache_metrics(stats(10200, 9960, 20, 10), stats(10100, 9900), "cache-instance-edge"))
+    assert published["CacheHitRate"] == 90
+
+
+def test_no_hit_rate_without_requests():
+    assert "CacheHitRate" not in values(cache_metrics(stats(100, 90), None, "cache-instance-edge"))
+    assert "CacheHitRate" not in values(cache_metrics(stats(100, 90), stats(100, 90), "cache-instance-edge"))
+    # A restarted cache
+    published = values(cache_metrics(stats(5, 5), stats(100, 90), "cache-instance-edge"))
+    assert "CacheHitRate" not in published
+    assert published["CacheRequests"] == 0
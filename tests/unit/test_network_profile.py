@@ -0,0 +1,25 @@
+import aws_cdk as cdk
+import pytest
+
+from local_zone_cdk.network_profile import NetworkProfile
+
+
+def from_context(value):
+    return NetworkProfile.from_context(cdk.App(context={"network_profile": value}).node)
+
+
+def test_json_text_from_the_command_line():
+    # -c network_profile='{...}' arrives as a string
+    profile = from_context('{"placement_strategy": "cluster", "cache_security_group": true}')
+    assert profile == NetworkProfile(placement_strategy="cluster", cache_security_group=True)
+    assert from_context({"s3_endpoint": True}) == NetworkProfile(s3_endpoint=True)
+
+
+@pytest.mark.parametrize("value, message", [
+    ('{"placement": "cluster"}', r"unknown keys \['placement'\]"),
+    ('["cluster"]', "must be an object"),
+    ('{"placement_strategy": "clustered"}', "placement_strategy"),
+])
+def test_invalid_profiles(value, message):
+    with pytest.raises(ValueError, match=message):
+        from_context(value)
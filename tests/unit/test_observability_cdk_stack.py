@@ -0,0 +1,84 @@
+import json
+
+import pytest
+from aws_cdk.assertions import Match, Template
+
+from local_zone_cdk.observability_cdk_stack import CACHE_HIT_RATE_PERCENT, FSX_READ_LATENCY_MS, NAMESPACE
+from tests.unit.app_stacks import build_stacks
+
+
+@pytest.fixture(scope="module")
+def stacks():
+    return build_stacks()
+
+
+@pytest.fixture(scope="module")
+def template(stacks):
+    return Template.from_stack(stacks["observability"])
+
+
+def dashboard_body(template):
+    dashboard, = template.find_resources("AWS::CloudWatch::Dashboard").values()
+    # The body is an Fn::Join of strings and tokens; the widget titles are in the strings
+    parts = dashboard["Properties"]["DashboardBody"]["Fn::Join"][1]
+    return "".join(part for part in parts if isinstance(part, str))
+
+
+def test_dashboard_widgets(template):
+    template.has_resource_properties("AWS::CloudWatch::Dashboard", {"DashboardName": "perth-data-path"})
+    body = dashboard_body(template)
+    for title in ("FSx throughput (MB/s)", "FSx latency (ms)", "FSx SSD IOPS utilization (%)",
+                  "Cache volume queue length", "Local Zone network in (MB/s)", "Local Zone network out (MB/s)",
+                  "Edge cache hit rate (%)", "Client read latency p99 (ms)", "Client read throughput (MB/s)",
+                  "Alarms"):
+        assert json.dumps(title)[1:-1] in body, title
+
+
+def test_alarms(template):
+    template.resource_count_is("AWS::CloudWatch::Alarm", 5)
+    template.has_resource_properties("AWS::CloudWatch::Alarm", {
+        "Namespace": NAMESPACE,
+        "MetricName": "CacheHitRate",
+        "Dimensions": [{"Name": "Cache", "Value": "cache-instance-edge"}],
+        "Threshold": CACHE_HIT_RATE_PERCENT,
+        "ComparisonOperator": "LessThanThreshold",
+        "AlarmActions": Match.any_value(),
+    })
+    template.has_resource_properties("AWS::CloudWatch::Alarm", {
+        "AlarmDescription": Match.string_like_regexp("FSx throughput above"),
+        "EvaluationPeriods": 15,
+        "DatapointsToAlarm": 10,
+    })
+
+
+def test_instance_role_can_publish_metrics(stacks):
+    Template.from_stack(stacks["instance"]).has_resource_properties("AWS::IAM::Policy", {
+        "PolicyDocument": {"Statement": Match.array_with([{
+            "Action": "cloudwatch:PutMetricData",
+            "Condition": {"StringEquals": {"cloudwatch:namespace": NAMESPACE}},
+            "Effect": "Allow",
+            "Resource": "*",
+        }])},
+        "Roles": [{"Ref": Match.string_like_regexp("perthec2role")}],
+    })
+
+
+def read_latency_alarms(template):
+    return {alarm["Properties"]["AlarmDescription"]: alarm["Properties"]["Metrics"]
+            for alarm in template.to_json()["Resources"].values()
+            if alarm["Type"] == "AWS::CloudWatch::Alarm"
+            and "read latency" in alarm["Properties"]["AlarmDescription"]}
+
+
+def test_read_latency_uses_the_volume_metrics():
+    # ONTAP publishes the operation time metrics per volume only
+    workload = {"projects": [{"name": "vol1", "surveys_gb": [1200]}, {"name": "north_shelf", "surveys_gb": [3000]}]}
+    alarms = read_latency_alarms(Template.from_stack(build_stacks({"workload": workload})["observability"]))
+    assert sorted(alarms) == [f"FSx average read latency of volume {name} above {FSX_READ_LATENCY_MS} ms"
+                              for name in ("energy_blog_ontap_volume", "north_shelf")]
+    for metrics in alarms.values():
+        stats = {query["Id"]: query["MetricStat"]["Metric"] for query in metrics if "MetricStat" in query}
+        assert {metric["MetricName"] for metric in stats.values()} == {"DataReadOperationTime",
+                                                                       "DataReadOperations"}
+        for metric in stats.values():
+            assert [d["Name"] for d in metric["Dimensions"]] == ["FileSystemId", "VolumeId"]
@@ -0,0 +1,108 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from local_zone_tools import trace
+from local_zone_tools.cache import ChunkCache, make_handler
+from local_zone_tools.prefetch import (
+    CacheDirTarget, CacheUrlTarget, PrefetchModel, evaluate, expand_chunks, predict, stage,
+)
+
+CHUNK = 1024
+MODEL = PrefetchModel(chunk_size=CHUNK, neighbours=0)
+PERTH = timezone(timedelta(hours=8))
+FIRST_DAY = datetime(2026, 10, 5, tzinfo=PERTH)
+
+
+def at(day, hour):
+    return (FIRST_DAY + timedelta(days=day, hours=hour)).timestamp()
+
+
+@pytest.fixture
+def columns(tmp_path):
+    # Two weeks of interpreters opening the north survey in the morning and the south survey after lunch
+    records = []
+    for day in range(14):
+        records.append(trace.AccessRecord(at(day, 8.25), "ana", "north.segy", 0, 2 * CHUNK))
+        records.append(trace.AccessRecord(at(day, 14.5), "ben", "south.segy", 4 * CHUNK, CHUNK))
+    path = tmp_path / "access.csv"
+    trace.write_records(path, records)
+    return trace.load_columns(path)
+
+
+def predicted_chunks(columns, when, capacity, model=MODEL):
+    return [(path, chunk) for path, chunk, _ in predict(columns, when, capacity, model)]
+
+
+def test_expand_chunks():
+    record, chunks = expand_chunks(np.array([0, 1000, 5000]), np.array([10, 100, 0]), CHUNK)
+    # The second access crosses into chunk 1; a zero length access still touches its chunk
+    assert record.tolist() == [0, 1, 1, 2]
+    assert chunks.tolist() == [0, 0, 1, 4]
+
+
+def test_predicts_the_time_of_day_working_set(columns):
+    assert predicted_chunks(columns, at(14, 8), 2 * CHUNK) == [("north.segy", 0), ("north.segy", 1)]
+    assert predicted_chunks(columns, at(14, 14), CHUNK) == [("south.segy", 4)]
+    # Everything fits, best first
+    assert predicted_chunks(columns, at(14, 8), 10 * CHUNK) == [("north.segy", 0), ("north.segy", 1),
+                                                                ("south.segy", 4)]
+
+
+def test_neighbours_follow_the_accessed_chunks(columns):
+    model = PrefetchModel(chunk_size=CHUNK, neighbours=1)
+    chunks = predicted_chunks(columns, at(14, 14), 10 * CHUNK, model)
+    assert chunks[0] == ("south.segy", 4)
+    assert {("south.segy", 3), ("south.segy", 5), ("north.segy", 2)} <= set(chunks)
+
+
+def test_evaluate_on_the_last_day(columns):
+    result = evaluate(columns, at(13, 0), 3 * CHUNK, MODEL)
+    assert result["test_accesses"] == 2
+    assert result["chunk_hit_rate"] == 1.0
+    assert result["access_hit_rate"] == 1.0
+    assert evaluate(columns, at(13, 0), CHUNK, MODEL)["access_hit_rate"] == 0.5
+
+
+@pytest.fixture
+def source(tmp_path):
+    root = tmp_path / "source"
+    root.mkdir()
+    (root / "north.segy").write_bytes(bytes(range(256)) * 8)
+    return root
+
+
+def test_stage_into_a_cache_directory(source, tmp_path):
+    predicted = [("north.segy", 0, 3.0), ("north.segy", 1, 2.0), ("north.segy", 9, 1.0),
+                 ("missing.segy", 0, 1.0), ("../outside.segy", 0, 1.0)]
+    report = stage(predicted, CacheDirTarget(str(source), str(tmp_path / "cache"), CHUNK), CHUNK)
+    assert {k: report[k] for k in ("staged", "past_end", "missing", "outside_source", "bytes")} == \
+        {"staged": 2, "past_end": 1, "missing": 1, "outside_source": 1, "bytes": 2 * CHUNK}
+
+    # The cache service finds the staged chunks in the saved index
+    cache = ChunkCache(str(source), str(tmp_path / "cache"), 0, None, chunk_size=CHUNK)
+    assert cache.cached("north.segy", 0) and cache.cached("north.segy", 1)
+    again = stage(predicted[:2], CacheDirTarget(str(source), str(tmp_path / "cache"), CHUNK), CHUNK)
+    assert again["already_cached"] == 2
+    assert again["bytes"] == 0
+
+
+def test_warm_a_running_cache(source, tmp_path):
+    cache = ChunkCache(str(source), str(tmp_path / "cache"), 4 * CHUNK, None, chunk_size=CHUNK)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(cache))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        url = "http://%s:%d" % httpd.server_address
+        predicted = [("north.segy", 0, 2.0), ("north.segy", 9, 1.0), ("missing.segy", 0, 1.0)]
+        report = stage(predicted, CacheUrlTarget(url, CHUNK), CHUNK)
+        assert {k: report[k] for k in ("staged", "past_end", "missing", "bytes")} == \
+            {"staged": 1, "past_end": 1, "missing": 1, "bytes": CHUNK}
+        assert CacheUrlTarget(url, CHUNK).cached("north.segy", 0)
+        assert not CacheUrlTarget(url, CHUNK).cached("north.segy", 1)
+        assert stage(predicted[:1], CacheUrlTarget(url, CHUNK), CHUNK)["already_cached"] == 1
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,112 @@
+import asyncio
+import socket
+
+import numpy as np
+import pytest
+
+from local_zone_tools.probe import (
+    SERVICES, LatencyHistogram, format_table, parse_target, probe, report, serve_standins,
+)
+
+DELAY = 0.05
+
+
+def test_histogram_percentiles_within_one_percent():
+    seconds = np.random.default_rng(0).lognormal(np.log(0.004), 0.8, 20_000)
+    histogram = LatencyHistogram()
+    histogram.record_many(seconds)
+    for q in (50, 95, 99, 99.9):
+        expected = np.percentile(seconds * 1e6, q, method="inverted_cdf")
+        assert histogram.percentile(q) == pytest.approx(expected, rel=0.01)
+    assert histogram.summary()["count"] == 20_000
+
+
+def test_histogram_merge_matches_one_histogram():
+    seconds = np.random.default_rng(1).exponential(0.01, 5000)
+    whole, first, second = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    whole.record_many(seconds)
+    first.record_many(seconds[:2000])
+    second.record_many(seconds[2000:])
+    first.merge(second)
+    assert first.summary() == pytest.approx(whole.summary())
+
+
+def test_parse_target():
+    name, host, services = parse_target("perth=10.0.50.12,dcv=9443,smb=1445/tcp")
+    assert (name, host) == ("perth", "10.0.50.12")
+    assert services == {"dcv": (9443, "https"), "rdp": SERVICES["rdp"], "smb": (1445, "tcp")}
+    assert parse_target("10.0.1.20")[:2] == ("10.0.1.20", "10.0.1.20")
+    with pytest.raises(ValueError, match="unknown protocol"):
+        parse_target("local=127.0.0.1,dcv=20000/quic")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def delayed_echo(reader, writer):
+    data = await reader.read(65536)
+    await asyncio.sleep(DELAY)
+    writer.write(data)
+    await writer.drain()
+    writer.close()
+
+
+async def run_against_standins(count):
+    servers = await serve_standins("127.0.0.1", 0)
+    slow = await asyncio.start_server(delayed_echo, "127.0.0.1", 0)
+    ports = {protocol: server.sockets[0].getsockname()[1] for protocol, server in servers}
+    ports["slow"] = slow.sockets[0].getsockname()[1]
+    services = {"dcv": (ports["http"], "http"), "rdp": (ports["rdp"], "rdp"), "smb": (ports["smb"], "smb"),
+                "echo": (ports["tcp"], "tcp"), "slow": (ports["slow"], "rdp"), "closed": (free_port(), "tcp")}
+    targets = [("local", "127.0.0.1", services)]
+    try:
+        histograms, errors = await probe(targets, count=count, concurrency=3, timeout=2.0)
+    finally:
+        for server in [server for _, server in servers] + [slow]:
+            server.close()
+            await server.wait_closed()
+    return targets, histograms, errors
+
+
+@pytest.fixture(scope="module")
+def standin_results():
+    return asyncio.run(run_against_standins(count=12))
+
+
+def test_probe_measures_every_service(standin_results):
+    targets, histograms, errors = standin_results
+    results = {r["service"]: r for r in report(targets, histograms, errors)}
+    for service in ("dcv", "rdp", "smb", "slow"):
+        assert results[service]["errors"] == {}
+        assert set(results[service]["phases"]) == {"connect", "app"}
+        assert results[service]["phases"]["app"]["count"] == 12
+    # A plain TCP target only measures the connect
+    assert set(results["echo"]["phases"]) == {"connect"}
+
+
+def test_probe_app_latency_includes_server_delay(standin_results):
+    _, histograms, _ = standin_results
+    slow = histograms[("local", "slow")]["app"].summary()
+    fast = histograms[("local", "rdp")]["app"].summary()
+    assert slow["min_ms"] >= DELAY * 1000 * 0.99
+    assert slow["p50_ms"] < DELAY * 1000 * 4
+    assert fast["p50_ms"] < slow["p50_ms"]
+    assert slow["min_ms"] <= slow["p50_ms"] <= slow["p99_ms"] <= slow["max_ms"]
+
+
+def test_probe_counts_refused_connections(standin_results):
+    targets, histograms, errors = standin_results
+    assert errors[("local", "closed")] == {"ConnectionRefusedError": 12}
+    closed = next(r for r in report(targets, histograms, errors) if r["service"] == "closed")
+    assert closed["phases"] == {}
+
+
+def test_format_table(standin_results):
+    table = format_table(report(*standin_results))
+    lines = table.splitlines()
+    assert "local" in lines[0]
+    assert any(line.startswith("slow    app") for line in lines)
+    assert lines[-1] == "(ms)"
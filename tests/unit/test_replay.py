@@ -0,0 +1,99 @@
+import csv
+from datetime import datetime
+
+import pytest
+
+from local_zone_tools import trace
+from local_zone_tools.replay import Recorder, import_procmon, replay
+
+PROCMON_FIELDS = ["Time of Day", "Process Name", "PID", "Operation", "Path", "Result", "Detail"]
+
+
+def procmon_row(clock, operation="ReadFile", path=r"\\cache-instance-edge\surveys\north\survey.segy",
+                result="SUCCESS", detail="Offset: 1,048,576, Length: 65,536, Priority: Normal", process="Petrel.exe"):
+    return {"Time of Day": clock, "Process Name": process, "PID": "4242", "Operation": operation, "Path": path,
+            "Result": result, "Detail": detail}
+
+
+def test_import_procmon(tmp_path):
+    src, dst = tmp_path / "session.csv", tmp_path / "trace.csv"
+    rows = [
+        procmon_row("9:15:02.1234567 AM"),
+        procmon_row("1:00:00.5 PM", result="END OF FILE", detail="Offset: 0, Length: 512"),
+        procmon_row("9:15:01.0000000 AM", operation="QueryInformationFile"),
+        procmon_row("9:15:03.0 AM", result="ACCESS DENIED"),
+        procmon_row("9:15:04.0 AM", process="Explorer.EXE"),
+        procmon_row("9:15:05.0 AM", path=r"C:\Windows\System32\kernel32.dll"),
+    ]
+    # Process Monitor writes a byte order mark
+    with open(src, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, PROCMON_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    count = import_procmon(src, dst, "2026-10-19", strip_prefix="\\\\CACHE-INSTANCE-EDGE\\surveys\\",
+                           process="petrel.exe")
+    assert count == 2
+    records = list(trace.read_records(dst))
+    assert [(r.user, r.path, r.offset, r.length) for r in records] == [
+        ("Petrel.exe", "north/survey.segy", 1048576, 65536),
+        ("Petrel.exe", "north/survey.segy", 0, 512),
+    ]
+    assert records[0].timestamp == datetime(2026, 10, 19, 9, 15, 2, 123456).timestamp()
+    assert records[1].timestamp == datetime(2026, 10, 19, 13, 0, 0, 500000).timestamp()
+
+
+@pytest.fixture
+def target(tmp_path):
+    root = tmp_path / "surveys"
+    root.mkdir()
+    (root / "north.segy").write_bytes(bytes(range(256)) * 64)
+    (root / "south.segy").write_bytes(bytes(8192))
+    return root
+
+
+def test_recorder_traces_reads(target, tmp_path):
+    recorder = Recorder(str(target), user="ana")
+    with recorder.open("north.segy") as f:
+        f.seek(100)
+        assert f.read(10) == bytes(range(100, 110))
+        f.read(50)
+    recorder.save(tmp_path / "trace.csv")
+    records = list(trace.read_records(tmp_path / "trace.csv"))
+    assert [(r.user, r.path, r.offset, r.length) for r in records] == [("ana", "north.segy", 100, 10),
+                                                                         ("ana", "north.segy", 110, 50)]
+
+
+def write_trace(path, records):
+    trace.write_records(path, [trace.AccessRecord(*record) for record in records])
+    return str(path)
+
+
+def test_replay_users_cycle_through_recorded_users(target, tmp_path):
+    trace_path = write_trace(tmp_path / "trace.csv", [
+        (1000.0, "ana", "north.segy", 0, 4096),
+        (1000.1, "ana", "north.segy", 4096, 4096),
+        (1000.2, "ben", "south.segy", 0, 1000),
+    ])
+    result = replay(trace_path, str(target), users=3, speed=0)
+    per_user = [(u["recorded_user"], u["ops"], u["bytes"]) for u in result["per_user"]]
+    assert per_user == [("ana", 2, 8192), ("ben", 1, 1000), ("ana", 2, 8192)]
+    assert result["aggregate"]["ops"] == 5
+    assert result["aggregate"]["bytes"] == 2 * 8192 + 1000
+
+
+def test_replay_keeps_the_trace_timing(target, tmp_path):
+    trace_path = write_trace(tmp_path / "trace.csv", [
+        (1000.0, "ana", "north.segy", 0, 100),
+        (1000.4, "ana", "north.segy", 100, 100),
+    ])
+    result = replay(trace_path, str(target), users=2, speed=2.0, stagger=0.1)
+    durations = [u["duration_s"] for u in result["per_user"]]
+    # 0.4 s of trace at twice the speed, the second user starting 0.1 s later
+    assert all(0.19 <= d < 0.5 for d in durations)
+    assert 0.29 <= result["aggregate"]["elapsed_s"] < 0.8
+
+
+def test_replay_needs_records(target, tmp_path):
+    with pytest.raises(ValueError, match="no records"):
+        replay(write_trace(tmp_path / "empty.csv", []), str(target))
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from aws_cdk.assertions import Template
+
+from local_zone_cdk.storage_plan import ORIGINAL_VOLUME_NAME
+from tests.unit.app_stacks import build_stacks
+
+WORKLOAD = {"projects": [
+    {"name": "vol1", "surveys_gb": [1200, 800]},
+    {"name": "north_shelf", "surveys_gb": [3000], "hot_fraction": 0.1, "cooling_period": 31},
+]}
+
+
+def volumes(context=None):
+    template = Template.from_stack(build_stacks(context)["storage"]).to_json()
+    return {logical_id: resource["Properties"] for logical_id, resource in template["Resources"].items()
+            if resource["Type"] == "AWS::FSx::Volume"}
+
+
+@pytest.fixture(scope="module")
+def original():
+    return volumes()
+
+
+def test_first_project_keeps_the_original_volume(original):
+    planned = volumes({"workload": WORKLOAD})
+    (original_id, original_volume), = original.items()
+    assert original_volume["Name"] == ORIGINAL_VOLUME_NAME
+    # Same logical id and name, so CloudFormation updates the volume instead of replacing it
+    assert planned[original_id]["Name"] == ORIGINAL_VOLUME_NAME
+    assert planned[original_id]["OntapConfiguration"]["JunctionPath"] == "/vol1"
+    others = [volume for logical_id, volume in planned.items() if logical_id != original_id]
+    assert [(volume["Name"], volume["OntapConfiguration"]["JunctionPath"]) for volume in others] == [
+        ("north_shelf", "/north_shelf")]
+
+
+def test_tiering_by_project_name():
+    planned = volumes({"workload": WORKLOAD, "tiering": {
+        "vol1": {"tiering_policy": "NONE"},
+        "north_shelf": {"tiering_policy": "AUTO", "cooling_period": 62}}})
+    tiering = {volume["Name"]: volume["OntapConfiguration"]["TieringPolicy"] for volume in planned.values()}
+    assert tiering == {ORIGINAL_VOLUME_NAME: {"Name": "NONE"},
+                       "north_shelf": {"Name": "AUTO", "CoolingPeriod": 62}}
+
+
+def test_tiering_and_workload_as_json_text():
+    # As given with -c on the command line
+    planned = volumes({"workload": json.dumps(WORKLOAD),
+                       "tiering": json.dumps({"north_shelf": {"tiering_policy": "SNAPSHOT_ONLY"},
+                                              ORIGINAL_VOLUME_NAME: {"cooling_period": 45}})})
+    tiering = {volume["Name"]: volume["OntapConfiguration"]["TieringPolicy"] for volume in planned.values()}
+    assert tiering == {ORIGINAL_VOLUME_NAME: {"Name": "AUTO", "CoolingPeriod": 45},
+                       "north_shelf": {"Name": "SNAPSHOT_ONLY", "CoolingPeriod": 2}}
+
+
+def test_tiering_on_the_default_volume():
+    planned = volumes({"tiering": '{"energy_blog_ontap_volume": {"tiering_policy": "ALL"}}'})
+    (volume,) = planned.values()
+    assert volume["OntapConfiguration"]["TieringPolicy"] == {"Name": "ALL"}
+
+
+@pytest.mark.parametrize("tiering, message", [
+    ('["energy_blog_ontap_volume"]', "must be an object of volume names"),
+    ('{"energy_blog_ontap_volume": "NONE"}', "must be an object, got str"),
+    ('{"vol9": {"tiering_policy": "NONE"}}', r"unknown volumes \['vol9'\]"),
+])
+def test_tiering_rejects(tiering, message):
+    with pytest.raises(ValueError, match=message):
+        volumes({"tiering": tiering})
@@ -0,0 +1,158 @@
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from local_zone_tools.sync import (
+    JOURNAL_SUFFIX, MANIFEST_DIR, PART_SUFFIX, ChecksumError, ChunkParams, StreamStats, content_chunks,
+    index_file, sync_file, sync_tree,
+)
+from local_zone_tools.throttle import TokenBucket
+
+PARAMS = ChunkParams(min_size=256, avg_bits=9, max_size=4096, window=16)
+
+
+def random_bytes(n, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, n, dtype=np.uint8).tobytes()
+
+
+def chunks_of(data):
+    return list(content_chunks(io.BytesIO(data), PARAMS))
+
+
+def test_chunks_cover_the_file():
+    data = random_bytes(100_000)
+    chunks = chunks_of(data)
+    assert [offset for offset, _, _ in chunks] == [0] + [o + n for o, n, _ in chunks[:-1]]
+    assert sum(n for _, n, _ in chunks) == len(data)
+    assert all(n <= PARAMS.max_size for _, n, _ in chunks)
+    assert all(n >= PARAMS.min_size for _, n, _ in chunks[:-1])
+
+
+def test_insertion_only_changes_nearby_chunks():
+    data = random_bytes(100_000)
+    edited = data[:50_000] + b"inserted" + data[50_000:]
+    before = {digest for _, _, digest in chunks_of(data)}
+    after = [digest for _, _, digest in chunks_of(edited)]
+    assert len([digest for digest in after if digest not in before]) <= 2
+
+
+def test_empty_file_has_one_chunk():
+    assert [n for _, n, _ in chunks_of(b"")] == [0]
+
+
+@pytest.fixture
+def trees(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    (src / "inline").mkdir(parents=True)
+    for i in range(12):
+        (src / "inline" / f"{i}.bin").write_bytes(random_bytes(3000 + i * 500, seed=i))
+    (src / "survey.segy").write_bytes(random_bytes(60_000, seed=99))
+    return src, dst
+
+
+def files_of(root):
+    return {os.path.relpath(os.path.join(d, name), root): open(os.path.join(d, name), "rb").read()
+            for d, dirs, names in os.walk(root) if MANIFEST_DIR not in d.split(os.sep) for name in names}
+
+
+def test_sync_tree_copies_and_skips(trees):
+    src, dst = trees
+    first = sync_tree(str(src), str(dst), streams=4, params=PARAMS)
+    assert files_of(dst) == files_of(src)
+    assert first["bytes_from_source"] == sum(len(data) for data in files_of(src).values())
+    assert len(first["files"]) == 13
+
+    second = sync_tree(str(src), str(dst), streams=4, params=PARAMS)
+    assert all(f["skipped"] for f in second["files"])
+    assert second["bytes_from_source"] == 0
+
+
+def test_sync_reuses_unchanged_chunks(trees):
+    src, dst = trees
+    sync_tree(str(src), str(dst), params=PARAMS)
+    data = (src / "survey.segy").read_bytes()
+    (src / "survey.segy").write_bytes(data[:30_000] + b"reprocessed" + data[30_000:])
+
+    report = sync_tree(str(src), str(dst), params=PARAMS)
+    assert (dst / "survey.segy").read_bytes() == (src / "survey.segy").read_bytes()
+    assert 0 < report["bytes_from_source"] < 10_000
+    assert report["bytes_reused"] > 50_000
+
+
+def test_source_manifest_is_kept_at_the_destination(trees):
+    src, dst = trees
+    sync_tree(str(src), str(dst), params=PARAMS)
+    assert not (src / MANIFEST_DIR).exists()
+    assert (dst / MANIFEST_DIR / "source" / "survey.segy.json").exists()
+
+
+def test_source_manifest_from_index_is_used(trees):
+    src, dst = trees
+    index_file(str(src / "survey.segy"), PARAMS)
+    sync_tree(str(src), str(dst), params=PARAMS)
+    assert (src / MANIFEST_DIR / "survey.segy.json").exists()
+    assert not (dst / MANIFEST_DIR / "source" / "survey.segy.json").exists()
+
+
+def run_sync_file(src, dst):
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        return sync_file(str(src), str(dst), pool, StreamStats(), TokenBucket(None), PARAMS)
+
+
+def test_changed_source_fails_and_resumes(tmp_path):
+    src, dst = tmp_path / "survey.segy", tmp_path / "copy.segy"
+    data = random_bytes(60_000)
+    src.write_bytes(data)
+    index_file(str(src), PARAMS)
+    # Same size and mtime, so the manifest still looks current, but the second half differs
+    st = os.stat(src)
+    src.write_bytes(data[:30_000] + random_bytes(30_000, seed=1))
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    with pytest.raises(ChecksumError):
+        run_sync_file(src, dst)
+    assert not dst.exists()
+    journal = (tmp_path / ("copy.segy" + JOURNAL_SUFFIX)).read_text().splitlines()
+    assert len(journal) > 1
+
+    # Once the source is restored the journalled chunks are not copied again
+    src.write_bytes(data)
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns))
+    result = run_sync_file(src, dst)
+    assert result["resumed_chunks"] == len(journal) - 1
+    assert dst.read_bytes() == data
+    assert not (tmp_path / ("copy.segy" + PART_SUFFIX)).exists()
+
+
+class FailFirstBucket:
+    # Fails the first source read and holds the others long enough that they outlive it
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def consume(self, n_bytes):
+        with self.lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first:
+            raise OSError("link dropped")
+        time.sleep(0.1)
+
+
+def test_failed_chunk_waits_for_running_chunks(tmp_path):
+    src, dst = tmp_path / "survey.segy", tmp_path / "copy.segy"
+    src.write_bytes(random_bytes(60_000))
+    bucket = FailFirstBucket()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        with pytest.raises(OSError, match="link dropped"):
+            sync_file(str(src), str(dst), pool, StreamStats(), bucket, PARAMS)
+    # Queued chunks were cancelled, and the ones already running were journalled before the journal closed
+    journal = (tmp_path / ("copy.segy" + JOURNAL_SUFFIX)).read_text().splitlines()
+    assert len(journal) - 1 == bucket.calls - 1
+    assert bucket.calls < len(index_file(str(src), PARAMS)["chunks"])
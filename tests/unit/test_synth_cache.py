@@ -0,0 +1,117 @@
+import json
+import os
+
+import pytest
+
+from local_zone_cdk import synth_cache
+
+
+@pytest.fixture
+def app_root(tmp_path, monkeypatch):
+    # A stand-in app tree, so the tests can change "sources" without touching the repository
+    root = tmp_path / "app"
+    (root / "local_zone_cdk").mkdir(parents=True)
+    (root / "app.py").write_text("print('app')\n")
+    (root / "local_zone_cdk" / "stack.py").write_text("STACK = 1\n")
+    monkeypatch.setattr(synth_cache, "ROOT", str(root))
+    monkeypatch.delenv("CONTEXT_OVERFLOW_LOCATION_ENV", raising=False)
+    return root
+
+
+def set_context(monkeypatch, context, outdir=None):
+    monkeypatch.setenv("CDK_CONTEXT_JSON", json.dumps(context))
+    if outdir:
+        monkeypatch.setenv("CDK_OUTDIR", str(outdir))
+
+
+def synthesize(outdir, body):
+    os.makedirs(outdir, exist_ok=True)
+    with open(os.path.join(outdir, "manifest.json"), "w") as f:
+        f.write("{}")
+    with open(os.path.join(outdir, "Stack.template.json"), "w") as f:
+        f.write(body)
+
+
+@pytest.mark.parametrize("setting, expected", [
+    (None, None), (False, None), ("false", None), ("", None),
+    (True, synth_cache.DEFAULT_DIR), ("true", synth_cache.DEFAULT_DIR),
+])
+def test_cache_dir(setting, expected):
+    assert synth_cache.cache_dir({"synth_cache": setting}) == expected
+
+
+def test_cache_dir_path(tmp_path):
+    assert synth_cache.cache_dir({"synth_cache": str(tmp_path)}) == str(tmp_path)
+
+
+def test_key_changes_with_every_input(app_root, tmp_path):
+    config = tmp_path / "fleet.json"
+    config.write_text('{"local_zones": []}')
+    context = {"fleet_config": str(config), "synth_cache": True}
+    key = synth_cache.cache_key(context)
+    assert synth_cache.cache_key(dict(context)) == key
+
+    # Context values
+    assert synth_cache.cache_key({**context, "stacks": "storage"}) != key
+    # Config files named in the context
+    config.write_text('{"local_zones": [{"name": "lax"}]}')
+    changed_config = synth_cache.cache_key(context)
+    assert changed_config != key
+    # App sources, but not bytecode
+    (app_root / "local_zone_cdk" / "__pycache__").mkdir()
+    (app_root / "local_zone_cdk" / "__pycache__" / "stack.cpython.pyc").write_bytes(b"\0")
+    assert synth_cache.cache_key(context) == changed_config
+    (app_root / "local_zone_cdk" / "stack.py").write_text("STACK = 2\n")
+    assert synth_cache.cache_key(context) != changed_config
+
+
+def test_store_then_restore(app_root, tmp_path, monkeypatch):
+    cache = tmp_path / "cache"
+    context = {"synth_cache": str(cache)}
+    first = tmp_path / "first.out"
+    set_context(monkeypatch, context, first)
+    assert not synth_cache.restore()
+    synthesize(first, '{"Resources": {}}')
+    stored = synth_cache.store(str(first))
+    assert os.path.basename(stored) == synth_cache.cache_key(context)
+
+    second = tmp_path / "second.out"
+    set_context(monkeypatch, context, second)
+    assert synth_cache.restore()
+    assert (second / "Stack.template.json").read_text() == '{"Resources": {}}'
+
+    # A different context misses
+    set_context(monkeypatch, {**context, "stacks": "storage"}, tmp_path / "third.out")
+    assert not synth_cache.restore()
+
+
+def test_restore_needs_cache_and_outdir(app_root, tmp_path, monkeypatch):
+    set_context(monkeypatch, {})
+    monkeypatch.delenv("CDK_OUTDIR", raising=False)
+    assert not synth_cache.restore()
+    assert synth_cache.store(str(tmp_path)) is None
+
+
+def test_context_overflow_file(app_root, tmp_path, monkeypatch):
+    overflow = tmp_path / "context.json"
+    overflow.write_text(json.dumps({"synth_cache": str(tmp_path / "cache"), "stacks": "network"}))
+    set_context(monkeypatch, {"fleet_config": "fleet.json"})
+    monkeypatch.setenv("CONTEXT_OVERFLOW_LOCATION_ENV", str(overflow))
+    assert synth_cache.cli_context() == {"fleet_config": "fleet.json", "synth_cache": str(tmp_path / "cache"),
+                                         "stacks": "network"}
+
+
+def test_store_keeps_the_most_recent(app_root, tmp_path, monkeypatch):
+    monkeypatch.setattr(synth_cache, "KEEP", 2)
+    cache = tmp_path / "cache"
+    keys = []
+    for i in range(3):
+        context = {"synth_cache": str(cache), "run": i}
+        set_context(monkeypatch, context)
+        outdir = tmp_path / f"{i}.out"
+        synthesize(outdir, "{}")
+        stored = synth_cache.store(str(outdir))
+        # Distinct modification times for the ordering
+        os.utime(stored, (i, 1_000_000 + i))
+        keys.append(os.path.basename(stored))
+    assert sorted(os.listdir(cache)) == sorted(keys[1:])
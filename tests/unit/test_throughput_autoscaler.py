@@ -0,0 +1,26 @@
+import aws_cdk as cdk
+import pytest
+
+from local_zone_cdk.throughput_autoscaler import AutoscalingConfig
+
+
+def from_context(value):
+    return AutoscalingConfig.from_context(cdk.App(context={"fsx_autoscaling": value}).node)
+
+
+def test_json_text_from_the_command_line():
+    # -c fsx_autoscaling='{...}' arrives as a string
+    config = from_context('{"min_capacity": 256, "max_capacity": 2048, "dry_run": true}')
+    assert config == AutoscalingConfig(min_capacity=256, max_capacity=2048, dry_run=True)
+    assert from_context(None) is None
+
+
+@pytest.mark.parametrize("value, message", [
+    ('{"min_capacity": 256, "max_capacity": 2048, "cooldown": 60}', r"unknown keys \['cooldown'\]"),
+    ('{"min_capacity": 256}', r"missing keys \['max_capacity'\]"),
+    ('[256, 2048]', "must be an object"),
+    ('{"min_capacity": 300, "max_capacity": 2048}', "min_capacity: must be one of"),
+])
+def test_invalid_configs(value, message):
+    with pytest.raises(ValueError, match=message):
+        from_context(value)
@@ -0,0 +1,29 @@
+from local_zone_tools.tiering import DAY, MB, BlockReads, default_policies, recommend, simulate
+from local_zone_tools.trace import AccessRecord
+
+
+def results(records, days):
+    reads = BlockReads(records, 4 * MB, 0.0, days * DAY)
+    return [simulate(reads, policy, reads.touched_bytes) for policy in default_policies()]
+
+
+def test_cooling_periods_beyond_the_trace_rank_last():
+    # Every survey is opened at the start and again after 58 days of a 59-day trace
+    records = [AccessRecord(day * DAY + i, "user", f"survey{i}.sgy", 0, 4 * MB)
+               for day in (0, 58) for i in range(10)]
+    simulated = results(records, 59)
+    by_policy = {r["policy"]: r for r in simulated}
+    assert by_policy["AUTO/31d"]["cold_reads"] == 10
+    # Longer cooling periods keep everything on SSD, like NONE, but were never seen cooling
+    assert by_policy["AUTO/183d"]["beyond_trace"]
+    assert round(by_policy["AUTO/183d"]["mean_ssd_gb"], 3) == round(by_policy["NONE"]["mean_ssd_gb"], 3)
+    assert recommend(simulated, 0.001)["policy"] == "NONE"
+
+
+def test_covered_cooling_period_recommended():
+    # A hot file read daily and a cold one read once
+    records = [AccessRecord(day * DAY, "user", "hot.sgy", 0, 4 * MB) for day in range(60)]
+    records.append(AccessRecord(0.5 * DAY, "user", "archive.sgy", 0, 400 * MB))
+    best = recommend(results(sorted(records), 59), 0.001)
+    assert best["policy"] == "AUTO/2d"
+    assert not best["beyond_trace"]
@@ -0,0 +1,84 @@
+import asyncio
+import random
+import time
+
+import pytest
+
+from local_zone_tools.wan import PROFILES, Link, WanOpener, WanProfile, WanProxy
+
+# 20 ms round trip and 1 MB/s, without jitter so timings are predictable
+PROFILE = WanProfile("test", rtt_ms=20.0, bandwidth_mbit_s=8.0)
+
+
+def test_profiles_follow_the_topology():
+    assert PROFILES["local"].rtt_ms == 0
+    assert PROFILES["office-to-perth-lz"].rtt_ms < PROFILES["perth-lz-to-sydney"].rtt_ms
+    assert PROFILES["perth-lz-to-sydney"].bytes_per_s == 5000e6 / 8
+
+
+def test_jitter_never_makes_delay_negative():
+    profile = WanProfile("jittery", rtt_ms=1.0, jitter_ms=50.0)
+    rng = random.Random(0)
+    assert min(profile.sample_delay(rng) for _ in range(1000)) == 0.0
+
+
+def test_link_serialises_segments_at_the_bandwidth():
+    link = Link(PROFILE)
+    # 1000 bytes take 1 ms at 1 MB/s, then 10 ms one way; later segments queue behind earlier ones
+    assert link.schedule(1000, now=0.0) == pytest.approx(0.011)
+    assert link.schedule(1000, now=0.0) == pytest.approx(0.012)
+    # An idle link starts sending at once
+    assert link.schedule(1000, now=1.0) == pytest.approx(1.011)
+
+
+def test_link_without_a_cap_only_delays():
+    link = Link(WanProfile("latency", rtt_ms=20.0))
+    assert link.schedule(10 ** 9, now=5.0) == pytest.approx(5.01)
+
+
+def test_opener_delays_reads(tmp_path):
+    path = tmp_path / "chunk.bin"
+    path.write_bytes(bytes(50_000))
+    opener = WanOpener(PROFILE)
+    started = time.monotonic()
+    with opener(path, "rb") as f:
+        assert len(f.read()) == 50_000
+    # One round trip plus 50 ms on the wire
+    assert time.monotonic() - started >= 0.069
+    with opener(tmp_path / "other.bin", "wb") as f:
+        f.write(b"x")
+    assert (tmp_path / "other.bin").read_bytes() == b"x"
+
+
+async def echo(reader, writer):
+    while data := await reader.read(65536):
+        writer.write(data)
+        await writer.drain()
+    writer.close()
+
+
+async def round_trip(payload):
+    upstream = await asyncio.start_server(echo, "127.0.0.1", 0)
+    proxy = WanProxy(("127.0.0.1", 0), upstream.sockets[0].getsockname()[:2], PROFILE)
+    address = await proxy.start()
+    try:
+        started = time.monotonic()
+        reader, writer = await asyncio.open_connection(*address)
+        writer.write(payload)
+        writer.write_eof()
+        received = await reader.read(-1)
+        elapsed = time.monotonic() - started
+        writer.close()
+    finally:
+        proxy.server.close()
+        upstream.close()
+    return received, elapsed, proxy.stats
+
+
+def test_proxy_adds_latency_and_caps_bandwidth():
+    payload = bytes(range(256)) * 800
+    received, elapsed, stats = asyncio.run(round_trip(payload))
+    assert received == payload
+    assert stats == {"connections": 1, "bytes_up": len(payload), "bytes_down": len(payload)}
+    # Connection setup and the echo are a round trip each, and 205 kB crosses the 1 MB/s link each way
+    assert elapsed >= 0.04 + 0.2